@@ -26,6 +26,9 @@ class ViewBuilder(common.ViewBuilder):
 
     _collection_name = "volumes"
 
+    # Volume fields used by the summary view
+    summary_fields = ('id', 'display_name')
+
     def __init__(self):
         """Initialize view builder."""
         super(ViewBuilder, self).__init__()
@@ -37,6 +40,7 @@ class ViewBuilder(common.ViewBuilder):
 
     def detail_list(self, request, volumes, volume_count=None):
         """Detailed view of a list of volumes."""
+        self._prefetch_groups(request, volumes)
         return self._list_view(self.detail, request, volumes,
                                volume_count,
                                self._collection_name + '/detail')
@@ -100,14 +104,48 @@ class ViewBuilder(common.ViewBuilder):
         group_id = volume.get('group_id')
         if group_id is not None:
             # Not found exception will be handled at the wsgi level
-            ctxt = request.environ['cinder.context']
-            grp = group_api.API().get(ctxt, group_id)
-            cgsnap_type = group_types.get_default_cgsnapshot_type()
+            grp = self._get_group(request, group_id)
+            cgsnap_type = self._get_default_cgsnapshot_type(request)
             if grp.group_type_id == cgsnap_type['id']:
                 volume_ref['volume']['consistencygroup_id'] = group_id
 
         return volume_ref
 
+    def _prefetch_groups(self, request, volumes):
+        """Load the groups referenced by a list of volumes.
+
+        Each distinct group, and the default cgsnapshot group type, is
+        fetched once and cached on the request so that building the
+        detailed view of every volume doesn't hit the database again.
+        """
+        group_ids = {volume.get('group_id') for volume in volumes}
+        group_ids.discard(None)
+        if not group_ids:
+            return
+        self._get_default_cgsnapshot_type(request)
+        for group_id in group_ids:
+            self._get_group(request, group_id)
+
+    def _get_group(self, request, group_id):
+        """Retrieve a group, using the request cache when possible."""
+        grp = request.cached_resource_by_id(group_id, name='groups')
+        if grp is None:
+            ctxt = request.environ['cinder.context']
+            grp = group_api.API().get(ctxt, group_id)
+            request.cache_resource(grp, name='groups')
+        return grp
+
+    def _get_default_cgsnapshot_type(self, request):
+        """Retrieve the default cgsnapshot type once per request."""
+        cgsnap_type = request.cached_resource_by_id(
+            group_types.DEFAULT_CGSNAPSHOT_TYPE, name='group_types_by_name')
+        if cgsnap_type is None:
+            cgsnap_type = group_types.get_default_cgsnapshot_type()
+            if cgsnap_type:
+                request.cache_resource(cgsnap_type, id_attribute='name',
+                                       name='group_types_by_name')
+        return cgsnap_type
+
     def _is_volume_encrypted(self, volume):
         """Determine if volume is encrypted."""
         return volume.get('encryption_key_id') is not None
@@ -109,6 +109,15 @@ class VolumeController(wsgi.Controller):
             filters['display_name'] = filters.pop('name')
 
         self.volume_api.check_volume_filters(filters)
+        if not is_detail:
+            # NOTE: The summary view only needs a few columns, so there's no
+            # need to load every relationship and build full volume objects.
+            volumes = self.volume_api.get_all(
+                context, marker, limit, sort_keys=sort_keys,
+                sort_dirs=sort_dirs, filters=filters, offset=offset,
+                fields=self._view_builder.summary_fields)
+            return self._view_builder.summary_list(req, volumes)
+
         volumes = self.volume_api.get_all(context, marker, limit,
                                           sort_keys=sort_keys,
                                           sort_dirs=sort_dirs,
@@ -121,11 +130,7 @@ class VolumeController(wsgi.Controller):
 
         req.cache_db_volumes(volumes.objects)
 
-        if is_detail:
-            volumes = self._view_builder.detail_list(req, volumes)
-        else:
-            volumes = self._view_builder.summary_list(req, volumes)
-        return volumes
+        return self._view_builder.detail_list(req, volumes)
 
     def _image_uuid_from_ref(self, image_ref, context):
         # If the image ref was generated by nova api, strip image_ref
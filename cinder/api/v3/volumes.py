@@ -122,6 +122,15 @@ class VolumeController(volumes_v2.VolumeController):
         strict = req.api_version_request.matches("3.2", None)
         self.volume_api.check_volume_filters(filters, strict)
 
+        if not is_detail:
+            # NOTE: The summary view only needs a few columns, so there's no
+            # need to load every relationship and build full volume objects.
+            volumes = self.volume_api.get_all(
+                context, marker, limit, sort_keys=sort_keys,
+                sort_dirs=sort_dirs, filters=filters, offset=offset,
+                fields=self._view_builder.summary_fields)
+            return self._view_builder.summary_list(req, volumes)
+
         volumes = self.volume_api.get_all(context, marker, limit,
                                           sort_keys=sort_keys,
                                           sort_dirs=sort_dirs,
@@ -134,11 +143,7 @@ class VolumeController(volumes_v2.VolumeController):
 
         req.cache_db_volumes(volumes.objects)
 
-        if is_detail:
-            volumes = self._view_builder.detail_list(req, volumes)
-        else:
-            volumes = self._view_builder.summary_list(req, volumes)
-        return volumes
+        return self._view_builder.detail_list(req, volumes)
 
     @wsgi.Controller.api_version(SUMMARY_BASE_MICRO_VERSION)
     def summary(self, req):
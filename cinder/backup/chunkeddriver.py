@@ -22,19 +22,27 @@
 """
 
 import abc
+import binascii
+import collections
+import datetime
 import hashlib
+import itertools
 import json
+import mmap
 import os
 
 import eventlet
+from eventlet import tpool
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_service import loopingcall
 from oslo_utils import excutils
+from oslo_utils import timeutils
 from oslo_utils import units
 import six
 
 from cinder.backup import driver
+from cinder import coordination
 from cinder import exception
 from cinder.i18n import _
 from cinder import objects
@@ -50,6 +58,67 @@ chunkedbackup_service_opts = [
                         'zlib', 'gzip',
                         'bz2', 'bzip2'],
                help='Compression algorithm (None to disable)'),
+    cfg.IntOpt('backup_max_chunks_in_flight',
+               default=1,
+               min=1,
+               help='Maximum number of chunks that a chunked backup driver '
+                    'keeps in flight at once. Chunks are read and hashed '
+                    'in the backup thread while compression runs on native '
+                    'threads and uploads run concurrently, so values above '
+                    '1 let a single backup use several CPU cores and the '
+                    'backup repository bandwidth at the same time. Each '
+                    'chunk in flight holds up to one backup chunk of '
+                    'memory. The default of 1 processes chunks serially.'),
+    cfg.IntOpt('backup_restore_max_objects_in_flight',
+               default=1,
+               min=1,
+               help='Maximum number of backup objects that a chunked backup '
+                    'driver fetches and decompresses ahead of the one being '
+                    'written to the volume during a restore. Objects are '
+                    'still written in the order they were backed up. The '
+                    'default of 1 restores objects one at a time.'),
+    cfg.BoolOpt('backup_sparse_detection',
+                default=False,
+                help='Detect hash blocks that only contain zeroes during a '
+                     'chunked backup and record them as holes in the backup '
+                     'metadata instead of storing them as objects. Backups '
+                     'with holes can only be restored by services that '
+                     'support them.'),
+    cfg.BoolOpt('backup_deduplication',
+                default=False,
+                help='Store each backup chunk only once per backup '
+                     'container. Chunks that are already stored for another '
+                     'backup in the same container are referenced instead '
+                     'of being uploaded again, and a reference counted '
+                     'index in the container keeps track of which backups '
+                     'use them. This option must stay enabled as long as '
+                     'deduplicated backups exist, otherwise deleting a '
+                     'backup may remove chunks used by other backups. The '
+                     'index is protected with a coordination lock, so when '
+                     'several backup services on different hosts share a '
+                     'backup repository the coordination backend_url must '
+                     'point to a distributed backend; the default file '
+                     'backend only serializes services on the same host.'),
+    cfg.IntOpt('backup_deduplication_active_timeout',
+               default=86400,
+               min=0,
+               help='Time in seconds after which a backup that is still '
+                    'registered as in progress in a deduplication index is '
+                    'considered abandoned, for example because its backup '
+                    'service stopped. Unreferenced chunks are only removed '
+                    'while no backup is in progress, so this must be longer '
+                    'than the longest backup. 0 means never.'),
+    cfg.StrOpt('backup_sha256file_format',
+               default='json',
+               choices=['json', 'binary'],
+               help='Format of the file holding the SHA256 of every hash '
+                    'block of a chunked backup. The binary format stores '
+                    'raw digests, which is about three times smaller than '
+                    'the JSON format and can be memory mapped when the '
+                    'backup repository is a file system. Both formats can '
+                    'always be read, but services that predate the binary '
+                    'format cannot create incremental backups of backups '
+                    'that use it.'),
 ]
 
 CONF = cfg.CONF
@@ -70,7 +139,19 @@ class ChunkedBackupDriver(driver.BackupDriver):
     """
 
     DRIVER_VERSION = '1.0.0'
-    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1'}
+    # Version written in the metadata of backups that contain holes.
+    SPARSE_DRIVER_VERSION = '1.1.0'
+    # Version written in the metadata of backups that reference
+    # deduplicated chunks.
+    DEDUP_DRIVER_VERSION = '1.2.0'
+    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1',
+                              '1.1.0': '_restore_v1',
+                              '1.2.0': '_restore_v1'}
+    DEDUP_INDEX_FILENAME = 'backup_dedup_index'
+    # Binary sha256 files start with this line, followed by a JSON header
+    # on a single line and the raw digests.
+    SHA256FILE_MAGIC = b'CINDER-SHA256\n'
+    SHA256_DIGEST_SIZE = 32
 
     def _get_compressor(self, algorithm):
         try:
@@ -103,6 +184,15 @@ class ChunkedBackupDriver(driver.BackupDriver):
         self.backup_compression_algorithm = CONF.backup_compression_algorithm
         self.compressor = \
             self._get_compressor(CONF.backup_compression_algorithm)
+        self.max_chunks_in_flight = CONF.backup_max_chunks_in_flight
+        self.restore_max_objects_in_flight = (
+            CONF.backup_restore_max_objects_in_flight)
+        self.sparse_detection = CONF.backup_sparse_detection
+        self.deduplication = CONF.backup_deduplication
+        self.deduplication_active_timeout = (
+            CONF.backup_deduplication_active_timeout)
+        self.sha256file_format = CONF.backup_sha256file_format
+        self._zero_sha256s = {}
         self.support_force_delete = True
 
     # To create your own "chunked" backup driver, implement the following
@@ -202,7 +292,7 @@ class ChunkedBackupDriver(driver.BackupDriver):
         return filename
 
     def _write_metadata(self, backup, volume_id, container, object_list,
-                        volume_meta, extra_metadata=None):
+                        volume_meta, extra_metadata=None, holes=None):
         filename = self._metadata_filename(backup)
         LOG.debug('_write_metadata started, container name: %(container)s,'
                   ' metadata filename: %(filename)s.',
@@ -219,6 +309,12 @@ class ChunkedBackupDriver(driver.BackupDriver):
         metadata['volume_meta'] = volume_meta
         if extra_metadata:
             metadata['extra_metadata'] = extra_metadata
+        if holes:
+            metadata['version'] = self.SPARSE_DRIVER_VERSION
+            metadata['holes'] = holes
+        if any(obj.get('dedup') for entry in object_list
+               for obj in entry.values()):
+            metadata['version'] = self.DEDUP_DRIVER_VERSION
         metadata_json = json.dumps(metadata, sort_keys=True, indent=2)
         if six.PY3:
             metadata_json = metadata_json.encode('utf-8')
@@ -227,6 +323,10 @@ class ChunkedBackupDriver(driver.BackupDriver):
         LOG.debug('_write_metadata finished. Metadata: %s.', metadata_json)
 
     def _write_sha256file(self, backup, volume_id, container, sha256_list):
+        """Write the SHA256 of every hash block of the backup.
+
+        sha256_list holds the concatenated raw digests.
+        """
         filename = self._sha256_filename(backup)
         LOG.debug('_write_sha256file started, container name: %(container)s,'
                   ' sha256file filename: %(filename)s.',
@@ -239,7 +339,17 @@ class ChunkedBackupDriver(driver.BackupDriver):
         sha256file['backup_description'] = backup['display_description']
         sha256file['created_at'] = six.text_type(backup['created_at'])
         sha256file['chunk_size'] = self.sha_block_size_bytes
-        sha256file['sha256s'] = sha256_list
+        if self.sha256file_format == 'binary':
+            header_json = json.dumps(sha256file, sort_keys=True)
+            if six.PY3:
+                header_json = header_json.encode('utf-8')
+            with self.get_object_writer(container, filename) as writer:
+                writer.write(self.SHA256FILE_MAGIC + header_json + b'\n')
+                writer.write(bytes(sha256_list))
+            LOG.debug('_write_sha256file finished.')
+            return
+
+        sha256file['sha256s'] = self._hexlify_digests(sha256_list)
         sha256file_json = json.dumps(sha256file, sort_keys=True, indent=2)
         if six.PY3:
             sha256file_json = sha256file_json.encode('utf-8')
@@ -247,6 +357,11 @@ class ChunkedBackupDriver(driver.BackupDriver):
             writer.write(sha256file_json)
         LOG.debug('_write_sha256file finished.')
 
+    def _hexlify_digests(self, digests):
+        size = self.SHA256_DIGEST_SIZE
+        return [binascii.hexlify(digests[off:off + size]).decode('ascii')
+                for off in range(0, len(digests), size)]
+
     def _read_metadata(self, backup):
         container = backup['container']
         filename = self._metadata_filename(backup)
@@ -262,18 +377,57 @@ class ChunkedBackupDriver(driver.BackupDriver):
         return metadata
 
     def _read_sha256file(self, backup):
+        """Read the sha256 file of a backup.
+
+        The SHA256 of the hash blocks are returned as a list of hex strings
+        whatever the format of the file.
+        """
+        chunk_size, digests, sha256file = self._read_sha256_digests(backup)
+        if 'sha256s' not in sha256file:
+            sha256file['sha256s'] = self._hexlify_digests(digests.tobytes())
+        return sha256file
+
+    def _read_sha256_digests(self, backup):
+        """Read the sha256 file of a backup as raw digests.
+
+        Returns the hash block size, a memoryview of the concatenated raw
+        digests and the content of the file. Binary files are memory mapped
+        when the backup repository returns real files, and JSON files are
+        converted.
+        """
         container = backup['container']
         filename = self._sha256_filename(backup)
         LOG.debug('_read_sha256file started, container name: %(container)s, '
                   'sha256 filename: %(filename)s.',
                   {'container': container, 'filename': filename})
         with self.get_object_reader(container, filename) as reader:
-            sha256file_json = reader.read()
-        if six.PY3:
-            sha256file_json = sha256file_json.decode('utf-8')
-        sha256file = json.loads(sha256file_json)
+            try:
+                content = mmap.mmap(reader.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+                memoryview(content)
+            except Exception:
+                # Readers that are not backed by a file, and platforms that
+                # cannot take a memoryview of a mapping, get a plain read.
+                content = reader.read()
+
+        magic = self.SHA256FILE_MAGIC
+        if content[:len(magic)] == magic:
+            header_end = content.find(b'\n', len(magic))
+            header_json = content[len(magic):header_end]
+            if six.PY3:
+                header_json = header_json.decode('utf-8')
+            sha256file = json.loads(header_json)
+            digests = memoryview(content)[header_end + 1:]
+        else:
+            # Slicing turns a memory mapped file into bytes.
+            content = content[:]
+            if six.PY3:
+                content = content.decode('utf-8')
+            sha256file = json.loads(content)
+            digests = memoryview(
+                binascii.unhexlify(''.join(sha256file['sha256s'])))
         LOG.debug('_read_sha256file finished.')
-        return sha256file
+        return sha256file['chunk_size'], digests, sha256file
 
     def _prepare_backup(self, backup):
         """Prepare the backup process and return the backup metadata."""
@@ -302,8 +456,9 @@ class ChunkedBackupDriver(driver.BackupDriver):
                       'availability_zone': availability_zone,
                   })
         object_meta = {'id': 1, 'list': [], 'prefix': object_prefix,
-                       'volume_meta': None}
-        object_sha256 = {'id': 1, 'sha256s': [], 'prefix': object_prefix}
+                       'volume_meta': None, 'holes': []}
+        object_sha256 = {'id': 1, 'sha256s': bytearray(),
+                         'prefix': object_prefix}
         extra_metadata = self.get_extra_metadata(backup, volume)
         if extra_metadata is not None:
             object_meta['extra_metadata'] = extra_metadata
@@ -312,8 +467,24 @@ class ChunkedBackupDriver(driver.BackupDriver):
                 volume_size_bytes)
 
     def _backup_chunk(self, backup, container, data, data_offset,
-                      object_meta, extra_metadata):
+                      object_meta, extra_metadata, dedup_chunks=None):
         """Backup data chunk based on the object metadata and offset."""
+        object_name, entry = self._reserve_chunk_object(data, data_offset,
+                                                        object_meta)
+        self._upload_chunk(container, object_name, entry, data,
+                           extra_metadata, dedup_chunks)
+
+        LOG.debug('Calling eventlet.sleep(0)')
+        eventlet.sleep(0)
+
+    def _reserve_chunk_object(self, data, data_offset, object_meta):
+        """Allocate the next object name and its entry in the object list.
+
+        The entry is appended to the object list straight away so that the
+        order of the objects in the backup metadata only depends on the
+        order in which chunks are read, not on the order in which their
+        uploads complete.
+        """
         object_prefix = object_meta['prefix']
         object_list = object_meta['list']
 
@@ -323,31 +494,60 @@ class ChunkedBackupDriver(driver.BackupDriver):
         obj[object_name] = {}
         obj[object_name]['offset'] = data_offset
         obj[object_name]['length'] = len(data)
+        object_list.append(obj)
+        object_id += 1
+        object_meta['list'] = object_list
+        object_meta['id'] = object_id
+        return object_name, obj
+
+    def _upload_chunk(self, container, object_name, entry, data,
+                      extra_metadata, dedup_chunks=None):
+        """Compress and store a chunk reserved by _reserve_chunk_object.
+
+        If dedup_chunks is given, it maps the SHA256 of the chunks already
+        stored in the container to their object name and compression, and
+        a chunk found there is referenced instead of being uploaded.
+        """
+        obj = entry[object_name]
+        if dedup_chunks is not None:
+            sha256 = hashlib.sha256(data).hexdigest()
+            obj['dedup'] = True
+            obj['sha256'] = sha256
+            if sha256 in dedup_chunks:
+                stored_name, obj['compression'] = dedup_chunks[sha256]
+                obj['md5'] = hashlib.md5(data).hexdigest()
+                entry[stored_name] = entry.pop(object_name)
+                LOG.debug('Chunk %(object_name)s is stored as '
+                          '%(stored_name)s, skipping upload.',
+                          {'object_name': object_name,
+                           'stored_name': stored_name})
+                return
+
         LOG.debug('Backing up chunk of data from volume.')
         algorithm, output_data = self._prepare_output_data(data)
-        obj[object_name]['compression'] = algorithm
+        obj['compression'] = algorithm
         LOG.debug('About to put_object')
         with self.get_object_writer(
                 container, object_name, extra_metadata=extra_metadata
         ) as writer:
             writer.write(output_data)
         md5 = hashlib.md5(data).hexdigest()
-        obj[object_name]['md5'] = md5
+        obj['md5'] = md5
         LOG.debug('backup MD5 for %(object_name)s: %(md5)s',
                   {'object_name': object_name, 'md5': md5})
-        object_list.append(obj)
-        object_id += 1
-        object_meta['list'] = object_list
-        object_meta['id'] = object_id
-
-        LOG.debug('Calling eventlet.sleep(0)')
-        eventlet.sleep(0)
+        if dedup_chunks is not None:
+            dedup_chunks.setdefault(obj['sha256'], (object_name, algorithm))
 
     def _prepare_output_data(self, data):
         if self.compressor is None:
             return 'none', data
         data_size_bytes = len(data)
-        compressed_data = self.compressor.compress(data)
+        if self.max_chunks_in_flight > 1:
+            # Compression releases the GIL, so run it on a native thread to
+            # let other chunks be read and uploaded in the meantime.
+            compressed_data = tpool.execute(self.compressor.compress, data)
+        else:
+            compressed_data = self.compressor.compress(data)
         comp_size_bytes = len(compressed_data)
         algorithm = CONF.backup_compression_algorithm.lower()
         if comp_size_bytes >= data_size_bytes:
@@ -367,6 +567,187 @@ class ChunkedBackupDriver(driver.BackupDriver):
                    })
         return algorithm, compressed_data
 
+    def _calculate_sha(self, data):
+        """Calculate the SHA256 of each hash block of data.
+
+        Returns the concatenated raw digests.
+        """
+        view = memoryview(data)
+        return b''.join(
+            hashlib.sha256(view[off:off + self.sha_block_size_bytes]).digest()
+            for off in range(0, len(data), self.sha_block_size_bytes))
+
+    def _changed_blocks(self, digests, parent_digests, first_block):
+        """Compare the digests of a chunk with the ones of the parent.
+
+        Returns a list telling for each hash block of the chunk whether it
+        differs from the same block in the parent backup. The digests of
+        the whole chunk are compared at once first, since most chunks do
+        not change between backups.
+        """
+        size = self.SHA256_DIGEST_SIZE
+        start = first_block * size
+        parent = parent_digests[start:start + len(digests)].tobytes()
+        if parent == digests:
+            return [False] * (len(digests) // size)
+        return [digests[off:off + size] != parent[off:off + size]
+                for off in range(0, len(digests), size)]
+
+    def _zero_sha256(self, data, idx):
+        """Return the SHA256 digest of an all-zero hash block at index idx."""
+        length = min(self.sha_block_size_bytes,
+                     len(data) - idx * self.sha_block_size_bytes)
+        if length not in self._zero_sha256s:
+            self._zero_sha256s[length] = hashlib.sha256(
+                b'\0' * length).digest()
+        return self._zero_sha256s[length]
+
+    def _group_extents(self, blocks, datalen):
+        """Group consecutive hash blocks of the same kind into extents.
+
+        Yields (kind, (start, end)) tuples with the byte range of each run
+        of blocks.
+        """
+        idx = 0
+        for kind, run in itertools.groupby(blocks):
+            count = len(list(run))
+            start = idx * self.sha_block_size_bytes
+            idx += count
+            end = min(idx * self.sha_block_size_bytes, datalen)
+            yield kind, (start, end)
+
+    def _add_hole(self, object_meta, offset, length):
+        """Record an all-zero range, merging it with the previous hole."""
+        holes = object_meta['holes']
+        if holes and holes[-1]['offset'] + holes[-1]['length'] == offset:
+            holes[-1]['length'] += length
+        else:
+            holes.append({'offset': offset, 'length': length})
+
+    def _dedup_lock(self, container):
+        # Container names may contain slashes, which some coordination
+        # backends do not accept in lock names.
+        name = hashlib.sha256(container.encode('utf-8')).hexdigest()
+        return coordination.COORDINATOR.get_lock('backup-dedup-%s' % name)
+
+    def _read_dedup_index(self, container):
+        """Read the deduplication index of a container.
+
+        The index maps the name of every deduplicated chunk to its SHA256,
+        compression and reference count. It also lists the backups whose
+        references are counted and the backups that are in progress.
+        """
+        filename = self.DEDUP_INDEX_FILENAME
+        if filename not in self.get_container_entries(container, filename):
+            return {'chunks': {}, 'backups': [], 'active': {}}
+        with self.get_object_reader(container, filename) as reader:
+            index_json = reader.read()
+        if six.PY3:
+            index_json = index_json.decode('utf-8')
+        return json.loads(index_json)
+
+    def _write_dedup_index(self, container, index):
+        index_json = json.dumps(index, sort_keys=True)
+        if six.PY3:
+            index_json = index_json.encode('utf-8')
+        with self.get_object_writer(container,
+                                    self.DEDUP_INDEX_FILENAME) as writer:
+            writer.write(index_json)
+
+    def _start_dedup_backup(self, backup, container):
+        """Register a backup in progress and return the known chunks.
+
+        Chunks are not removed from the container while a backup is in
+        progress, so every chunk returned here can be referenced until the
+        backup is finalized.
+        """
+        with self._dedup_lock(container):
+            index = self._read_dedup_index(container)
+            index['active'][backup.id] = timeutils.utcnow().isoformat()
+            self._write_dedup_index(container, index)
+        return {chunk['sha256']: (name, chunk['compression'])
+                for name, chunk in index['chunks'].items()}
+
+    def _abort_dedup_backup(self, backup, container):
+        """Unregister a backup in progress that failed."""
+        with self._dedup_lock(container):
+            index = self._read_dedup_index(container)
+            if index['active'].pop(backup.id, None) is not None:
+                self._write_dedup_index(container, index)
+
+    def _expire_dedup_backups(self, index):
+        """Drop the backups in progress that have been abandoned."""
+        if not self.deduplication_active_timeout:
+            return
+        limit = timeutils.utcnow() - datetime.timedelta(
+            seconds=self.deduplication_active_timeout)
+        for backup_id, started in list(index['active'].items()):
+            started = timeutils.normalize_time(
+                timeutils.parse_isotime(started))
+            if started < limit:
+                LOG.warning('Backup %(id)s has been in progress since '
+                            '%(started)s, ignoring it when removing '
+                            'unreferenced deduplicated chunks.',
+                            {'id': backup_id, 'started': started})
+                del index['active'][backup_id]
+
+    def _commit_dedup_references(self, backup, container, object_list):
+        """Count the references of a finalized backup in the index."""
+        dedup_objects = {}
+        for entry in object_list:
+            for name, obj in entry.items():
+                if obj.get('dedup'):
+                    dedup_objects[name] = obj
+        with self._dedup_lock(container):
+            index = self._read_dedup_index(container)
+            chunks = index['chunks']
+            for name, obj in dedup_objects.items():
+                chunk = chunks.setdefault(name, {
+                    'sha256': obj['sha256'],
+                    'compression': obj['compression'],
+                    'refs': 0})
+                chunk['refs'] += 1
+            index['backups'].append(backup.id)
+            index['active'].pop(backup.id, None)
+            self._write_dedup_index(container, index)
+
+    def _release_dedup_references(self, backup, container):
+        """Drop the references of a backup from the index.
+
+        Returns the names of the chunks that are still indexed, which must
+        be kept, and the names of the chunks that are no longer referenced
+        by any backup, which can be deleted.
+        """
+        with self._dedup_lock(container):
+            index = self._read_dedup_index(container)
+            chunks = index['chunks']
+            if (backup.id not in index['backups'] and
+                    backup.id not in index['active']):
+                return set(chunks), []
+            if backup.id in index['backups']:
+                metadata = self._read_metadata(backup)
+                referenced = set(name for entry in metadata['objects']
+                                 for name, obj in entry.items()
+                                 if obj.get('dedup'))
+                for name in referenced:
+                    if name in chunks:
+                        chunks[name]['refs'] -= 1
+                index['backups'].remove(backup.id)
+            index['active'].pop(backup.id, None)
+            self._expire_dedup_backups(index)
+
+            unreferenced = []
+            # Backups in progress may be about to reference chunks that
+            # no longer have references, so only remove them when no
+            # backup is running.
+            if not index['active']:
+                unreferenced = [name for name, chunk in chunks.items()
+                                if chunk['refs'] <= 0]
+                for name in unreferenced:
+                    del chunks[name]
+            self._write_dedup_index(container, index)
+        return set(chunks), unreferenced
+
     def _finalize_backup(self, backup, container, object_meta, object_sha256):
         """Write the backup's metadata to the backup repository."""
         object_list = object_meta['list']
@@ -374,6 +755,7 @@ class ChunkedBackupDriver(driver.BackupDriver):
         volume_meta = object_meta['volume_meta']
         sha256_list = object_sha256['sha256s']
         extra_metadata = object_meta.get('extra_metadata')
+        holes = object_meta.get('holes')
         self._write_sha256file(backup,
                                backup.volume_id,
                                container,
@@ -383,7 +765,10 @@ class ChunkedBackupDriver(driver.BackupDriver):
                              container,
                              object_list,
                              volume_meta,
-                             extra_metadata)
+                             extra_metadata,
+                             holes)
+        if self.deduplication:
+            self._commit_dedup_references(backup, container, object_list)
         backup.object_count = object_id
         backup.save()
         LOG.debug('backup %s finished.', backup['id'])
@@ -421,6 +806,34 @@ class ChunkedBackupDriver(driver.BackupDriver):
                                                extra_usage_info=
                                                object_meta)
 
+    def _read_parent_backup_digests(self, backup):
+        """Read the sha256 digests of the parent of an incremental backup.
+
+        Returns the parent backup and its raw digests, or (None, None) for
+        a full backup.
+        """
+        if not backup.parent_id:
+            return None, None
+
+        parent_backup = objects.Backup.get_by_id(self.context,
+                                                 backup.parent_id)
+        (parent_chunk_size, parent_backup_digests,
+         _sha256file) = self._read_sha256_digests(parent_backup)
+        if parent_chunk_size != self.sha_block_size_bytes:
+            err = (_('Hash block size has changed since the last '
+                     'backup. New hash block size: %(new)s. Old hash '
+                     'block size: %(old)s. Do a full backup.')
+                   % {'old': parent_chunk_size,
+                      'new': self.sha_block_size_bytes})
+            raise exception.InvalidBackup(reason=err)
+        # If the volume size increased since the last backup, fail
+        # the incremental backup and ask user to do a full backup.
+        if backup.size > parent_backup.size:
+            err = _('Volume size increased since the last '
+                    'backup. Do a full backup.')
+            raise exception.InvalidBackup(reason=err)
+        return parent_backup, parent_backup_digests
+
     def backup(self, backup, volume_file, backup_metadata=True):
         """Backup the given volume.
 
@@ -432,33 +845,16 @@ class ChunkedBackupDriver(driver.BackupDriver):
                     'block size for creating hash.')
             raise exception.InvalidBackup(reason=err)
 
-        # Read the shafile of the parent backup if backup['parent_id']
-        # is given.
-        parent_backup_shafile = None
-        parent_backup = None
-        if backup.parent_id:
-            parent_backup = objects.Backup.get_by_id(self.context,
-                                                     backup.parent_id)
-            parent_backup_shafile = self._read_sha256file(parent_backup)
-            parent_backup_shalist = parent_backup_shafile['sha256s']
-            if (parent_backup_shafile['chunk_size'] !=
-                    self.sha_block_size_bytes):
-                err = (_('Hash block size has changed since the last '
-                         'backup. New hash block size: %(new)s. Old hash '
-                         'block size: %(old)s. Do a full backup.')
-                       % {'old': parent_backup_shafile['chunk_size'],
-                          'new': self.sha_block_size_bytes})
-                raise exception.InvalidBackup(reason=err)
-            # If the volume size increased since the last backup, fail
-            # the incremental backup and ask user to do a full backup.
-            if backup.size > parent_backup.size:
-                err = _('Volume size increased since the last '
-                        'backup. Do a full backup.')
-                raise exception.InvalidBackup(reason=err)
+        parent_backup, parent_backup_digests = (
+            self._read_parent_backup_digests(backup))
 
         (object_meta, object_sha256, extra_metadata, container,
          volume_size_bytes) = self._prepare_backup(backup)
 
+        dedup_chunks = None
+        if self.deduplication:
+            dedup_chunks = self._start_dedup_backup(backup, container)
+
         counter = 0
         total_block_sent_num = 0
 
@@ -480,86 +876,123 @@ class ChunkedBackupDriver(driver.BackupDriver):
         sha256_list = object_sha256['sha256s']
         shaindex = 0
         is_backup_canceled = False
-        while True:
-            # First of all, we check the status of this backup. If it
-            # has been changed to delete or has been deleted, we cancel the
-            # backup process to do forcing delete.
-            backup = objects.Backup.get_by_id(self.context, backup.id)
-            if backup.status in (fields.BackupStatus.DELETING,
-                                 fields.BackupStatus.DELETED):
-                is_backup_canceled = True
-                # To avoid the chunk left when deletion complete, need to
-                # clean up the object of chunk again.
-                self.delete_backup(backup)
-                LOG.debug('Cancel the backup process of %s.', backup.id)
-                break
-            data_offset = volume_file.tell()
-            data = volume_file.read(self.chunk_size_bytes)
-            if data == b'':
-                break
-
-            # Calculate new shas with the datablock.
-            shalist = []
-            off = 0
-            datalen = len(data)
-            while off < datalen:
-                chunk_start = off
-                chunk_end = chunk_start + self.sha_block_size_bytes
-                if chunk_end > datalen:
-                    chunk_end = datalen
-                chunk = data[chunk_start:chunk_end]
-                sha = hashlib.sha256(chunk).hexdigest()
-                shalist.append(sha)
-                off += self.sha_block_size_bytes
-            sha256_list.extend(shalist)
-
-            # If parent_backup is not None, that means an incremental
-            # backup will be performed.
-            if parent_backup:
-                # Find the extent that needs to be backed up.
-                extent_off = -1
-                for idx, sha in enumerate(shalist):
-                    if sha != parent_backup_shalist[shaindex]:
-                        if extent_off == -1:
-                            # Start of new extent.
-                            extent_off = idx * self.sha_block_size_bytes
+        pipelined = self.max_chunks_in_flight > 1
+        pool = eventlet.GreenPool(self.max_chunks_in_flight)
+        in_flight = collections.deque()
+
+        def _submit_chunk(segment, segment_offset):
+            if not pipelined:
+                self._backup_chunk(backup, container, segment,
+                                   segment_offset, object_meta,
+                                   extra_metadata, dedup_chunks)
+                return
+            # The object name and metadata entry are reserved in read
+            # order, so the stored objects and the backup metadata are the
+            # same as for a serial backup.
+            object_name, entry = self._reserve_chunk_object(segment,
+                                                            segment_offset,
+                                                            object_meta)
+            # Waiting on the oldest upload bounds the memory used by the
+            # pipeline and reports failures in chunk order.
+            while len(in_flight) >= self.max_chunks_in_flight:
+                in_flight.popleft().wait()
+            in_flight.append(pool.spawn(self._upload_chunk, container,
+                                        object_name, entry, segment,
+                                        extra_metadata, dedup_chunks))
+
+        def _wait_for_chunks():
+            while in_flight:
+                in_flight.popleft().wait()
+
+        try:
+            while True:
+                # First of all, we check the status of this backup. If it
+                # has been changed to delete or has been deleted, we cancel
+                # the backup process to do forcing delete.
+                backup = objects.Backup.get_by_id(self.context, backup.id)
+                if backup.status in (fields.BackupStatus.DELETING,
+                                     fields.BackupStatus.DELETED):
+                    is_backup_canceled = True
+                    # Let the uploads in flight finish so that no chunk is
+                    # written after the clean up below.
+                    _wait_for_chunks()
+                    # To avoid the chunk left when deletion complete, need
+                    # to clean up the object of chunk again.
+                    self.delete_backup(backup)
+                    LOG.debug('Cancel the backup process of %s.', backup.id)
+                    break
+                data_offset = volume_file.tell()
+                if pipelined:
+                    data = tpool.execute(volume_file.read,
+                                         self.chunk_size_bytes)
+                else:
+                    data = volume_file.read(self.chunk_size_bytes)
+                if data == b'':
+                    break
+
+                # Calculate new shas with the datablock.
+                if pipelined:
+                    digests = tpool.execute(self._calculate_sha, data)
+                else:
+                    digests = self._calculate_sha(data)
+                sha256_list.extend(digests)
+                datalen = len(data)
+                if parent_backup:
+                    changed = self._changed_blocks(digests,
+                                                   parent_backup_digests,
+                                                   shaindex)
+
+                # Classify every hash block of the chunk. Blocks that did
+                # not change since the parent backup are skipped, all-zero
+                # blocks are recorded as holes when sparse detection is
+                # enabled, and every run of remaining blocks is stored as
+                # one object.
+                size = self.SHA256_DIGEST_SIZE
+                blocks = []
+                for idx in range(len(digests) // size):
+                    if parent_backup and not changed[idx]:
+                        blocks.append(None)
+                    elif (self.sparse_detection and
+                          digests[idx * size:(idx + 1) * size] ==
+                          self._zero_sha256(data, idx)):
+                        blocks.append('hole')
                     else:
-                        if extent_off != -1:
-                            # We've reached the end of extent.
-                            extent_end = idx * self.sha_block_size_bytes
-                            segment = data[extent_off:extent_end]
-                            self._backup_chunk(backup, container, segment,
-                                               data_offset + extent_off,
-                                               object_meta,
-                                               extra_metadata)
-                            extent_off = -1
+                        blocks.append('data')
                     shaindex += 1
 
-                # The last extent extends to the end of data buffer.
-                if extent_off != -1:
-                    extent_end = datalen
-                    segment = data[extent_off:extent_end]
-                    self._backup_chunk(backup, container, segment,
+                for kind, extent in self._group_extents(blocks, datalen):
+                    extent_off, extent_end = extent
+                    if kind == 'data':
+                        segment = data[extent_off:extent_end]
+                        _submit_chunk(segment, data_offset + extent_off)
+                    elif kind == 'hole':
+                        self._add_hole(object_meta,
                                        data_offset + extent_off,
-                                       object_meta, extra_metadata)
-                    extent_off = -1
-            else:  # Do a full backup.
-                self._backup_chunk(backup, container, data, data_offset,
-                                   object_meta, extra_metadata)
-
-            # Notifications
-            total_block_sent_num += self.data_block_num
-            counter += 1
-            if counter == self.data_block_num:
-                # Send the notification to Ceilometer when the chunk
-                # number reaches the data_block_num.  The backup percentage
-                # is put in the metadata as the extra information.
-                self._send_progress_notification(self.context, backup,
-                                                 object_meta,
-                                                 total_block_sent_num,
-                                                 volume_size_bytes)
-                # Reset the counter
-                counter = 0
+                                       extent_end - extent_off)
+
+                # Notifications
+                total_block_sent_num += self.data_block_num
+                counter += 1
+                if counter == self.data_block_num:
+                    # Send the notification to Ceilometer when the chunk
+                    # number reaches the data_block_num.  The backup
+                    # percentage is put in the metadata as the extra
+                    # information.
+                    self._send_progress_notification(self.context, backup,
+                                                     object_meta,
+                                                     total_block_sent_num,
+                                                     volume_size_bytes)
+                    # Reset the counter
+                    counter = 0
+
+            _wait_for_chunks()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for thread in in_flight:
+                    thread.kill()
+                timer.stop()
+                if dedup_chunks is not None:
+                    self._abort_dedup_backup(backup, container)
 
         # Stop the timer.
         timer.stop()
@@ -580,7 +1013,13 @@ class ChunkedBackupDriver(driver.BackupDriver):
                     LOG.exception("Backup volume metadata failed.")
                     self.delete_backup(backup)
 
-        self._finalize_backup(backup, container, object_meta, object_sha256)
+        try:
+            self._finalize_backup(backup, container, object_meta,
+                                  object_sha256)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                if dedup_chunks is not None:
+                    self._abort_dedup_backup(backup, container)
 
     def _restore_v1(self, backup, volume_id, metadata, volume_file):
         """Restore a v1 volume backup."""
@@ -590,65 +1029,137 @@ class ChunkedBackupDriver(driver.BackupDriver):
         container = backup['container']
         metadata_objects = metadata['objects']
         metadata_object_names = []
+        # Deduplicated chunks may be stored under the prefix of another
+        # backup and chunks of this backup may be used by other backups, so
+        # they are left out of the comparison with the container entries.
+        dedup_object_names = set()
         for obj in metadata_objects:
-            metadata_object_names.extend(obj.keys())
+            for object_name, object_info in obj.items():
+                if object_info.get('dedup'):
+                    dedup_object_names.add(object_name)
+                else:
+                    metadata_object_names.append(object_name)
         LOG.debug('metadata_object_names = %s.', metadata_object_names)
         prune_list = [self._metadata_filename(backup),
                       self._sha256_filename(backup)]
         object_names = [object_name for object_name in
                         self._generate_object_names(backup)
-                        if object_name not in prune_list]
+                        if object_name not in prune_list and
+                        object_name not in dedup_object_names]
         if sorted(object_names) != sorted(metadata_object_names):
             err = _('restore_backup aborted, actual object list '
                     'does not match object list stored in metadata.')
             raise exception.InvalidBackup(reason=err)
 
-        for metadata_object in metadata_objects:
-            object_name, obj = list(metadata_object.items())[0]
-            LOG.debug('restoring object. backup: %(backup_id)s, '
-                      'container: %(container)s, object name: '
-                      '%(object_name)s, volume: %(volume_id)s.',
-                      {
-                          'backup_id': backup_id,
-                          'container': container,
-                          'object_name': object_name,
-                          'volume_id': volume_id,
-                      })
-
-            with self.get_object_reader(
-                    container, object_name,
-                    extra_metadata=extra_metadata) as reader:
-                body = reader.read()
-            compression_algorithm = metadata_object[object_name]['compression']
-            decompressor = self._get_compressor(compression_algorithm)
-            volume_file.seek(obj['offset'])
-            if decompressor is not None:
-                LOG.debug('decompressing data using %s algorithm',
-                          compression_algorithm)
-                decompressed = decompressor.decompress(body)
-                volume_file.write(decompressed)
+        # Objects are fetched and decompressed by a pool of green threads
+        # up to restore_max_objects_in_flight ahead of the object being
+        # written, while writes to the volume are still done in order.
+        prefetching = self.restore_max_objects_in_flight > 1
+        pool = eventlet.GreenPool(self.restore_max_objects_in_flight)
+        in_flight = collections.deque()
+
+        def _write_next():
+            offset, fetch = in_flight.popleft()
+            data = fetch.wait()
+            if prefetching:
+                tpool.execute(self._write_restore_data, volume_file,
+                              offset, data)
             else:
-                volume_file.write(body)
-
-            # force flush every write to avoid long blocking write on close
-            volume_file.flush()
+                self._write_restore_data(volume_file, offset, data)
 
-            # Be tolerant to IO implementations that do not support fileno()
-            try:
-                fileno = volume_file.fileno()
-            except IOError:
-                LOG.info("volume_file does not support fileno() so skipping "
-                         "fsync()")
-            else:
-                os.fsync(fileno)
+            # Restoring a backup to a volume can take some time. Yield so
+            # other threads can run, allowing for among other things the
+            # service status to be updated
+            eventlet.sleep(0)
 
-            # Restoring a backup to a volume can take some time. Yield so other
-            # threads can run, allowing for among other things the service
-            # status to be updated
+        try:
+            for metadata_object in metadata_objects:
+                object_name, obj = list(metadata_object.items())[0]
+                LOG.debug('restoring object. backup: %(backup_id)s, '
+                          'container: %(container)s, object name: '
+                          '%(object_name)s, volume: %(volume_id)s.',
+                          {
+                              'backup_id': backup_id,
+                              'container': container,
+                              'object_name': object_name,
+                              'volume_id': volume_id,
+                          })
+                in_flight.append((obj['offset'],
+                                  pool.spawn(self._fetch_restore_data,
+                                             container, object_name, obj,
+                                             extra_metadata)))
+                if len(in_flight) >= self.restore_max_objects_in_flight:
+                    _write_next()
+
+            while in_flight:
+                _write_next()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for _offset, fetch in in_flight:
+                    fetch.kill()
+
+        for hole in metadata.get('holes', []):
+            self._restore_hole(volume_file, hole['offset'], hole['length'])
             eventlet.sleep(0)
+
         LOG.debug('v1 volume backup restore of %s finished.',
                   backup_id)
 
+    def _fetch_restore_data(self, container, object_name, obj,
+                            extra_metadata):
+        """Read a backup object and return its decompressed data."""
+        with self.get_object_reader(
+                container, object_name,
+                extra_metadata=extra_metadata) as reader:
+            body = reader.read()
+        compression_algorithm = obj['compression']
+        decompressor = self._get_compressor(compression_algorithm)
+        if decompressor is None:
+            return body
+        LOG.debug('decompressing data using %s algorithm',
+                  compression_algorithm)
+        return tpool.execute(decompressor.decompress, body)
+
+    def _write_restore_data(self, volume_file, offset, data):
+        """Write restored data to the volume at the given offset."""
+        volume_file.seek(offset)
+        volume_file.write(data)
+
+        # force flush every write to avoid long blocking write on close
+        volume_file.flush()
+
+        # Be tolerant to IO implementations that do not support fileno()
+        try:
+            fileno = volume_file.fileno()
+        except IOError:
+            LOG.info("volume_file does not support fileno() so skipping "
+                     "fsync()")
+        else:
+            os.fsync(fileno)
+
+    def _restore_hole(self, volume_file, offset, length):
+        """Make a range of the volume read back as zeroes.
+
+        RBD images are discarded. Any other volume may hold stale data, so
+        zeroes are written there, reusing a single buffer.
+        """
+        LOG.debug('restoring hole of %(length)d bytes at offset %(offset)d.',
+                  {'length': length, 'offset': offset})
+        if hasattr(volume_file, 'rbd_image'):
+            volume_file.rbd_image.discard(offset, length)
+            return
+
+        zeroes = b'\0' * min(length, self.chunk_size_bytes)
+        volume_file.seek(offset)
+        remaining = length
+        while remaining:
+            if remaining < len(zeroes):
+                zeroes = zeroes[:remaining]
+            volume_file.write(zeroes)
+            remaining -= len(zeroes)
+            eventlet.sleep(0)
+        volume_file.flush()
+
     def restore(self, backup, volume_id, volume_file):
         """Restore the given volume backup from backup repository."""
         backup_id = backup['id']
@@ -726,6 +1237,15 @@ class ChunkedBackupDriver(driver.BackupDriver):
                 LOG.warning('Error while listing objects, continuing'
                             ' with delete.')
 
+            if self.deduplication:
+                indexed, unreferenced = self._release_dedup_references(
+                    backup, container)
+                object_names = [object_name for object_name in object_names
+                                if object_name not in indexed]
+                object_names.extend(object_name for object_name in
+                                    unreferenced
+                                    if object_name not in object_names)
+
             for object_name in object_names:
                 self.delete_object(container, object_name)
                 LOG.debug('deleted object: %(object_name)s'
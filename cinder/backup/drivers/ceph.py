@@ -62,6 +62,7 @@ from cinder.i18n import _
 from cinder import interface
 from cinder import utils
 import cinder.volume.drivers.rbd as rbd_driver
+from cinder.volume import utils as volume_utils
 
 try:
     import rados
@@ -331,7 +332,26 @@ class CephBackupDriver(driver.BackupDriver):
                     volume.write(zeroes)
                     volume.flush()
 
-    def _transfer_data(self, src, src_name, dest, dest_name, length):
+    def _write_data(self, dest, data, dest_is_zeroed):
+        """Write a chunk of data to dest, skipping it if it is all zeroes.
+
+        All-zero chunks are skipped if the destination is known to read back
+        zeroes, e.g. a newly created RBD image, or discarded if the
+        destination is an RBD image. Anything else is written as is.
+        """
+        if ((dest_is_zeroed or self._file_is_rbd(dest)) and
+                volume_utils.is_all_zero(data)):
+            offset = dest.tell()
+            if not dest_is_zeroed:
+                self._discard_bytes(dest, offset, len(data))
+            dest.seek(offset + len(data))
+            return
+
+        dest.write(data)
+        dest.flush()
+
+    def _transfer_data(self, src, src_name, dest, dest_name, length,
+                       dest_is_zeroed=False):
         """Transfer data between files (Python IO objects)."""
         LOG.debug("Transferring data between '%(src)s' and '%(dest)s'",
                   {'src': src_name, 'dest': dest_name})
@@ -352,8 +372,7 @@ class CephBackupDriver(driver.BackupDriver):
 
                 return
 
-            dest.write(data)
-            dest.flush()
+            self._write_data(dest, data, dest_is_zeroed)
             delta = (time.time() - before)
             rate = (self.chunk_size / delta) / 1024
             LOG.debug("Transferred chunk %(chunk)s of %(chunks)s "
@@ -373,8 +392,7 @@ class CephBackupDriver(driver.BackupDriver):
                 if CONF.restore_discard_excess_bytes:
                     self._discard_bytes(dest, dest.tell(), rem)
             else:
-                dest.write(data)
-                dest.flush()
+                self._write_data(dest, data, dest_is_zeroed)
                 # yield to any other pending backups
                 eventlet.sleep(0)
 
@@ -749,8 +767,10 @@ class CephBackupDriver(driver.BackupDriver):
                                                      self._ceph_backup_user,
                                                      self._ceph_backup_conf)
                 rbd_fd = linuxrbd.RBDVolumeIOWrapper(rbd_meta)
+                # The backup image has just been created, so all-zero chunks
+                # of the volume do not need to be written to it.
                 self._transfer_data(src_volume, src_name, rbd_fd, backup_name,
-                                    length)
+                                    length, dest_is_zeroed=True)
             finally:
                 dest_rbd.close()
 
@@ -17,9 +17,11 @@
 LVM class for performing LVM operations.
 """
 
+import functools
 import math
 import os
 import re
+import time
 
 from os_brick import executor
 from oslo_concurrency import processutils as putils
@@ -34,6 +36,17 @@ from cinder import utils
 LOG = logging.getLogger(__name__)
 
 
+def _invalidates_lv_cache(f):
+    """Drop the cached LV attributes once the decorated method returns."""
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return f(self, *args, **kwargs)
+        finally:
+            self._invalidate_lv_cache()
+    return wrapper
+
+
 class LVM(executor.Executor):
     """LVM object to enable various LVM related operations."""
     LVM_CMD_PREFIX = ['env', 'LC_ALL=C']
@@ -42,7 +55,7 @@ class LVM(executor.Executor):
     def __init__(self, vg_name, root_helper, create_vg=False,
                  physical_volumes=None, lvm_type='default',
                  executor=putils.execute, lvm_conf=None,
-                 suppress_fd_warn=False):
+                 suppress_fd_warn=False, lv_cache_ttl=0):
 
         """Initialize the LVM object.
 
@@ -57,6 +70,9 @@ class LVM(executor.Executor):
         :param lvm_type: VG and Volume type (default, or thin)
         :param executor: Execute method to use, None uses common/processutils
         :param suppress_fd_warn: Add suppress FD Warn to LVM env
+        :param lv_cache_ttl: Seconds the attributes of all the LVs, read with
+                             a single lvs call, are reused for; 0 disables
+                             the cache
 
         """
         super(LVM, self).__init__(execute=executor, root_helper=root_helper)
@@ -72,6 +88,12 @@ class LVM(executor.Executor):
         self._supports_snapshot_lv_activation = None
         self._supports_lvchange_ignoreskipactivation = None
         self.vg_provisioned_capacity = 0.0
+        self._lv_cache_ttl = lv_cache_ttl
+        self._lv_cache = None
+        self._lv_cache_time = 0
+        # Bumped on each invalidation, so that a refresh that was running
+        # meanwhile does not store what it read.
+        self._lv_cache_generation = 0
 
         if lvm_type not in ['default', 'thin']:
             raise exception.Invalid('lvm_type must be "default" or "thin"')
@@ -332,12 +354,65 @@ class LVM(executor.Executor):
         :returns: dict representation of Logical Volume if exists
 
         """
+        if self._lv_cache_ttl:
+            lv = self._get_cached_lvs().get(name)
+            if lv is not None:
+                return {'vg': self.vg_name, 'name': name, 'size': lv['size']}
+
         ref_list = self.get_volumes(name)
         for r in ref_list:
             if r['name'] == name:
                 return r
         return None
 
+    def _get_cached_lvs(self, refresh=False):
+        """Get the attributes of all the LVs of the VG, by name.
+
+        They are read with a single lvs call and reused for lv_cache_ttl
+        seconds, or until an LV is changed through this object.
+        """
+        if (refresh or self._lv_cache is None or
+                time.time() - self._lv_cache_time > self._lv_cache_ttl):
+            generation = self._lv_cache_generation
+            field_sep = '|'
+            cmd = LVM.LVM_CMD_PREFIX + ['lvs', '--noheadings', '--unit=g',
+                                        '-o', 'name,size,attr,origin',
+                                        '--separator', field_sep,
+                                        '--nosuffix', self.vg_name]
+            (out, _err) = self._execute(*cmd,
+                                        root_helper=self._root_helper,
+                                        run_as_root=True)
+            lvs = {}
+            for line in out.split('\n'):
+                fields = line.strip().split(field_sep)
+                if len(fields) != 4:
+                    continue
+                lvs[fields[0]] = {'size': fields[1],
+                                  'attr': fields[2],
+                                  'origin': fields[3] or None}
+            if generation != self._lv_cache_generation:
+                return lvs
+            self._lv_cache = lvs
+            self._lv_cache_time = time.time()
+        return self._lv_cache
+
+    def _invalidate_lv_cache(self):
+        self._lv_cache = None
+        self._lv_cache_generation += 1
+
+    def _get_lv_attr(self, name):
+        if self._lv_cache_ttl:
+            lv = self._get_cached_lvs().get(name)
+            if lv is not None:
+                return lv['attr']
+
+        cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
+                                    'Attr', '%s/%s' % (self.vg_name, name)]
+        out, _err = self._execute(*cmd,
+                                  root_helper=self._root_helper,
+                                  run_as_root=True)
+        return out.strip()
+
     @staticmethod
     def get_all_physical_volumes(root_helper, vg_name=None):
         """Static method to get all PVs on a system.
@@ -450,8 +525,12 @@ class LVM(executor.Executor):
             # We need info on both the thin pool and the volumes,
             # therefore we should provide only self.vg_name, but not
             # self.vg_thin_pool here.
-            for lv in self.get_lv_info(self._root_helper,
-                                       self.vg_name):
+            if self._lv_cache_ttl:
+                lvs = [{'name': name, 'size': lv['size']} for name, lv in
+                       self._get_cached_lvs(refresh=True).items()]
+            else:
+                lvs = self.get_lv_info(self._root_helper, self.vg_name)
+            for lv in lvs:
                 lvsize = lv['size']
                 # get_lv_info runs "lvs" command with "--nosuffix".
                 # This removes "g" from "1.00g" and only outputs "1.00".
@@ -491,6 +570,7 @@ class LVM(executor.Executor):
         # leave 5% free for metadata
         return "%sg" % (self.vg_free_space * 0.95)
 
+    @_invalidates_lv_cache
     def create_thin_pool(self, name=None, size_str=None):
         """Creates a thin provisioning pool for this VG.
 
@@ -532,6 +612,7 @@ class LVM(executor.Executor):
         self.vg_thin_pool = name
         return size_str
 
+    @_invalidates_lv_cache
     def create_volume(self, name, size_str, lv_type='default', mirror_count=0):
         """Creates a logical volume on the object's VG.
 
@@ -574,6 +655,7 @@ class LVM(executor.Executor):
             raise
 
     @utils.retry(putils.ProcessExecutionError)
+    @_invalidates_lv_cache
     def create_lv_snapshot(self, name, source_lv_name, lv_type='default'):
         """Creates a snapshot of a logical volume.
 
@@ -612,17 +694,13 @@ class LVM(executor.Executor):
         return '_' + name
 
     def _lv_is_active(self, name):
-        cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
-                                    'Attr', '%s/%s' % (self.vg_name, name)]
-        out, _err = self._execute(*cmd,
-                                  root_helper=self._root_helper,
-                                  run_as_root=True)
+        out = self._get_lv_attr(name)
         if out:
-            out = out.strip()
             if (out[4] == 'a'):
                 return True
         return False
 
+    @_invalidates_lv_cache
     def deactivate_lv(self, name):
         lv_path = self.vg_name + '/' + self._mangle_lv_name(name)
         cmd = ['lvchange', '-a', 'n']
@@ -647,12 +725,14 @@ class LVM(executor.Executor):
     def _wait_for_volume_deactivation(self, name):
         LOG.debug("Checking to see if volume %s has been deactivated.",
                   name)
+        self._invalidate_lv_cache()
         if self._lv_is_active(name):
             LOG.debug("Volume %s is still active.", name)
             raise exception.VolumeNotDeactivated(name=name)
         else:
             LOG.debug("Volume %s has been deactivated.", name)
 
+    @_invalidates_lv_cache
     def activate_lv(self, name, is_snapshot=False, permanent=False):
         """Ensure that logical volume/snapshot logical volume is activated.
 
@@ -697,6 +777,7 @@ class LVM(executor.Executor):
             raise
 
     @utils.retry(putils.ProcessExecutionError)
+    @_invalidates_lv_cache
     def delete(self, name):
         """Delete logical volume or snapshot.
 
@@ -743,6 +824,7 @@ class LVM(executor.Executor):
             LOG.debug('Successfully deleted volume: %s after '
                       'udev settle.', name)
 
+    @_invalidates_lv_cache
     def revert(self, snapshot_name):
         """Revert an LV to snapshot.
 
@@ -761,25 +843,15 @@ class LVM(executor.Executor):
             raise
 
     def lv_has_snapshot(self, name):
-        cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
-                                    'Attr', '%s/%s' % (self.vg_name, name)]
-        out, _err = self._execute(*cmd,
-                                  root_helper=self._root_helper,
-                                  run_as_root=True)
+        out = self._get_lv_attr(name)
         if out:
-            out = out.strip()
             if (out[0] == 'o') or (out[0] == 'O'):
                 return True
         return False
 
     def lv_is_snapshot(self, name):
         """Return True if LV is a snapshot, False otherwise."""
-        cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
-                                    'Attr', '%s/%s' % (self.vg_name, name)]
-        out, _err = self._execute(*cmd,
-                                  root_helper=self._root_helper,
-                                  run_as_root=True)
-        out = out.strip()
+        out = self._get_lv_attr(name)
         if out:
             if (out[0] == 's'):
                 return True
@@ -787,12 +859,7 @@ class LVM(executor.Executor):
 
     def lv_is_open(self, name):
         """Return True if LV is currently open, False otherwise."""
-        cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
-                                    'Attr', '%s/%s' % (self.vg_name, name)]
-        out, _err = self._execute(*cmd,
-                                  root_helper=self._root_helper,
-                                  run_as_root=True)
-        out = out.strip()
+        out = self._get_lv_attr(name)
         if out:
             if (out[5] == 'o'):
                 return True
@@ -800,6 +867,11 @@ class LVM(executor.Executor):
 
     def lv_get_origin(self, name):
         """Return the origin of an LV that is a snapshot, None otherwise."""
+        if self._lv_cache_ttl:
+            lv = self._get_cached_lvs().get(name)
+            if lv is not None:
+                return lv['origin']
+
         cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
                                     'Origin', '%s/%s' % (self.vg_name, name)]
         out, _err = self._execute(*cmd,
@@ -810,6 +882,7 @@ class LVM(executor.Executor):
             return out
         return None
 
+    @_invalidates_lv_cache
     def extend_volume(self, lv_name, new_size):
         """Extend the size of an existing volume."""
         # Volumes with snaps have attributes 'o' or 'O' and will be
@@ -857,6 +930,7 @@ class LVM(executor.Executor):
     def vg_mirror_size(self, mirror_count):
         return (self.vg_free_space / (mirror_count + 1))
 
+    @_invalidates_lv_cache
     def rename_volume(self, lv_name, new_name):
         """Change the name of an existing volume."""
 
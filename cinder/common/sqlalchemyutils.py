@@ -56,6 +56,48 @@ def _get_default_column_value(model, column_name):
     return _TYPE_SCHEMA[attr_type.__visit_name__]
 
 
+def _is_nullable(model_attr):
+    """Return whether the column behind a model attribute accepts NULL."""
+    try:
+        return model_attr.property.columns[0].nullable
+    except (AttributeError, IndexError):
+        return True
+
+
+def _get_marker_attr(model, column_name):
+    """Return the expression used to compare a column with the marker.
+
+    NULL values of nullable columns are compared as the column default, which
+    requires a CASE expression that no index can serve, so columns that can't
+    be NULL are compared directly.
+    """
+    model_attr = getattr(model, column_name)
+    if not _is_nullable(model_attr):
+        return model_attr
+    default = _get_default_column_value(model, column_name)
+    return sa_sql.expression.case([(model_attr.isnot(None), model_attr), ],
+                                  else_=default)
+
+
+def _get_leading_criterion(model, column_name, sort_dir, marker_value):
+    """Return an index friendly bound on the leading sort key.
+
+    The bound is implied by the full marker criteria, but it is expressed on
+    the bare column so the database can start a range scan on an index that
+    leads with the sort key instead of reading every row up to the marker.
+    """
+    model_attr = getattr(model, column_name)
+    if sort_dir == 'desc':
+        criterion = model_attr <= marker_value
+    else:
+        criterion = model_attr >= marker_value
+    if _is_nullable(model_attr):
+        # NULL values are compared as the column default, so they may still
+        # follow the marker.
+        criterion = sqlalchemy.sql.or_(criterion, model_attr.is_(None))
+    return criterion
+
+
 # TODO(wangxiyuan): Use oslo_db.sqlalchemy.utils.paginate_query once it is
 # stable and afforded by the minimum version in requirement.txt.
 # copied from glance/db/sqlalchemy/api.py
@@ -74,6 +116,11 @@ def paginate_query(query, model, limit, sort_keys, marker=None,
 
     We also have to cope with different sort_directions.
 
+    The leading sort key is additionally bounded on its bare column
+    (k1 >= X1, or k1 <= X1 when descending) so that an index on the sort keys
+    can be used to seek to the marker, keeping deep pages as fast as the
+    first ones.
+
     Typically, the id of the last row is used as the client-facing pagination
     marker, then the actual marker object must be fetched from the db and
     passed in to us as marker.
@@ -139,18 +186,10 @@ def paginate_query(query, model, limit, sort_keys, marker=None,
         for i in range(0, len(sort_keys)):
             crit_attrs = []
             for j in range(0, i):
-                model_attr = getattr(model, sort_keys[j])
-                default = _get_default_column_value(model, sort_keys[j])
-                attr = sa_sql.expression.case([(model_attr.isnot(None),
-                                                model_attr), ],
-                                              else_=default)
+                attr = _get_marker_attr(model, sort_keys[j])
                 crit_attrs.append((attr == marker_values[j]))
 
-            model_attr = getattr(model, sort_keys[i])
-            default = _get_default_column_value(model, sort_keys[i])
-            attr = sa_sql.expression.case([(model_attr.isnot(None),
-                                            model_attr), ],
-                                          else_=default)
+            attr = _get_marker_attr(model, sort_keys[i])
             if sort_dirs[i] == 'desc':
                 crit_attrs.append((attr < marker_values[i]))
             elif sort_dirs[i] == 'asc':
@@ -163,7 +202,10 @@ def paginate_query(query, model, limit, sort_keys, marker=None,
             criteria_list.append(criteria)
 
         f = sqlalchemy.sql.or_(*criteria_list)
-        query = query.filter(f)
+        query = query.filter(_get_leading_criterion(model, sort_keys[0],
+                                                    sort_dirs[0],
+                                                    marker_values[0]),
+                             f)
 
     if limit is not None:
         query = query.limit(limit)
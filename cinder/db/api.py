@@ -241,6 +241,16 @@ def volume_data_get_for_host(context, host, count_only=False):
                                          count_only)
 
 
+def volume_count_get_for_hosts(context, hosts):
+    """Get a {host: volume_count} dict for each of the given hosts."""
+    return IMPL.volume_count_get_for_hosts(context, hosts)
+
+
+def volume_size_get_by_host(context, filters=None):
+    """Get a {host: total size in GB} dict of the volumes matching filters."""
+    return IMPL.volume_size_get_by_host(context, filters=filters)
+
+
 def volume_data_get_for_project(context, project_id):
     """Get (volume_count, gigabytes) for project."""
     return IMPL.volume_data_get_for_project(context, project_id)
@@ -262,11 +272,11 @@ def volume_get(context, volume_id):
 
 
 def volume_get_all(context, marker=None, limit=None, sort_keys=None,
-                   sort_dirs=None, filters=None, offset=None):
+                   sort_dirs=None, filters=None, offset=None, fields=None):
     """Get all volumes."""
     return IMPL.volume_get_all(context, marker, limit, sort_keys=sort_keys,
                                sort_dirs=sort_dirs, filters=filters,
-                               offset=offset)
+                               offset=offset, fields=fields)
 
 
 def volume_get_all_by_host(context, host, filters=None):
@@ -287,13 +297,13 @@ def volume_get_all_by_generic_group(context, group_id, filters=None):
 
 def volume_get_all_by_project(context, project_id, marker, limit,
                               sort_keys=None, sort_dirs=None, filters=None,
-                              offset=None):
+                              offset=None, fields=None):
     """Get all volumes belonging to a project."""
     return IMPL.volume_get_all_by_project(context, project_id, marker, limit,
                                           sort_keys=sort_keys,
                                           sort_dirs=sort_dirs,
                                           filters=filters,
-                                          offset=offset)
+                                          offset=offset, fields=fields)
 
 
 def get_volume_summary(context, project_only):
@@ -1130,6 +1140,14 @@ def quota_reserve(context, resources, quotas, deltas, expire,
                               is_allocated_reserve=is_allocated_reserve)
 
 
+def quota_reserve_bulk(context, resources, quotas, deltas_list, expire,
+                       until_refresh, max_age, project_id=None):
+    """Check quotas and create reservations for several items at once."""
+    return IMPL.quota_reserve_bulk(context, resources, quotas, deltas_list,
+                                   expire, until_refresh, max_age,
+                                   project_id=project_id)
+
+
 def reservation_commit(context, reservations, project_id=None):
     """Commit quota reservations."""
     return IMPL.reservation_commit(context, reservations,
@@ -1616,6 +1634,16 @@ def image_volume_cache_get_all(context, **filters):
     return IMPL.image_volume_cache_get_all(context, **filters)
 
 
+def image_volume_cache_get_usage(context, **filters):
+    """Get the number, total size and latest use of image cache entries."""
+    return IMPL.image_volume_cache_get_usage(context, **filters)
+
+
+def image_volume_cache_get_popular(context, limit):
+    """Get the IDs of the images with the most image volume cache hits."""
+    return IMPL.image_volume_cache_get_popular(context, limit)
+
+
 def image_volume_cache_include_in_cluster(context, cluster,
                                           partial_rename=True, **filters):
     """Include in cluster image volume cache entries matching the filters.
@@ -226,17 +226,26 @@ def require_snapshot_exists(f):
     return wrapper
 
 
+# Number of times each DB API call was retried because of a deadlock.
+DEADLOCK_RETRIES = collections.Counter()
+
+
 def _retry_on_deadlock(f):
     """Decorator to retry a DB API call if Deadlock was received."""
     @functools.wraps(f)
     def wrapped(*args, **kwargs):
+        attempt = 0
         while True:
+            attempt += 1
             try:
                 return f(*args, **kwargs)
             except db_exc.DBDeadlock:
+                DEADLOCK_RETRIES[f.__name__] += 1
                 LOG.warning("Deadlock detected when running "
-                            "'%(func_name)s': Retrying...",
-                            dict(func_name=f.__name__))
+                            "'%(func_name)s' (attempt %(attempt)d, "
+                            "%(retries)d retries in total): Retrying...",
+                            dict(func_name=f.__name__, attempt=attempt,
+                                 retries=DEADLOCK_RETRIES[f.__name__]))
                 # Retry!
                 time.sleep(0.5)
                 continue
@@ -1091,18 +1100,33 @@ def _reservation_create(context, uuid, usage, project_id, resource, delta,
 # code always acquires the lock on quota_usages before acquiring the lock
 # on reservations.
 
-def _get_quota_usages(context, session, project_id):
+def _get_quota_usages(context, session, project_id, resources=None):
     # Broken out for testability
-    rows = model_query(context, models.QuotaUsage,
-                       read_deleted="no",
-                       session=session).\
-        filter_by(project_id=project_id).\
-        order_by(models.QuotaUsage.id.asc()).\
+    query = model_query(context, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+        filter_by(project_id=project_id)
+    # NOTE: Only lock the usages of the given resources, so that concurrent
+    # requests of a project that touch unrelated resources don't serialize.
+    if resources is not None:
+        query = query.filter(models.QuotaUsage.resource.in_(resources))
+    rows = query.order_by(models.QuotaUsage.id.asc()).\
         with_lockmode('update').\
         all()
     return {row.resource: row for row in rows}
 
 
+def _get_reservations_resources(context, session, reservations):
+    """Return the resources of the listed reservations without locking."""
+    rows = model_query(context, models.Reservation.resource,
+                       read_deleted="no",
+                       session=session).\
+        filter(models.Reservation.uuid.in_(reservations)).\
+        distinct().\
+        all()
+    return [row.resource for row in rows]
+
+
 def _get_quota_usages_by_resource(context, session, resource):
     rows = model_query(context, models.QuotaUsage,
                        deleted="no",
@@ -1130,14 +1154,54 @@ def quota_usage_update_resource(context, old_res, new_res):
 def quota_reserve(context, resources, quotas, deltas, expire,
                   until_refresh, max_age, project_id=None,
                   is_allocated_reserve=False):
+    return _quota_reserve(context, resources, quotas, [deltas], expire,
+                          until_refresh, max_age, project_id=project_id,
+                          is_allocated_reserve=is_allocated_reserve)[0]
+
+
+@require_context
+@_retry_on_deadlock
+def quota_reserve_bulk(context, resources, quotas, deltas_list, expire,
+                       until_refresh, max_age, project_id=None):
+    """Reserve the deltas of several items in a single transaction.
+
+    Quotas are checked against the aggregate of all the deltas, and the
+    usages are locked and refreshed only once.
+
+    :returns: a list with the reservation UUIDs of each item, in the same
+              order as deltas_list, so each item can be committed or rolled
+              back on its own
+    """
+    return _quota_reserve(context, resources, quotas, deltas_list, expire,
+                          until_refresh, max_age, project_id=project_id)
+
+
+def _sum_deltas(deltas_list):
+    totals = {}
+    for deltas in deltas_list:
+        for resource, delta in deltas.items():
+            totals[resource] = totals.get(resource, 0) + delta
+    return totals
+
+
+def _quota_reserve(context, resources, quotas, deltas_list, expire,
+                   until_refresh, max_age, project_id=None,
+                   is_allocated_reserve=False):
+    deltas = _sum_deltas(deltas_list)
     elevated = context.elevated()
     session = get_session()
     with session.begin():
         if project_id is None:
             project_id = context.project_id
 
-        # Get the current usages
-        usages = _get_quota_usages(context, session, project_id)
+        # Get the current usages. A sync routine may refresh every resource
+        # it is associated with, so the usages of all of them are locked by
+        # the same query and no lock is taken out of order afterwards.
+        syncs = set(resources[res].sync for res in deltas)
+        synced = [name for name, res in resources.items()
+                  if getattr(res, 'sync', None) in syncs]
+        usages = _get_quota_usages(context, session, project_id,
+                                   resources=sorted(synced))
         allocated = quota_allocated_get_all_by_project(context, project_id,
                                                        session=session)
         allocated.pop('project_id')
@@ -1239,43 +1303,50 @@ def quota_reserve(context, resources, quotas, deltas, expire,
         # Create the reservations
         if not overs:
             reservations = []
-            for resource, delta in deltas.items():
-                usage = usages[resource]
-                allocated_id = None
-                if is_allocated_reserve:
-                    try:
-                        quota = _quota_get(context, project_id, resource,
-                                           session=session)
-                    except exception.ProjectQuotaNotFound:
-                        # If we were using the default quota, create DB entry
-                        quota = quota_create(context, project_id, resource,
-                                             quotas[resource], 0)
-                    # Since there's no reserved/total for allocated, update
-                    # allocated immediately and subtract on rollback if needed
-                    quota_allocated_update(context, project_id, resource,
-                                           quota.allocated + delta)
-                    allocated_id = quota.id
-                    usage = None
-                reservation = _reservation_create(
-                    elevated, str(uuid.uuid4()), usage, project_id, resource,
-                    delta, expire, session=session, allocated_id=allocated_id)
-
-                reservations.append(reservation.uuid)
-
-                # Also update the reserved quantity
-                # NOTE(Vek): Again, we are only concerned here about
-                #            positive increments.  Here, though, we're
-                #            worried about the following scenario:
-                #
-                #            1) User initiates resize down.
-                #            2) User allocates a new instance.
-                #            3) Resize down fails or is reverted.
-                #            4) User is now over quota.
-                #
-                #            To prevent this, we only update the
-                #            reserved value if the delta is positive.
-                if delta > 0 and not is_allocated_reserve:
-                    usages[resource].reserved += delta
+            for item_deltas in deltas_list:
+                item_reservations = []
+                for resource, delta in item_deltas.items():
+                    usage = usages[resource]
+                    allocated_id = None
+                    if is_allocated_reserve:
+                        try:
+                            quota = _quota_get(context, project_id,
+                                               resource, session=session)
+                        except exception.ProjectQuotaNotFound:
+                            # If we were using the default quota, create DB
+                            # entry
+                            quota = quota_create(context, project_id,
+                                                 resource, quotas[resource],
+                                                 0)
+                        # Since there's no reserved/total for allocated,
+                        # update allocated immediately and subtract on
+                        # rollback if needed
+                        quota_allocated_update(context, project_id, resource,
+                                               quota.allocated + delta)
+                        allocated_id = quota.id
+                        usage = None
+                    reservation = _reservation_create(
+                        elevated, str(uuid.uuid4()), usage, project_id,
+                        resource, delta, expire, session=session,
+                        allocated_id=allocated_id)
+
+                    item_reservations.append(reservation.uuid)
+
+                    # Also update the reserved quantity
+                    # NOTE(Vek): Again, we are only concerned here about
+                    #            positive increments.  Here, though, we're
+                    #            worried about the following scenario:
+                    #
+                    #            1) User initiates resize down.
+                    #            2) User allocates a new instance.
+                    #            3) Resize down fails or is reverted.
+                    #            4) User is now over quota.
+                    #
+                    #            To prevent this, we only update the
+                    #            reserved value if the delta is positive.
+                    if delta > 0 and not is_allocated_reserve:
+                        usages[resource].reserved += delta
+                reservations.append(item_reservations)
 
     if unders:
         LOG.warning("Change will make usage less than 0 for the following "
@@ -1311,7 +1382,10 @@ def _dict_with_usage_id(usages):
 def reservation_commit(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
-        usages = _get_quota_usages(context, session, project_id)
+        resources = _get_reservations_resources(context, session,
+                                                reservations)
+        usages = _get_quota_usages(context, session, project_id,
+                                   resources=resources)
         usages = _dict_with_usage_id(usages)
 
         for reservation in _quota_reservations(session, context, reservations):
@@ -1330,7 +1404,10 @@ def reservation_commit(context, reservations, project_id=None):
 def reservation_rollback(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
-        usages = _get_quota_usages(context, session, project_id)
+        resources = _get_reservations_resources(context, session,
+                                                reservations)
+        usages = _get_quota_usages(context, session, project_id,
+                                   resources=resources)
         usages = _dict_with_usage_id(usages)
         for reservation in _quota_reservations(session, context, reservations):
             if reservation.allocated_id:
@@ -1527,6 +1604,50 @@ def volume_data_get_for_host(context, host, count_only=False):
         return (result[0] or 0, result[1] or 0)
 
 
+@require_admin_context
+def volume_count_get_for_hosts(context, hosts):
+    hosts = set(hosts)
+    if not hosts:
+        return {}
+    host_attr = models.Volume.host
+    conditions = [host_attr.in_(hosts)]
+    conditions.extend(host_attr.op('LIKE')(host + '#%') for host in hosts)
+    rows = model_query(context,
+                       host_attr,
+                       func.count(models.Volume.id),
+                       read_deleted="no").filter(
+        or_(*conditions)).group_by(host_attr).all()
+
+    # NOTE: A volume on "host@backend#pool" counts for both the pool and
+    # the backend, matching what volume_data_get_for_host returns for each.
+    counts = dict.fromkeys(hosts, 0)
+    for volume_host, count in rows:
+        prefix = volume_host
+        if prefix in counts:
+            counts[prefix] += count
+        while '#' in prefix:
+            prefix = prefix.rpartition('#')[0]
+            if prefix in counts:
+                counts[prefix] += count
+    return counts
+
+
+@require_admin_context
+def volume_size_get_by_host(context, filters=None):
+    query = model_query(context,
+                        models.Volume.host,
+                        func.sum(models.Volume.size),
+                        read_deleted="no")
+    if filters:
+        query = _process_volume_filters(query, filters)
+        # No volumes would match the filters specified
+        if query is None:
+            return {}
+    rows = query.group_by(models.Volume.host).all()
+    # NOTE: convert None to 0
+    return {host: size or 0 for host, size in rows}
+
+
 @require_admin_context
 def _volume_data_get_for_project(context, project_id, volume_type_id=None,
                                  session=None):
@@ -2048,7 +2169,7 @@ def volume_get(context, volume_id):
 
 @require_admin_context
 def volume_get_all(context, marker=None, limit=None, sort_keys=None,
-                   sort_dirs=None, filters=None, offset=None):
+                   sort_dirs=None, filters=None, offset=None, fields=None):
     """Retrieves all volumes.
 
     If no sort parameters are specified then the returned volumes are sorted
@@ -2067,16 +2188,22 @@ def volume_get_all(context, marker=None, limit=None, sort_keys=None,
                     or sets cause an 'IN' operation, while exact matching
                     is used for other values, see _process_volume_filters
                     function for more information
+    :param fields: optional list of volume columns to load; when given only
+                   those columns are selected, no relationship is loaded and
+                   every volume is returned as a dictionary
     :returns: list of matching volumes
     """
     session = get_session()
     with session.begin():
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_keys, sort_dirs, filters, offset)
+                                         sort_keys, sort_dirs, filters, offset,
+                                         fields=fields)
         # No volumes would match, return empty list
         if query is None:
             return []
+        if fields:
+            return [row._asdict() for row in query.all()]
         return query.all()
 
 
@@ -2197,7 +2324,7 @@ def volume_get_all_by_generic_group(context, group_id, filters=None):
 @require_context
 def volume_get_all_by_project(context, project_id, marker, limit,
                               sort_keys=None, sort_dirs=None, filters=None,
-                              offset=None):
+                              offset=None, fields=None):
     """Retrieves all volumes in a project.
 
     If no sort parameters are specified then the returned volumes are sorted
@@ -2217,6 +2344,8 @@ def volume_get_all_by_project(context, project_id, marker, limit,
                     or sets cause an 'IN' operation, while exact matching
                     is used for other values, see _process_volume_filters
                     function for more information
+    :param fields: optional list of volume columns to load, see
+                   volume_get_all function for more information
     :returns: list of matching volumes
     """
     session = get_session()
@@ -2227,16 +2356,19 @@ def volume_get_all_by_project(context, project_id, marker, limit,
         filters['project_id'] = project_id
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_keys, sort_dirs, filters, offset)
+                                         sort_keys, sort_dirs, filters, offset,
+                                         fields=fields)
         # No volumes would match, return empty list
         if query is None:
             return []
+        if fields:
+            return [row._asdict() for row in query.all()]
         return query.all()
 
 
 def _generate_paginate_query(context, session, marker, limit, sort_keys,
                              sort_dirs, filters, offset=None,
-                             paginate_type=models.Volume):
+                             paginate_type=models.Volume, fields=None):
     """Generate the query to include the filters and the paginate options.
 
     Returns a query with sorting / pagination criteria added or None
@@ -2257,6 +2389,8 @@ def _generate_paginate_query(context, session, marker, limit, sort_keys,
                     function for more information
     :param offset: number of items to skip
     :param paginate_type: type of pagination to generate
+    :param fields: optional list of columns to select instead of the whole
+                   model, only supported for volumes
     :returns: updated query or None
     """
     get_query, process_filters, get = PAGINATION_HELPERS[paginate_type]
@@ -2264,7 +2398,12 @@ def _generate_paginate_query(context, session, marker, limit, sort_keys,
     sort_keys, sort_dirs = process_sort_params(sort_keys,
                                                sort_dirs,
                                                default_dir='desc')
-    query = get_query(context, session=session)
+    if fields:
+        # A projection doesn't need any of the relationships that the query
+        # would otherwise join and load for every row.
+        query = get_query(context, session=session, joined_load=False)
+    else:
+        query = get_query(context, session=session)
 
     if filters:
         query = process_filters(query, filters)
@@ -2275,11 +2414,15 @@ def _generate_paginate_query(context, session, marker, limit, sort_keys,
     if marker is not None:
         marker_object = get(context, marker, session)
 
-    return sqlalchemyutils.paginate_query(query, paginate_type, limit,
-                                          sort_keys,
-                                          marker=marker_object,
-                                          sort_dirs=sort_dirs,
-                                          offset=offset)
+    query = sqlalchemyutils.paginate_query(query, paginate_type, limit,
+                                           sort_keys,
+                                           marker=marker_object,
+                                           sort_dirs=sort_dirs,
+                                           offset=offset)
+    if fields:
+        query = query.with_entities(*[getattr(paginate_type, field)
+                                      for field in fields])
+    return query
 
 
 @apply_like_filters(model=models.Volume)
@@ -6400,6 +6543,10 @@ def image_volume_cache_create(context, host, cluster_name, image_id,
         cache_entry.volume_id = volume_id
         cache_entry.size = size
         session.add(cache_entry)
+        # The image-volume cache compares last_used with the usage reported
+        # by the DB, which may store it with less precision, so read it back.
+        session.flush()
+        session.refresh(cache_entry)
         return cache_entry
 
 
@@ -6425,7 +6572,9 @@ def image_volume_cache_get_and_update_last_used(context, image_id, **filters):
 
         if entry:
             entry.last_used = timeutils.utcnow()
+            entry.hit_count = (entry.hit_count or 0) + 1
             entry.save(session=session)
+            session.refresh(entry)
         return entry
 
 
@@ -6449,6 +6598,34 @@ def image_volume_cache_get_all(context, **filters):
             all()
 
 
+@require_context
+def image_volume_cache_get_usage(context, **filters):
+    filters = _clean_filters(filters)
+    session = get_session()
+    with session.begin():
+        count, size, last_used = session.query(
+            func.count(models.ImageVolumeCacheEntry.id),
+            func.sum(models.ImageVolumeCacheEntry.size),
+            func.max(models.ImageVolumeCacheEntry.last_used)).\
+            filter_by(**filters).\
+            first()
+        return count, size or 0, last_used
+
+
+@require_context
+def image_volume_cache_get_popular(context, limit):
+    hits = func.sum(models.ImageVolumeCacheEntry.hit_count)
+    session = get_session()
+    with session.begin():
+        rows = session.query(models.ImageVolumeCacheEntry.image_id, hits).\
+            group_by(models.ImageVolumeCacheEntry.image_id).\
+            having(hits > 0).\
+            order_by(desc(hits)).\
+            limit(limit).\
+            all()
+        return [image_id for image_id, _hits in rows]
+
+
 @require_admin_context
 def image_volume_cache_include_in_cluster(context, cluster,
                                           partial_rename=True, **filters):
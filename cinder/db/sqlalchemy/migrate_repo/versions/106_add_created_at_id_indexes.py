@@ -0,0 +1,38 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_db.sqlalchemy import utils
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Default sort keys used when listing resources
+COLUMNS = ['created_at', 'id']
+
+TABLES = (
+    'backups',
+    'messages',
+    'snapshots',
+    'volume_attachment',
+    'volumes',
+)
+
+
+def upgrade(migrate_engine):
+    for table_name in TABLES:
+        index_name = table_name + '_created_at_id_idx'
+        if utils.index_exists_on_columns(migrate_engine, table_name,
+                                         COLUMNS):
+            LOG.info('Skipped adding %s because an equivalent index already '
+                     'exists.', index_name)
+        else:
+            utils.add_index(migrate_engine, table_name, index_name, COLUMNS)
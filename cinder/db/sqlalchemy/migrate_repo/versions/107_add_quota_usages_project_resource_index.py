@@ -0,0 +1,31 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_db.sqlalchemy import utils
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+TABLE = 'quota_usages'
+INDEX = 'quota_usages_project_id_resource_idx'
+# Quota reservations lock the usages of some resources of a project with
+# SELECT ... FOR UPDATE. InnoDB locks every index record it scans, so with
+# only the project_id index all the usages of the project are locked.
+COLUMNS = ['project_id', 'resource']
+
+
+def upgrade(migrate_engine):
+    if utils.index_exists_on_columns(migrate_engine, TABLE, COLUMNS):
+        LOG.info('Skipped adding %s because an equivalent index already '
+                 'exists.', INDEX)
+    else:
+        utils.add_index(migrate_engine, TABLE, INDEX, COLUMNS)
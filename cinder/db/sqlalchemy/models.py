@@ -842,6 +842,7 @@ class ImageVolumeCacheEntry(BASE, models.ModelBase):
     volume_id = Column(String(36), nullable=False)
     size = Column(Integer, nullable=False)
     last_used = Column(DateTime, default=lambda: timeutils.utcnow())
+    hit_count = Column(Integer, nullable=False, default=0)
 
 
 class Worker(BASE, CinderBase):
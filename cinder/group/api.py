@@ -47,6 +47,7 @@ CONF = cfg.CONF
 
 LOG = logging.getLogger(__name__)
 GROUP_QUOTAS = quota.GROUP_QUOTAS
+QUOTAS = quota.QUOTAS
 VALID_REMOVE_VOL_FROM_GROUP_STATUS = (
     'available',
     'in-use',
@@ -256,8 +257,27 @@ class API(base.Base):
 
         return group
 
+    def _reserve_volumes_quota(self, context, volumes):
+        """Reserve the quota of the volumes of a group in one transaction.
+
+        :param volumes: list of (size, volume_type_id) tuples
+        :returns: a list with the reservations of each volume
+        """
+        deltas_list = []
+        for size, volume_type_id in volumes:
+            reserve_opts = {'volumes': 1, 'gigabytes': size}
+            QUOTAS.add_volume_type_opts(context, reserve_opts, volume_type_id)
+            deltas_list.append(reserve_opts)
+        try:
+            return QUOTAS.reserve_bulk(context, deltas_list)
+        except exception.OverQuota as e:
+            quota_utils.process_reserve_over_quota(
+                context, e, resource='volumes',
+                size=sum(size for size, _type in volumes))
+
     def _create_group_from_group_snapshot(self, context, group,
                                           group_snapshot_id):
+        reservations = None
         try:
             group_snapshot = objects.GroupSnapshot.get_by_id(
                 context, group_snapshot_id)
@@ -268,7 +288,12 @@ class API(base.Base):
                 msg = _("Group snapshot is empty. No group will be created.")
                 raise exception.InvalidGroup(reason=msg)
 
-            for snapshot in snapshots:
+            reservations = self._reserve_volumes_quota(
+                context, [(snapshot.volume_size, snapshot.volume_type_id)
+                          for snapshot in snapshots])
+
+            for snapshot, volume_reservations in zip(snapshots,
+                                                     reservations):
                 kwargs = {}
                 kwargs['availability_zone'] = group.availability_zone
                 kwargs['group_snapshot'] = group_snapshot
@@ -303,6 +328,7 @@ class API(base.Base):
                                            snapshot.volume_size,
                                            None,
                                            None,
+                                           reservations=volume_reservations,
                                            **kwargs)
                 except exception.CinderException:
                     with excutils.save_and_reraise_exception():
@@ -315,6 +341,8 @@ class API(base.Base):
         except Exception:
             with excutils.save_and_reraise_exception():
                 try:
+                    if reservations:
+                        QUOTAS.rollback_bulk(context, reservations)
                     group.destroy()
                 finally:
                     LOG.error("Error occurred when creating group "
@@ -334,6 +362,7 @@ class API(base.Base):
 
     def _create_group_from_source_group(self, context, group,
                                         source_group_id):
+        reservations = None
         try:
             source_group = objects.Group.get_by_id(context,
                                                    source_group_id)
@@ -345,7 +374,12 @@ class API(base.Base):
                         "will be created.")
                 raise exception.InvalidGroup(reason=msg)
 
-            for source_vol in source_vols:
+            reservations = self._reserve_volumes_quota(
+                context, [(source_vol.size, source_vol.volume_type_id)
+                          for source_vol in source_vols])
+
+            for source_vol, volume_reservations in zip(source_vols,
+                                                       reservations):
                 kwargs = {}
                 kwargs['availability_zone'] = group.availability_zone
                 kwargs['source_group'] = source_group
@@ -380,6 +414,7 @@ class API(base.Base):
                                            source_vol.size,
                                            None,
                                            None,
+                                           reservations=volume_reservations,
                                            **kwargs)
                 except exception.CinderException:
                     with excutils.save_and_reraise_exception():
@@ -392,6 +427,8 @@ class API(base.Base):
         except Exception:
             with excutils.save_and_reraise_exception():
                 try:
+                    if reservations:
+                        QUOTAS.rollback_bulk(context, reservations)
                     group.destroy()
                 finally:
                     LOG.error("Error occurred when creating "
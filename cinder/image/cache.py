@@ -19,6 +19,8 @@ from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import timeutils
 
+from cinder import exception
+from cinder.i18n import _
 from cinder import objects
 from cinder import rpc
 from cinder import utils
@@ -28,14 +30,31 @@ CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
+EVICTION_POLICIES = ('lru', 'lfu', 'gdsf')
+
+
 class ImageVolumeCache(object):
     def __init__(self, db, volume_api, max_cache_size_gb=0,
-                 max_cache_size_count=0):
+                 max_cache_size_count=0, eviction_policy=None,
+                 headroom_percent=0):
         self.db = db
         self.volume_api = volume_api
         self.max_cache_size_gb = int(max_cache_size_gb)
         self.max_cache_size_count = int(max_cache_size_count)
+        self.eviction_policy = eviction_policy or 'lru'
+        if self.eviction_policy not in EVICTION_POLICIES:
+            raise exception.InvalidInput(
+                reason=_('Unknown image-volume cache eviction policy '
+                         '%s.') % self.eviction_policy)
+        self.headroom_percent = int(headroom_percent or 0)
         self.notifier = rpc.get_notifier('volume', CONF.host)
+        # Entries of each cache (host or cluster), most recently used first,
+        # as loaded from the DB and kept up to date with local changes.
+        self._indexes = {}
+        # GreedyDual-Size-Frequency priorities by volume id, and the clock
+        # of each cache, which is the priority of its last evicted entry.
+        self._priorities = {}
+        self._clocks = {}
 
     def get_by_image_volume(self, context, volume_id):
         return self.db.image_volume_cache_get_by_volume_id(context, volume_id)
@@ -44,6 +63,7 @@ class ImageVolumeCache(object):
         LOG.debug('Evicting image cache entry: %(entry)s.',
                   {'entry': self._entry_to_str(cache_entry)})
         self.db.image_volume_cache_delete(context, cache_entry['volume_id'])
+        self._unindex_entry(cache_entry)
         self._notify_cache_eviction(context, cache_entry['image_id'],
                                     cache_entry['host'])
 
@@ -53,6 +73,79 @@ class ImageVolumeCache(object):
             return {'cluster_name': volume_ref.cluster_name}
         return {'host': volume_ref.host}
 
+    @staticmethod
+    def _index_key(filters):
+        return tuple(sorted(filters.items()))
+
+    def _get_index(self, context, filters):
+        """Return the entries of a cache, most recently used first.
+
+        The entries are only read from the DB when they have not been loaded
+        yet or when the usage the DB reports for the cache no longer matches
+        them. The usage includes the latest last_used time, so it changes
+        whenever another service creates, uses or evicts an entry.
+        """
+        key = self._index_key(filters)
+        entries = self._indexes.get(key)
+        if entries is not None:
+            usage = self.db.image_volume_cache_get_usage(context, **filters)
+            if usage == self._index_usage(entries):
+                return entries
+
+        entries = list(self.db.image_volume_cache_get_all(context,
+                                                          **filters))
+        self._indexes[key] = entries
+        clock = self._clocks.setdefault(key, 0.0)
+        for entry in entries:
+            self._priorities.setdefault(entry['volume_id'],
+                                        self._gdsf_priority(entry, clock))
+        return entries
+
+    @staticmethod
+    def _index_usage(entries):
+        last_used = max(e['last_used'] for e in entries) if entries else None
+        return len(entries), sum(e['size'] for e in entries), last_used
+
+    def _index_entry(self, filters, cache_entry):
+        key = self._index_key(filters)
+        entries = self._indexes.get(key)
+        if entries is None:
+            return
+        self._unindex_entry(cache_entry, forget_priority=False)
+        entries.insert(0, cache_entry)
+        self._priorities[cache_entry['volume_id']] = self._gdsf_priority(
+            cache_entry, self._clocks.get(key, 0.0))
+
+    def _unindex_entry(self, cache_entry, forget_priority=True):
+        volume_id = cache_entry['volume_id']
+        for entries in self._indexes.values():
+            for i, entry in enumerate(entries):
+                if entry['volume_id'] == volume_id:
+                    del entries[i]
+                    break
+        if forget_priority:
+            self._priorities.pop(volume_id, None)
+
+    @staticmethod
+    def _hit_count(entry):
+        return entry.get('hit_count') or 0
+
+    def _gdsf_priority(self, entry, clock):
+        return clock + float(self._hit_count(entry) + 1) / max(entry['size'],
+                                                               1)
+
+    def _eviction_order(self, entries):
+        """Return the entries in the order they should be evicted."""
+        # Entries are most recently used first, so ties are broken in favor
+        # of evicting the least recently used entry.
+        candidates = list(reversed(entries))
+        if self.eviction_policy == 'lfu':
+            candidates.sort(key=self._hit_count)
+        elif self.eviction_policy == 'gdsf':
+            candidates.sort(
+                key=lambda e: self._priorities.get(e['volume_id'], 0.0))
+        return candidates
+
     def get_entry(self, context, volume_ref, image_id, image_meta):
         cache_entry = self.db.image_volume_cache_get_and_update_last_used(
             context,
@@ -72,6 +165,8 @@ class ImageVolumeCache(object):
                 cache_entry = None
 
         if cache_entry:
+            self._index_entry(self._get_query_filters(volume_ref),
+                              cache_entry)
             self._notify_cache_hit(context, cache_entry['image_id'],
                                    cache_entry['host'])
         else:
@@ -110,6 +205,8 @@ class ImageVolumeCache(object):
             volume_ref.size
         )
 
+        self._index_entry(self._get_query_filters(volume_ref), cache_entry)
+
         LOG.debug('New image-volume cache entry created: %(entry)s.',
                   {'entry': self._entry_to_str(cache_entry)})
         return cache_entry
@@ -131,42 +228,70 @@ class ImageVolumeCache(object):
                 volume.size > self.max_cache_size_gb):
             return False
 
-        # Assume the entries are ordered by most recently used to least used.
-        entries = self.db.image_volume_cache_get_all(
-            context,
-            **self._get_query_filters(volume))
+        return self._reclaim(context, self._get_query_filters(volume),
+                             volume.service_topic_queue,
+                             self.max_cache_size_gb - volume.size,
+                             self.max_cache_size_count - 1)
 
-        current_count = len(entries)
+    def reclaim_headroom(self, context):
+        """Evict entries to keep headroom_percent of the cache free.
 
-        current_size = 0
-        for entry in entries:
-            current_size += entry['size']
+        This is meant to run in the background, so that creating a new cache
+        entry rarely has to wait for older ones to be evicted. Only the caches
+        this service has already used are considered.
+        """
+        if not self.headroom_percent:
+            return
+        if self.max_cache_size_gb == 0 and self.max_cache_size_count == 0:
+            return
 
-        # Add values for the entry we intend to create.
-        current_size += volume.size
-        current_count += 1
+        ratio = (100 - self.headroom_percent) / 100.0
+        for key in list(self._indexes):
+            filters = dict(key)
+            self._reclaim(context, filters, list(filters.values())[0],
+                          int(self.max_cache_size_gb * ratio),
+                          int(self.max_cache_size_count * ratio))
+
+    def _reclaim(self, context, filters, service, max_size_gb, max_count):
+        """Evict entries until the cache fits in the given limits.
+
+        The limits only apply when the matching cache limit is set. Returns
+        False if the size limit can not be met.
+        """
+        entries = self._get_index(context, filters)
+
+        current_count = len(entries)
+        current_size = sum(entry['size'] for entry in entries)
 
         LOG.debug('Image-volume cache for %(service)s current_size (GB) = '
                   '%(size_gb)s (max = %(max_gb)s), current count = %(count)s '
                   '(max = %(max_count)s).',
-                  {'service': volume.service_topic_queue,
+                  {'service': service,
                    'size_gb': current_size,
                    'max_gb': self.max_cache_size_gb,
                    'count': current_count,
                    'max_count': self.max_cache_size_count})
 
-        while ((current_size > self.max_cache_size_gb
-               or current_count > self.max_cache_size_count)
-               and len(entries)):
-            entry = entries.pop()
+        def _over_limits():
+            return ((self.max_cache_size_gb and current_size > max_size_gb) or
+                    (self.max_cache_size_count and
+                     current_count > max_count))
+
+        key = self._index_key(filters)
+        for entry in self._eviction_order(entries):
+            if not _over_limits():
+                break
             LOG.debug('Reclaiming image-volume cache space; removing cache '
                       'entry %(entry)s.', {'entry': self._entry_to_str(entry)})
+            if self.eviction_policy == 'gdsf':
+                self._clocks[key] = self._priorities.get(entry['volume_id'],
+                                                         self._clocks[key])
             self._delete_image_volume(context, entry)
             current_size -= entry['size']
             current_count -= 1
             LOG.debug('Image-volume cache for %(service)s new size (GB) = '
                       '%(size_gb)s, new count = %(count)s.',
-                      {'service': volume.service_topic_queue,
+                      {'service': service,
                        'size_gb': current_size,
                        'count': current_count})
 
@@ -175,10 +300,10 @@ class ImageVolumeCache(object):
         # it is guaranteed to be >0 if limited, and we can always delete down
         # to 0.
         if self.max_cache_size_gb > 0:
-            if current_size > self.max_cache_size_gb > 0:
+            if current_size > max_size_gb:
                 LOG.warning('Image-volume cache for %(service)s does '
                             'not have enough space (GB).',
-                            {'service': volume.service_topic_queue})
+                            {'service': service})
                 return False
 
         return True
@@ -207,7 +332,18 @@ class ImageVolumeCache(object):
 
     def _delete_image_volume(self, context, cache_entry):
         """Delete a volume and remove cache entry."""
-        volume = objects.Volume.get_by_id(context, cache_entry['volume_id'])
+        self._unindex_entry(cache_entry)
+        try:
+            volume = objects.Volume.get_by_id(context,
+                                              cache_entry['volume_id'])
+        except exception.VolumeNotFound:
+            # Another service already evicted the entry and deleted its
+            # volume, make sure the entry is gone as well.
+            LOG.debug('Volume of image-volume cache entry %(entry)s not '
+                      'found.', {'entry': self._entry_to_str(cache_entry)})
+            self.db.image_volume_cache_delete(context,
+                                              cache_entry['volume_id'])
+            return
 
         # Delete will evict the cache entry.
         self.volume_api.delete(context, volume)
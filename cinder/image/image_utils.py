@@ -26,9 +26,11 @@ we should look at maybe pushing this up to Oslo
 
 import contextlib
 import errno
+import itertools
 import math
 import os
 import re
+import stat
 import tempfile
 
 from oslo_concurrency import processutils
@@ -51,7 +53,16 @@ LOG = logging.getLogger(__name__)
 image_helper_opts = [cfg.StrOpt('image_conversion_dir',
                                 default='$state_path/conversion',
                                 help='Directory used for temporary storage '
-                                'during image conversion'), ]
+                                'during image conversion'),
+                     cfg.BoolOpt('image_download_streaming',
+                                 default=False,
+                                 help='Write raw images straight from the '
+                                 'image service into the volume instead of '
+                                 'staging them in image_conversion_dir. '
+                                 'The image header is still checked before '
+                                 'any data is written, and images that turn '
+                                 'out not to be raw are staged and converted '
+                                 'as usual.'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(image_helper_opts)
@@ -67,6 +78,26 @@ QEMU_IMG_LIMITS = processutils.ProcessLimits(
 VALID_DISK_FORMATS = ('raw', 'vmdk', 'vdi', 'qcow2',
                       'vhd', 'vhdx', 'parallels')
 
+# Signatures of the image formats qemu-img would detect in what claims to be
+# a raw image, as (offset, magic) pairs.
+IMAGE_FORMAT_MAGICS = (
+    ('qcow2', 0, b'QFI\xfb'),
+    ('qed', 0, b'QED\x00'),
+    ('vmdk', 0, b'KDMV'),
+    ('vmdk', 0, b'COWD'),
+    ('vmdk', 0, b'# Disk DescriptorFile'),
+    ('vpc', 0, b'conectix'),
+    ('vhdx', 0, b'vhdxfile'),
+    ('vdi', 64, b'\x7f\x10\xda\xbe'),
+    ('parallels', 0, b'WithoutFreeSpace'),
+    ('parallels', 0, b'WithouFreSpacExt'),
+    ('cloop', 0, b'#!/bin/sh\n#V2.0 Format'),
+    ('bochs', 0, b'Bochs Virtual HD Image'),
+    ('dmg', 0, b'koly'),
+    ('luks', 0, b'LUKS\xba\xbe'),
+)
+IMAGE_HEADER_SIZE = 512
+
 
 def validate_disk_format(disk_format):
     return disk_format in VALID_DISK_FORMATS
@@ -331,6 +362,105 @@ def fetch_to_raw(context, image_service,
                            run_as_root=run_as_root)
 
 
+def detect_image_format(header):
+    """Return the image format whose signature starts the header, if any.
+
+    This only knows about formats with a fixed signature near the start of
+    the image, so None means the data may be used as a raw image.
+    """
+    for fmt, offset, magic in IMAGE_FORMAT_MAGICS:
+        if header[offset:offset + len(magic)] == magic:
+            return fmt
+    return None
+
+
+def can_stream_image(image_meta, volume_format='raw'):
+    """Check if an image may be written to a volume without staging it."""
+    if not CONF.image_download_streaming or not image_meta:
+        return False
+    return (volume_format == 'raw' and
+            image_meta.get('disk_format') == 'raw' and
+            image_meta.get('container_format') in (None, 'bare') and
+            image_meta.get('size') is not None)
+
+
+def _stream_to_volume(context, image_service, image_id, image_meta, dest,
+                      size):
+    """Write a raw image from the image service straight into a volume.
+
+    The first bytes of the image are checked against the signatures of the
+    formats qemu-img understands before anything is written. Returns False
+    without touching the destination when the image is not raw after all,
+    so the caller can fall back to the staged conversion.
+    """
+    if size is not None:
+        virt_size = int(math.ceil(float(image_meta['size']) / units.Gi))
+        if virt_size > size:
+            params = {'image_size': virt_size, 'volume_size': size}
+            reason = _("Size is %(image_size)dGB and doesn't fit in a "
+                       "volume of size %(volume_size)dGB.") % params
+            raise exception.ImageUnacceptable(image_id=image_id,
+                                              reason=reason)
+
+    start_time = timeutils.utcnow()
+    chunks = iter(image_service.download(context, image_id))
+    header = b''
+    for chunk in chunks:
+        header += chunk
+        if len(header) >= IMAGE_HEADER_SIZE:
+            break
+
+    fmt = detect_image_format(header)
+    if fmt is not None:
+        LOG.warning("Image %(image_id)s is registered as raw but looks like "
+                    "%(fmt)s, falling back to a staged conversion.",
+                    {'image_id': image_id, 'fmt': fmt})
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+        return False
+
+    def _write(volume_file):
+        # Only a regular file can be made to read back zeroes without
+        # writing them, so that is the only case where zeroes are skipped.
+        sparse = stat.S_ISREG(os.fstat(volume_file.fileno()).st_mode)
+        if sparse:
+            length = os.fstat(volume_file.fileno()).st_size
+            volume_file.truncate(0)
+            volume_file.truncate(length)
+        written = 0
+        for data in itertools.chain([header], chunks):
+            if not data:
+                continue
+            if sparse and volume_utils.is_all_zero(data):
+                volume_file.seek(len(data), os.SEEK_CUR)
+            else:
+                volume_file.write(data)
+            written += len(data)
+        if sparse and volume_file.tell() > os.fstat(
+                volume_file.fileno()).st_size:
+            volume_file.truncate()
+        volume_file.flush()
+        os.fsync(volume_file.fileno())
+        return written
+
+    if os.name == 'nt' or os.access(dest, os.W_OK):
+        with open(dest, 'r+b') as volume_file:
+            written = _write(volume_file)
+    else:
+        with utils.temporary_chown(dest):
+            with open(dest, 'r+b') as volume_file:
+                written = _write(volume_file)
+
+    duration = max(timeutils.delta_seconds(start_time, timeutils.utcnow()), 1)
+    size_mb = written / units.Mi
+    LOG.info("Image %(image_id)s streamed to %(dest)s, %(sz).2f MB at "
+             "%(mbps).2f MB/s",
+             {'image_id': image_id, 'dest': dest, 'sz': size_mb,
+              'mbps': size_mb / duration})
+    return True
+
+
 def fetch_to_volume_format(context, image_service,
                            image_id, dest, volume_format, blocksize,
                            user_id=None, project_id=None, size=None,
@@ -338,6 +468,13 @@ def fetch_to_volume_format(context, image_service,
     qemu_img = True
     image_meta = image_service.show(context, image_id)
 
+    tmp_images = TemporaryImages.for_image_service(image_service)
+    if (can_stream_image(image_meta, volume_format) and
+            not tmp_images.get(context, image_id)):
+        if _stream_to_volume(context, image_service, image_id, image_meta,
+                             dest, size):
+            return
+
     # NOTE(avishay): I'm not crazy about creating temp files which may be
     # large and cause disk full errors which would confuse users.
     # Unfortunately it seems that you can't pipe to 'qemu-img convert' because
@@ -353,7 +490,6 @@ def fetch_to_volume_format(context, image_service,
         if data is None:
             qemu_img = False
 
-        tmp_images = TemporaryImages.for_image_service(image_service)
         tmp_image = tmp_images.get(context, image_id)
         if tmp_image:
             tmp = tmp_image
@@ -405,11 +541,10 @@ def fetch_to_volume_format(context, image_service,
 
         # NOTE(jdg): I'm using qemu-img convert to write
         # to the volume regardless if it *needs* conversion or not
-        # TODO(avishay): We can speed this up by checking if the image is raw
-        # and if so, writing directly to the device. However, we need to keep
-        # check via 'qemu-img info' that what we copied was in fact a raw
-        # image and not a different format with a backing file, which may be
-        # malicious.
+        # NOTE: raw images are written directly to the device by
+        # _stream_to_volume when image_download_streaming is enabled; that
+        # path checks the image header instead of 'qemu-img info' so that a
+        # different format with a backing file is never copied as raw.
         LOG.debug("%s was %s, converting to %s ", image_id, fmt, volume_format)
         if image_meta['disk_format'] == 'vhd':
             # qemu-img still uses the legacy 'vpc' name for vhd format.
@@ -430,6 +565,40 @@ def _validate_file_format(image_data, expected_format):
     return False
 
 
+class _ImageUploadFile(object):
+    """Image file handed to the image service for an upload.
+
+    The image service clients use it like the open file itself: glance v1
+    seeks and tells to find the image size, and both versions read it with
+    read(size). Reads are counted so that the upload throughput can be
+    logged.
+    """
+
+    def __init__(self, image_file):
+        self._image_file = image_file
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._image_file.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._image_file, name)
+
+
+def _upload_image_file(context, image_service, image_id, path):
+    start_time = timeutils.utcnow()
+    with open(path, 'rb') as image_file:
+        upload_file = _ImageUploadFile(image_file)
+        image_service.update(context, image_id, {}, upload_file)
+
+    duration = max(timeutils.delta_seconds(start_time, timeutils.utcnow()), 1)
+    size_mb = upload_file.bytes_read / units.Mi
+    LOG.info("Image upload %(sz).2f MB at %(mbps).2f MB/s",
+             {'sz': size_mb, 'mbps': size_mb / duration})
+
+
 def upload_volume(context, image_service, image_meta, volume_path,
                   volume_format='raw', run_as_root=True):
     image_id = image_meta['id']
@@ -437,14 +606,16 @@ def upload_volume(context, image_service, image_meta, volume_path,
         LOG.debug("%s was %s, no need to convert to %s",
                   image_id, volume_format, image_meta['disk_format'])
         if os.name == 'nt' or os.access(volume_path, os.R_OK):
-            with open(volume_path, 'rb') as image_file:
-                image_service.update(context, image_id, {}, image_file)
+            _upload_image_file(context, image_service, image_id, volume_path)
         else:
             with utils.temporary_chown(volume_path):
-                with open(volume_path, 'rb') as image_file:
-                    image_service.update(context, image_id, {}, image_file)
+                _upload_image_file(context, image_service, image_id,
+                                   volume_path)
         return
 
+    # NOTE: qemu-img needs a seekable destination for every format it can
+    # write, so conversions are still staged. The staged file is sparse, it
+    # only takes up space for the data actually allocated in the volume.
     with temporary_file() as tmp:
         LOG.debug("%s was %s, converting to %s",
                   image_id, volume_format, image_meta['disk_format'])
@@ -477,8 +648,7 @@ def upload_volume(context, image_service, image_meta, volume_path,
                 reason=_("Converted to %(f1)s, but format is now %(f2)s") %
                 {'f1': out_format, 'f2': data.file_format})
 
-        with open(tmp, 'rb') as image_file:
-            image_service.update(context, image_id, {}, image_file)
+        _upload_image_file(context, image_service, image_id, tmp)
 
 
 def check_virtual_size(virtual_size, volume_size, image_id):
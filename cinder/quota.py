@@ -22,6 +22,7 @@ import datetime
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_log import versionutils
+from oslo_utils import excutils
 from oslo_utils import importutils
 from oslo_utils import timeutils
 import six
@@ -364,15 +365,7 @@ class DbQuotaDriver(object):
                            common user's tenant.
         """
 
-        # Set up the reservation expiration
-        if expire is None:
-            expire = CONF.reservation_expire
-        if isinstance(expire, six.integer_types):
-            expire = datetime.timedelta(seconds=expire)
-        if isinstance(expire, datetime.timedelta):
-            expire = timeutils.utcnow() + expire
-        if not isinstance(expire, datetime.datetime):
-            raise exception.InvalidReservationExpiration(expire=expire)
+        expire = self._get_expire(expire)
 
         # If project_id is None, then we use the project_id in context
         if project_id is None:
@@ -387,6 +380,51 @@ class DbQuotaDriver(object):
         return self._reserve(context, resources, quotas, deltas, expire,
                              project_id)
 
+    def reserve_bulk(self, context, resources, deltas_list, expire=None,
+                     project_id=None):
+        """Check quotas and reserve resources for several items at once.
+
+        The quotas are checked against the sum of all the deltas and the
+        reservations are created in a single transaction.
+
+        :param context: The request context, for access checks.
+        :param resources: A dictionary of the registered resources.
+        :param deltas_list: A list with a dictionary of the proposed delta
+                            changes for each item.
+        :param expire: An optional parameter specifying an expiration
+                       time for the reservations, see reserve().
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        :returns: A list with the list of reservation UUIDs of each item,
+                  in the same order as deltas_list.
+        """
+        expire = self._get_expire(expire)
+
+        # If project_id is None, then we use the project_id in context
+        if project_id is None:
+            project_id = context.project_id
+
+        keys = set()
+        for deltas in deltas_list:
+            keys.update(deltas.keys())
+        quotas = self._get_quotas(context, resources, keys,
+                                  has_sync=True, project_id=project_id)
+        return self._reserve_bulk(context, resources, quotas, deltas_list,
+                                  expire, project_id)
+
+    def _get_expire(self, expire):
+        """Return the absolute expiration time of new reservations."""
+        if expire is None:
+            expire = CONF.reservation_expire
+        if isinstance(expire, six.integer_types):
+            expire = datetime.timedelta(seconds=expire)
+        if isinstance(expire, datetime.timedelta):
+            expire = timeutils.utcnow() + expire
+        if not isinstance(expire, datetime.datetime):
+            raise exception.InvalidReservationExpiration(expire=expire)
+        return expire
+
     def _reserve(self, context, resources, quotas, deltas, expire, project_id):
         # NOTE(Vek): Most of the work here has to be done in the DB
         #            API, because we have to do it in a transaction,
@@ -397,6 +435,12 @@ class DbQuotaDriver(object):
                                 CONF.until_refresh, CONF.max_age,
                                 project_id=project_id)
 
+    def _reserve_bulk(self, context, resources, quotas, deltas_list, expire,
+                      project_id):
+        return db.quota_reserve_bulk(context, resources, quotas, deltas_list,
+                                     expire, CONF.until_refresh,
+                                     CONF.max_age, project_id=project_id)
+
     def commit(self, context, reservations, project_id=None):
         """Commit reservations.
 
@@ -650,6 +694,23 @@ class NestedDbQuotaDriver(DbQuotaDriver):
 
         return reserved
 
+    def _reserve_bulk(self, context, resources, quotas, deltas_list, expire,
+                      project_id):
+        # NOTE: Nested quotas have to update the allocated quota of the
+        # parent projects, which is done resource by resource, so each item
+        # is reserved on its own.
+        reservations = []
+        try:
+            for deltas in deltas_list:
+                reservations.append(self._reserve(context, resources, quotas,
+                                                  deltas, expire, project_id))
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                db.reservation_rollback(
+                    context, [r for item in reservations for r in item],
+                    project_id)
+        return reservations
+
 
 class BaseResource(object):
     """Describe a single resource for quota checking."""
@@ -1030,6 +1091,53 @@ class QuotaEngine(object):
 
         return reservations
 
+    def reserve_bulk(self, context, deltas_list, expire=None,
+                     project_id=None):
+        """Check quotas and reserve resources for several items at once.
+
+        Works like reserve(), but takes a list with the deltas of each item
+        and reserves all of them in a single transaction, checking the quotas
+        against their sum.  If the items together are over quota, an
+        OverQuota exception is raised and nothing is reserved.
+
+        :param context: The request context, for access checks.
+        :param deltas_list: A list with a dictionary of the proposed delta
+                            changes for each item.
+        :param expire: An optional parameter specifying an expiration
+                       time for the reservations, see reserve().
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        :returns: A list with the list of reservation UUIDs of each item,
+                  in the same order as deltas_list, that can be committed
+                  or rolled back on their own, or all rolled back with
+                  rollback_bulk().
+        """
+
+        reservations = self._driver.reserve_bulk(context, self.resources,
+                                                 deltas_list, expire=expire,
+                                                 project_id=project_id)
+
+        LOG.debug("Created reservations %s", reservations)
+
+        return reservations
+
+    def rollback_bulk(self, context, reservations_list, project_id=None):
+        """Roll back the reservations of several items at once.
+
+        Reservations that were already committed or rolled back are ignored.
+
+        :param context: The request context, for access checks.
+        :param reservations_list: A list with the reservation UUIDs of each
+                                  item, as returned by reserve_bulk().
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+        self.rollback(context,
+                      [r for item in reservations_list for r in item],
+                      project_id=project_id)
+
     def commit(self, context, reservations, project_id=None):
         """Commit reservations.
 
@@ -18,6 +18,7 @@ Pluggable Weighing support
 """
 
 import abc
+import math
 
 import six
 
@@ -58,6 +59,8 @@ class WeighedObject(object):
     def __init__(self, obj, weight):
         self.obj = obj
         self.weight = weight
+        self.weights = []
+        self.raw_weights = []
 
     def __repr__(self):
         return "<WeighedObject '%s': %s>" % (self.obj, self.weight)
@@ -121,6 +124,10 @@ class BaseWeigher(object):
 class BaseWeightHandler(base_handler.BaseHandler):
     object_class = WeighedObject
 
+    # The weight of an object is the sum of the normalized weights given by
+    # every weigher, so a single object can be re-weighed.
+    reweighable = True
+
     def get_weighed_objects(self, weigher_classes, obj_list,
                             weighing_properties):
         """Return a sorted (descending), normalized list of WeighedObjects."""
@@ -128,10 +135,25 @@ class BaseWeightHandler(base_handler.BaseHandler):
         if not obj_list:
             return []
 
+        weighed_objs, _weighers = self.weigh_objects(weigher_classes,
+                                                     obj_list,
+                                                     weighing_properties)
+        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
+    def weigh_objects(self, weigher_classes, obj_list, weighing_properties):
+        """Return the unsorted, normalized WeighedObjects and the weighers.
+
+        Each WeighedObject keeps the weight given by every weigher, before
+        and after normalization, so that reweigh_object() can update the
+        weights once the state of an object has changed.
+        """
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
+        weighers = []
         for weigher_cls in weigher_classes:
             weigher = weigher_cls()
             weights = weigher.weigh_objects(weighed_objs, weighing_properties)
+            for i, weight in enumerate(weights):
+                weighed_objs[i].raw_weights.append(weight)
 
             # Normalize the weights
             weights = normalize(weights,
@@ -140,6 +162,39 @@ class BaseWeightHandler(base_handler.BaseHandler):
 
             for i, weight in enumerate(weights):
                 obj = weighed_objs[i]
-                obj.weight += weigher.weight_multiplier() * weight
-
-        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+                weight = weigher.weight_multiplier() * weight
+                obj.weights.append(weight)
+                obj.weight += weight
+            weighers.append(weigher)
+
+        return weighed_objs, weighers
+
+    def reweigh_object(self, weighers, weighed_obj, weighed_objs,
+                       weighing_properties):
+        """Update the weights after the state of an object has changed.
+
+        The object is weighed on its own, then the weights of all the
+        weighed_objs it is ranked with are normalized again against their
+        current raw weights, so that a change in the bounds is taken into
+        account. Weighers that give the object an infinite weight keep its
+        previous raw weight, as it can only be replaced when weighing all
+        the objects at once.
+        """
+        for i, weigher in enumerate(weighers):
+            weight = weigher._weigh_object(weighed_obj.obj,
+                                           weighing_properties)
+            if not math.isinf(weight):
+                weighed_obj.raw_weights[i] = weight
+
+        for obj in weighed_objs:
+            obj.weight = 0.0
+        for i, weigher in enumerate(weighers):
+            # Bounds set by the weigher class are kept, the ones found by
+            # weigh_objects() are taken from the current raw weights.
+            weights = normalize([obj.raw_weights[i] for obj in weighed_objs],
+                                minval=type(weigher).minval,
+                                maxval=type(weigher).maxval)
+            for obj, weight in zip(weighed_objs, weights):
+                weight = weigher.weight_multiplier() * weight
+                obj.weights[i] = weight
+                obj.weight += weight
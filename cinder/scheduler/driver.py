@@ -130,6 +130,27 @@ class Scheduler(object):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_("Must implement schedule_create_volume"))
 
+    def schedule_create_volumes(self, contexts, request_spec_list,
+                                filter_properties_list):
+        """Schedule several volumes one by one.
+
+        The volumes may come from different requests, so contexts holds the
+        request context of each of them. Returns a list with, for each
+        request, None if it was scheduled or the exception that prevented
+        its scheduling. Override to place the whole batch at once.
+        """
+        results = []
+        for context, request_spec, filter_properties in zip(
+                contexts, request_spec_list, filter_properties_list):
+            try:
+                self.schedule_create_volume(context, request_spec,
+                                            filter_properties)
+            except Exception as e:
+                results.append(e)
+            else:
+                results.append(None)
+        return results
+
     def schedule_create_group(self, context, group,
                               group_spec,
                               request_spec_list,
@@ -20,6 +20,9 @@ You can customize this scheduler by specifying your own volume Filters and
 Weighing Functions.
 """
 
+import collections
+import heapq
+
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
@@ -109,6 +112,199 @@ class FilterScheduler(driver.Scheduler):
                                          filter_properties,
                                          allow_reschedule=True)
 
+    def schedule_create_volumes(self, contexts, request_spec_list,
+                                filter_properties_list):
+        """Schedule several volumes, weighing the backends once per group.
+
+        Requests that the filters and weighers cannot tell apart, see
+        _batch_key(), are filtered and weighed together. Each volume of a
+        group is then placed on the best weighed backend that still passes
+        the filters, and only that backend is weighed again after consuming
+        from it, so the next volumes see the result of the previous
+        placements.
+
+        Returns a list with, for each request, None if it was sent to the
+        chosen backend or the exception that prevented its scheduling.
+        """
+        results = [None] * len(request_spec_list)
+        if not request_spec_list:
+            return results
+
+        all_backends = list(self.host_manager.get_all_backend_states(
+            contexts[0].elevated()))
+        volume_functions = any(
+            (backend.capabilities or {}).get(function) is not None
+            for backend in all_backends
+            for function in ('filter_function', 'goodness_function'))
+
+        groups = collections.OrderedDict()
+        requests = zip(contexts, request_spec_list, filter_properties_list)
+        for index, (context, request_spec,
+                    filter_properties) in enumerate(requests):
+            try:
+                filter_properties = self._prepare_filter_properties(
+                    context, request_spec, filter_properties)
+            except Exception as e:
+                results[index] = e
+                continue
+            key = self._batch_key(context, request_spec, filter_properties,
+                                  volume_functions)
+            groups.setdefault(key, []).append(
+                (index, context, request_spec, filter_properties))
+
+        for group in groups.values():
+            self._schedule_batch(all_backends, group, results)
+        return results
+
+    # The volume properties read by the filters and weighers, except for
+    # the filter and goodness functions, which may read any of them.
+    BATCH_KEY_VOLUME_PROPERTIES = ('availability_zone', 'metadata',
+                                   'multiattach', 'project_id', 'qos_specs',
+                                   'size', 'user_id', 'volume_type_id')
+
+    def _batch_key(self, context, request_spec, filter_properties,
+                   volume_functions):
+        """Return the key of the requests that filter and weigh the same.
+
+        The key holds everything the filters and weighers read from a
+        request. When a backend reports a filter or goodness function all
+        the volume properties are part of it.
+        """
+        volume_properties = filter_properties['request_spec'].get(
+            'volume_properties') or {}
+        if not volume_functions:
+            volume_properties = {
+                name: volume_properties.get(name)
+                for name in self.BATCH_KEY_VOLUME_PROPERTIES}
+        retry = filter_properties.get('retry') or {}
+        return (context.project_id,
+                jsonutils.dumps(
+                    {'volume_properties': volume_properties,
+                     'resource_type': filter_properties.get('resource_type'),
+                     'scheduler_hints': filter_properties.get(
+                         'scheduler_hints'),
+                     'group_backend': request_spec.get('group_backend'),
+                     'retry_backends': retry.get('backends')},
+                    sort_keys=True))
+
+    def _schedule_batch(self, all_backends, requests, results):
+        """Place a group of requests that filter and weigh the same."""
+        filter_properties = requests[0][3]
+        group_backend = requests[0][2].get('group_backend')
+        backends = self.host_manager.get_filtered_backends(all_backends,
+                                                           filter_properties)
+        LOG.debug("Filtered %(backends)s for %(count)d volumes",
+                  {'backends': backends, 'count': len(requests)})
+
+        weighed = None
+        if backends:
+            weighed = self.host_manager.weigh_backends(backends,
+                                                       filter_properties)
+        if weighed is None:
+            # Without a ranking that can be updated, weigh the filtered
+            # backends again for every volume.
+            weighers = None
+            ranking = None
+        else:
+            weighed_backends, weighers = weighed
+            ranking = [(-weighed_backend.weight, order, weighed_backend)
+                       for order, weighed_backend in enumerate(
+                           weighed_backends)
+                       if not group_backend or
+                       utils.extract_host(weighed_backend.obj.backend_id) ==
+                       group_backend]
+            heapq.heapify(ranking)
+
+        for index, context, request_spec, filter_properties in requests:
+            if ranking is None:
+                weighed_backend = self._pick_batched_backend_unranked(
+                    backends, group_backend, request_spec, filter_properties)
+            else:
+                weighed_backend = self._pick_batched_backend(
+                    ranking, weighers, request_spec, filter_properties)
+            try:
+                if weighed_backend is None:
+                    LOG.warning('No weighed backend found for volume '
+                                'with properties: %s',
+                                filter_properties['request_spec'].get(
+                                    'volume_type'))
+                    raise exception.NoValidBackend(
+                        reason=_("No weighed backends available"))
+                self._send_batched_volume(context, weighed_backend.obj,
+                                          request_spec, filter_properties)
+            except Exception as e:
+                results[index] = e
+
+    def _pick_batched_backend(self, ranking, weighers, request_spec,
+                              filter_properties):
+        """Choose and consume the best backend of a ranking for a volume.
+
+        Previous volumes of the batch may have consumed the backends, so the
+        best one is checked against the filters again. Backends that do not
+        pass are skipped for this volume only.
+
+        Consuming from the chosen backend may move the bounds its weights
+        were normalized with, so all the ranked backends are re-weighed
+        and the ranking is rebuilt.
+        """
+        skipped = []
+        chosen = None
+        while ranking:
+            entry = heapq.heappop(ranking)
+            if self.host_manager.get_filtered_backends([entry[2].obj],
+                                                       filter_properties):
+                chosen = entry
+                break
+            skipped.append(entry)
+
+        ranking.extend(skipped)
+        if chosen is not None:
+            weighed_backend = chosen[2]
+            self._choose_top_backend([weighed_backend], request_spec)
+            ranking.append(chosen)
+            self.host_manager.reweigh_backend(
+                weighers, weighed_backend, [entry[2] for entry in ranking],
+                filter_properties)
+            ranking[:] = [(-entry[2].weight, entry[1], entry[2])
+                          for entry in ranking]
+        heapq.heapify(ranking)
+        return chosen[2] if chosen else None
+
+    def _pick_batched_backend_unranked(self, backends, group_backend,
+                                       request_spec, filter_properties):
+        """Choose and consume the best backend for a volume of a batch."""
+        if not backends:
+            return None
+        weighed_backends = self.host_manager.get_weighed_backends(
+            backends, filter_properties)
+        for weighed_backend in weighed_backends:
+            backend = weighed_backend.obj
+            if (group_backend and
+                    utils.extract_host(backend.backend_id) != group_backend):
+                continue
+            if self.host_manager.get_filtered_backends([backend],
+                                                       filter_properties):
+                self._choose_top_backend([weighed_backend], request_spec)
+                return weighed_backend
+        return None
+
+    def _send_batched_volume(self, context, backend, request_spec,
+                             filter_properties):
+        """Record the backend of a volume and send it the creation."""
+        updated_volume = driver.volume_update_db(context,
+                                                 request_spec['volume_id'],
+                                                 backend.host,
+                                                 backend.cluster_name)
+        self._post_select_populate_filter_properties(filter_properties,
+                                                     backend)
+
+        # context is not serializable
+        filter_properties.pop('context', None)
+
+        self.volume_rpcapi.create_volume(context, updated_volume, request_spec,
+                                         filter_properties,
+                                         allow_reschedule=True)
+
     def backend_passes_filters(self, context, backend, request_spec,
                                filter_properties):
         """Check if the specified backend passes the filters."""
@@ -273,7 +469,33 @@ class FilterScheduler(driver.Scheduler):
         Returned list is ordered by their fitness.
         """
         elevated = context.elevated()
+        filter_properties = self._prepare_filter_properties(
+            context, request_spec, filter_properties)
+
+        # Find our local list of acceptable backends by filtering and
+        # weighing our options. we virtually consume resources on
+        # it so subsequent selections can adjust accordingly.
+
+        # Note: remember, we are using an iterator here. So only
+        # traverse this list once.
+        backends = self.host_manager.get_all_backend_states(elevated)
 
+        # Filter local hosts based on requirements ...
+        backends = self.host_manager.get_filtered_backends(backends,
+                                                           filter_properties)
+        if not backends:
+            return []
+
+        LOG.debug("Filtered %s", backends)
+        # weighted_backends = WeightedHost() ... the best
+        # backend for the job.
+        weighed_backends = self.host_manager.get_weighed_backends(
+            backends, filter_properties)
+        return weighed_backends
+
+    def _prepare_filter_properties(self, context, request_spec,
+                                   filter_properties=None):
+        """Return the filter properties used to place a volume request."""
         # Since Cinder is using mixed filters from Oslo and it's own, which
         # takes 'resource_XX' and 'volume_XX' as input respectively, copying
         # 'volume_XX' to 'resource_XX' will make both filters happy.
@@ -311,26 +533,7 @@ class FilterScheduler(driver.Scheduler):
             resource_type['extra_specs'].update(
                 multiattach='<is> True')
 
-        # Find our local list of acceptable backends by filtering and
-        # weighing our options. we virtually consume resources on
-        # it so subsequent selections can adjust accordingly.
-
-        # Note: remember, we are using an iterator here. So only
-        # traverse this list once.
-        backends = self.host_manager.get_all_backend_states(elevated)
-
-        # Filter local hosts based on requirements ...
-        backends = self.host_manager.get_filtered_backends(backends,
-                                                           filter_properties)
-        if not backends:
-            return []
-
-        LOG.debug("Filtered %s", backends)
-        # weighted_backends = WeightedHost() ... the best
-        # backend for the job.
-        weighed_backends = self.host_manager.get_weighed_backends(
-            backends, filter_properties)
-        return weighed_backends
+        return filter_properties
 
     def _get_weighted_candidates_generic_group(
             self, context, group_spec, request_spec_list,
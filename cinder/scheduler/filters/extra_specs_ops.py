@@ -75,3 +75,48 @@ def match(value, req):
         pass
 
     return False
+
+
+def index_keys(value):
+    """Return the keys under which a capability value can be indexed.
+
+    A capability value matches a requirement if, and only if, one of these
+    keys is among the ones returned by :func:`requirement_keys` for it.
+    """
+    keys = set()
+    for item in (value if isinstance(value, list) else [value]):
+        if item is None:
+            continue
+        keys.add(('<is>', strutils.bool_from_string(item)))
+        try:
+            keys.add((None, item))
+        except TypeError:
+            # Unhashable values can't be equal to a requirement string
+            pass
+    return keys
+
+
+def requirement_keys(req):
+    """Return the index keys that satisfy a requirement.
+
+    Only plain, <or> and <is> requirements can be resolved from an index,
+    None is returned for any other requirement.
+    """
+    if req is None:
+        return None
+    words = req.split()
+    op = words[0] if words else None
+
+    if op == '<or>':
+        values = words[1::2]
+        return set((None, v) for v in values) if values else None
+
+    if op == '<is>':
+        if len(words) < 2:
+            return None
+        return {('<is>', strutils.bool_from_string(words[1]))}
+
+    if op in _op_methods:
+        return None
+
+    return {(None, req)}
@@ -30,6 +30,8 @@ from cinder import context as cinder_context
 from cinder import exception
 from cinder import objects
 from cinder.scheduler import filters
+from cinder.scheduler.filters import capabilities_filter
+from cinder.scheduler.filters import extra_specs_ops
 from cinder import utils
 from cinder.volume import utils as vol_utils
 from cinder.volume import volume_types
@@ -58,6 +60,16 @@ host_manager_opts = [
                default='cinder.scheduler.weights.OrderedHostWeightHandler',
                help='Which handler to use for selecting the host/pool '
                     'after weighing'),
+    cfg.IntOpt('scheduler_service_refresh_interval',
+               default=0,
+               min=0,
+               help='Minimum number of seconds between two reads of the '
+                    'volume service list from the database. Backends that '
+                    'send new capabilities in between are refreshed from '
+                    'the cached service list, and reports from unknown '
+                    'backends always trigger a read. Keep this lower than '
+                    'service_down_time. 0 reads the list for every '
+                    'scheduling request.'),
 ]
 
 CONF = cfg.CONF
@@ -123,6 +135,10 @@ class BackendState(object):
         # Does this backend support attaching a volume to more than
         # once host/instance?
         self.multiattach = False
+        # Number of volumes on the backend as seen by the scheduler, None
+        # until it has been loaded from the database. It is kept current by
+        # consume_from_volume and reset when the backend reports its stats.
+        self.volume_count = None
 
         # PoolState for all pools
         self.pools = {}
@@ -301,6 +317,8 @@ class BackendState(object):
             pass
         else:
             self.free_capacity_gb -= volume_gb
+        if self.volume_count is not None:
+            self.volume_count += 1
         self.updated = timeutils.utcnow()
 
     def __repr__(self):
@@ -328,6 +346,10 @@ class PoolState(BackendState):
         if capability:
             if self.updated and self.updated > capability['timestamp']:
                 return
+            if self.updated != capability['timestamp']:
+                # A new report may follow deletions the scheduler didn't
+                # see, so reload the volume count the next time it's needed.
+                self.volume_count = None
             self.update_backend(capability)
 
             self.total_capacity_gb = capability.get('total_capacity_gb', 0)
@@ -386,6 +408,19 @@ class HostManager(object):
         self.weight_classes = self.weight_handler.get_all_classes()
 
         self._no_capabilities_backends = set()  # Services without capabilities
+        # Volume services read by the last full refresh and when it happened
+        self._services = []
+        self._services_updated_at = None
+        # {backend_key: (capabilities, updated_at, modified_at, cluster_name)}
+        # as last applied to the backend state, to skip unchanged backends
+        self._backend_state_versions = {}
+        # Inverted index of pool capabilities used to narrow down the pools
+        # before running the filters:
+        # {(capability, extra_specs_ops index key): set(<PoolState>)}
+        self._capabilities_index = collections.defaultdict(set)
+        # {backend_key: [(<index entry>, <PoolState>)]} to update the index
+        self._indexed_capabilities = {}
+        self._indexed_pools = set()
         self._update_backend_state_map(cinder_context.get_admin_context())
         self.service_states_last_update = {}
 
@@ -448,10 +483,80 @@ class HostManager(object):
                               filter_class_names=None):
         """Filter backends and return only ones passing all filters."""
         filter_classes = self._choose_backend_filters(filter_class_names)
+        if capabilities_filter.CapabilitiesFilter in filter_classes:
+            backends = self._prefilter_backends(backends, filter_properties)
         return self.filter_handler.get_filtered_objects(filter_classes,
                                                         backends,
                                                         filter_properties)
 
+    def _prefilter_backends(self, backends, filter_properties):
+        """Drop the pools that can't satisfy the resource type extra specs.
+
+        Uses the capabilities index to discard, with set operations, the
+        indexed pools that CapabilitiesFilter would reject on plain, <or>
+        and <is> extra specs. Other backends are returned untouched.
+        """
+        resource_type = filter_properties.get('resource_type') or {}
+        extra_specs = resource_type.get('extra_specs', {})
+        if not extra_specs or not self._indexed_pools:
+            return backends
+
+        candidates = None
+        for key, req in extra_specs.items():
+            # Same scoping rules as CapabilitiesFilter
+            scope = key.split(':')
+            if len(scope) > 1 and scope[0] != 'capabilities':
+                continue
+            elif scope[0] == 'capabilities':
+                del scope[0]
+            if len(scope) != 1:
+                continue
+
+            req_keys = extra_specs_ops.requirement_keys(req)
+            if req_keys is None:
+                continue
+
+            matching = set()
+            for req_key in req_keys:
+                matching.update(
+                    self._capabilities_index.get((scope[0], req_key), ()))
+            if candidates is None:
+                candidates = matching
+            else:
+                candidates &= matching
+
+        if candidates is None:
+            return backends
+        return [backend for backend in backends
+                if backend in candidates or
+                backend not in self._indexed_pools]
+
+    def _index_capabilities(self, backend_key, backend_state):
+        """Add the capabilities of a backend's pools to the index."""
+        self._unindex_capabilities(backend_key)
+        entries = []
+        for pool in backend_state.pools.values():
+            for name, value in pool.capabilities.items():
+                for key in extra_specs_ops.index_keys(value):
+                    entries.append(((name, key), pool))
+            self._indexed_pools.add(pool)
+        for entry, pool in entries:
+            self._capabilities_index[entry].add(pool)
+        self._indexed_capabilities[backend_key] = (
+            entries, list(backend_state.pools.values()))
+
+    def _unindex_capabilities(self, backend_key):
+        """Remove the capabilities of a backend's pools from the index."""
+        entries, pools = self._indexed_capabilities.pop(backend_key,
+                                                        ((), ()))
+        for entry, pool in entries:
+            indexed = self._capabilities_index.get(entry)
+            if indexed is not None:
+                indexed.discard(pool)
+                if not indexed:
+                    del self._capabilities_index[entry]
+        self._indexed_pools.difference_update(pools)
+
     def get_weighed_backends(self, backends, weight_properties,
                              weigher_class_names=None):
         """Weigh the backends."""
@@ -460,6 +565,27 @@ class HostManager(object):
                                                        backends,
                                                        weight_properties)
 
+    def weigh_backends(self, backends, weight_properties,
+                       weigher_class_names=None):
+        """Weigh the backends so that they can be re-weighed one by one.
+
+        Returns the unsorted weighed backends and the weighers to pass to
+        reweigh_backend(), or None if the weight handler can only weigh all
+        the backends at once.
+        """
+        if not self.weight_handler.reweighable:
+            return None
+        weigher_classes = self._choose_backend_weighers(weigher_class_names)
+        return self.weight_handler.weigh_objects(weigher_classes, backends,
+                                                 weight_properties)
+
+    def reweigh_backend(self, weighers, weighed_backend, weighed_backends,
+                        weight_properties):
+        """Update the weights of the backends after consuming from one."""
+        self.weight_handler.reweigh_object(weighers, weighed_backend,
+                                           weighed_backends,
+                                           weight_properties)
+
     def update_service_capabilities(self, service_name, host, capabilities,
                                     cluster_name, timestamp):
         """Update the per-service capabilities based on this notification."""
@@ -500,6 +626,10 @@ class HostManager(object):
             self.service_states_last_update[backend] = capab_old
 
         self.service_states[backend] = capab_copy
+        if backend not in self.backend_state_map:
+            # A new backend needs its service record, so don't wait for the
+            # next scheduled read of the service list.
+            self._services_updated_at = None
 
         cluster_msg = (('Cluster: %s - Host: ' % cluster_name) if cluster_name
                        else '')
@@ -544,18 +674,28 @@ class HostManager(object):
     def has_all_capabilities(self):
         return len(self._no_capabilities_backends) == 0
 
+    def _get_volume_services(self, context):
+        """Return the volume services, reading them only when due."""
+        interval = CONF.scheduler_service_refresh_interval
+        if (not interval or self._services_updated_at is None or
+                timeutils.is_older_than(self._services_updated_at,
+                                        interval)):
+            topic = constants.VOLUME_TOPIC
+            volume_services = objects.ServiceList.get_all(context,
+                                                          {'topic': topic,
+                                                           'disabled': False,
+                                                           'frozen': False})
+            self._services = volume_services.objects
+            self._services_updated_at = timeutils.utcnow()
+        return self._services
+
     def _update_backend_state_map(self, context):
 
         # Get resource usage across the available volume nodes:
-        topic = constants.VOLUME_TOPIC
-        volume_services = objects.ServiceList.get_all(context,
-                                                      {'topic': topic,
-                                                       'disabled': False,
-                                                       'frozen': False})
         active_backends = set()
         active_hosts = set()
         no_capabilities_backends = set()
-        for service in volume_services.objects:
+        for service in self._get_volume_services(context):
             host = service.host
             if not service.is_up:
                 LOG.warning("volume service is down. (host: %s)", host)
@@ -576,20 +716,34 @@ class HostManager(object):
                 no_capabilities_backends.add(backend_key)
                 continue
 
+            active_backends.add(backend_key)
+
+            # Capabilities are replaced, never modified, on each report, so
+            # nothing changed if we see the same ones and the same service.
+            version = (capabilities, service.updated_at, service.modified_at,
+                       service.cluster_name)
+            last_version = self._backend_state_versions.get(backend_key)
+            if (backend_key in self.backend_state_map and last_version and
+                    last_version[0] is capabilities and
+                    last_version[1:] == version[1:]):
+                continue
+
             # Since the service could have been added or remove from a cluster
+            service_dict = dict(service)
             backend_state = self.backend_state_map.get(backend_key, None)
             if not backend_state:
                 backend_state = self.backend_state_cls(
                     host,
                     service.cluster_name,
                     capabilities=capabilities,
-                    service=dict(service))
+                    service=service_dict)
                 self.backend_state_map[backend_key] = backend_state
 
             # update capabilities and attributes in backend_state
             backend_state.update_from_volume_capability(capabilities,
-                                                        service=dict(service))
-            active_backends.add(backend_key)
+                                                        service=service_dict)
+            self._backend_state_versions[backend_key] = version
+            self._index_capabilities(backend_key, backend_state)
 
         self._no_capabilities_backends = no_capabilities_backends
 
@@ -603,6 +757,8 @@ class HostManager(object):
                 LOG.info("Removing non-active backend: %(backend)s from "
                          "scheduler cache.", {'backend': backend_key})
             del self.backend_state_map[backend_key]
+            self._backend_state_versions.pop(backend_key, None)
+            self._unindex_capabilities(backend_key)
 
     def get_all_backend_states(self, context):
         """Returns a dict of all the backends the HostManager knows about.
@@ -40,6 +40,7 @@ from cinder import flow_utils
 from cinder.i18n import _
 from cinder import manager
 from cinder.message import api as mess_api
+from cinder.message import message_field
 from cinder import objects
 from cinder.objects import fields
 from cinder import quota
@@ -54,8 +55,20 @@ scheduler_driver_opt = cfg.StrOpt('scheduler_driver',
                                           'FilterScheduler',
                                   help='Default scheduler driver to use')
 
+volume_batch_window_opt = cfg.FloatOpt(
+    'scheduler_volume_batch_window',
+    default=0,
+    min=0,
+    help='Time in seconds during which the volume creation requests '
+         'received by a scheduler are gathered to be scheduled together. '
+         'Requests with the same properties are then filtered and weighed '
+         'once, instead of once per volume, which speeds up the creation '
+         'of many volumes at once at the cost of this delay. 0 schedules '
+         'every request as soon as it is received.')
+
 CONF = cfg.CONF
 CONF.register_opt(scheduler_driver_opt)
+CONF.register_opt(volume_batch_window_opt)
 
 QUOTAS = quota.QUOTAS
 
@@ -81,6 +94,8 @@ class SchedulerManager(manager.CleanableManager, manager.Manager):
         self.message_api = mess_api.API()
         self.rpc_api_version = versionutils.convert_version_to_int(
             self.RPC_API_VERSION)
+        self._volume_batch = []
+        self._volume_batch_thread = None
 
     def init_host_with_rpc(self):
         ctxt = context.get_admin_context()
@@ -176,6 +191,14 @@ class SchedulerManager(manager.CleanableManager, manager.Manager):
                       request_spec=None, filter_properties=None):
         self._wait_for_scheduler()
 
+        # Rescheduled volumes carry their retry information and are placed
+        # right away.
+        if (CONF.scheduler_volume_batch_window and request_spec and
+                not (filter_properties or {}).get('retry')):
+            self._add_to_volume_batch(context, volume, request_spec,
+                                      filter_properties or {})
+            return
+
         try:
             flow_engine = create_volume.get_flow(context,
                                                  self.driver,
@@ -192,6 +215,68 @@ class SchedulerManager(manager.CleanableManager, manager.Manager):
         with flow_utils.DynamicLogListener(flow_engine, logger=LOG):
             flow_engine.run()
 
+    def _add_to_volume_batch(self, context, volume, request_spec,
+                             filter_properties):
+        """Queue a volume to be scheduled with the next batch.
+
+        The worker entry created for the volume is kept until the batch is
+        scheduled, so the volume is cleaned up if the service stops first.
+        """
+        self._volume_batch.append((context, volume, request_spec,
+                                   filter_properties))
+        if self._volume_batch_thread is None:
+            self._volume_batch_thread = eventlet.spawn_after(
+                CONF.scheduler_volume_batch_window, self._create_volume_batch)
+
+    def _create_volume_batch(self):
+        """Schedule the volumes gathered during the batch window."""
+        batch, self._volume_batch = self._volume_batch, []
+        self._volume_batch_thread = None
+        contexts, volumes, request_specs, filter_properties_list = (
+            [list(item) for item in zip(*batch)])
+        LOG.debug("Scheduling a batch of %d volumes.", len(volumes))
+        try:
+            results = self.driver.schedule_create_volumes(
+                contexts, request_specs, filter_properties_list)
+        except Exception as e:
+            LOG.exception("Failed to schedule a batch of %d volumes.",
+                          len(volumes))
+            results = [e] * len(volumes)
+
+        for ctxt, volume, request_spec, ex in zip(contexts, volumes,
+                                                  request_specs, results):
+            if ex is not None:
+                if not isinstance(ex, exception.NoValidBackend):
+                    LOG.error("Failed to schedule volume %(id)s: %(ex)s",
+                              {'id': volume.id, 'ex': ex})
+                self._create_volume_set_error(ctxt, ex, request_spec)
+            self._unset_scheduled_worker(volume)
+
+    def _create_volume_set_error(self, context, ex, request_spec):
+        """Put a volume that could not be scheduled in error state."""
+        self.message_api.create(
+            context,
+            message_field.Action.SCHEDULE_ALLOCATE_VOLUME,
+            resource_uuid=request_spec['volume_id'],
+            exception=ex)
+        volume_state = {'volume_state': {'status': 'error'}}
+        self._set_volume_state_and_notify('create_volume', volume_state,
+                                          context, ex, request_spec)
+
+    def _unset_scheduled_worker(self, volume):
+        """Remove the worker entry of a volume whose status has changed.
+
+        Like Volume.set_workers, the entry is kept when the status did not
+        change, as the volume service takes it over.
+        """
+        try:
+            volume.refresh()
+            if volume.worker and volume.status != volume.worker.status:
+                volume.unset_worker()
+        except Exception:
+            LOG.exception("Failed to remove the worker entry of volume %s.",
+                          volume.id)
+
     def _do_cleanup(self, ctxt, vo_resource):
         # We can only receive cleanup requests for volumes, but we check anyway
         # We need to cleanup the volume status for cases where the scheduler
@@ -27,6 +27,9 @@ from cinder.scheduler import weights as wts
 
 
 class StochasticHostWeightHandler(base_weight.BaseWeightHandler):
+    # Objects are drawn at random, so there is no ranking to update.
+    reweighable = False
+
     def __init__(self, namespace):
         super(StochasticHostWeightHandler, self).__init__(wts.BaseHostWeigher,
                                                           namespace)
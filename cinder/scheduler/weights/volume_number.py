@@ -42,11 +42,38 @@ class VolumeNumberWeigher(weights.BaseHostWeigher):
         """Override the weight multiplier."""
         return CONF.volume_number_multiplier
 
+    def weigh_objects(self, weighed_obj_list, weight_properties):
+        """Weigh all hosts with a single volume count query.
+
+        Hosts whose volume count is already tracked by the host manager are
+        not queried again; the others are loaded in one grouped query.
+        """
+        host_states = [obj.obj for obj in weighed_obj_list]
+        missing = set(state.host for state in host_states
+                      if getattr(state, 'volume_count', None) is None)
+        counts = {}
+        if missing:
+            context = weight_properties['context'].elevated()
+            counts = db.volume_count_get_for_hosts(context, missing)
+
+        weights = []
+        for state in host_states:
+            if state.host in counts:
+                state.volume_count = counts[state.host]
+            weights.append(state.volume_count)
+
+        if weights:
+            self.minval = min(weights)
+            self.maxval = max(weights)
+        return weights
+
     def _weigh_object(self, host_state, weight_properties):
         """Less volume number weights win.
 
         We want spreading to be the default.
         """
+        if getattr(host_state, 'volume_count', None) is not None:
+            return host_state.volume_count
         context = weight_properties['context']
         context = context.elevated()
         volume_number = db.volume_data_get_for_host(context=context,
@@ -882,8 +882,8 @@ class VolumeApiTest(test.TestCase):
             ]
         }
         self.assertEqual(expected, res_dict)
-        # Finally test that we cached the returned volumes
-        self.assertEqual(1, len(req.cached_resource()))
+        # The summary view doesn't need the full volume objects
+        self.assertIsNone(req.cached_resource())
 
     def test_volume_list_detail(self):
         self.mock_object(volume_api.API, 'get_all',
@@ -949,7 +949,7 @@ class VolumeApiTest(test.TestCase):
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
                                            viewable_admin_meta=False,
-                                           offset=0):
+                                           offset=0, fields=None):
             return [
                 v2_fakes.create_fake_volume(fake.VOLUME_ID,
                                             display_name='vol1'),
@@ -1240,7 +1240,7 @@ class VolumeApiTest(test.TestCase):
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
                                            viewable_admin_meta=False,
-                                           offset=0):
+                                           offset=0, fields=None):
             self.assertTrue(filters['no_migration_targets'])
             self.assertNotIn('all_tenants', filters)
             return [v2_fakes.create_fake_volume(fake.VOLUME_ID,
@@ -1249,7 +1249,8 @@ class VolumeApiTest(test.TestCase):
         def fake_volume_get_all(context, marker, limit,
                                 sort_keys=None, sort_dirs=None,
                                 filters=None,
-                                viewable_admin_meta=False, offset=0):
+                                viewable_admin_meta=False, offset=0,
+                                fields=None):
             return []
         self.mock_object(db, 'volume_get_all_by_project',
                          fake_volume_get_all_by_project)
@@ -1268,7 +1269,7 @@ class VolumeApiTest(test.TestCase):
                                             sort_keys=None, sort_dirs=None,
                                             filters=None,
                                             viewable_admin_meta=False,
-                                            offset=0):
+                                            offset=0, fields=None):
             self.assertNotIn('no_migration_targets', filters)
             return [v2_fakes.create_fake_volume(fake.VOLUME_ID,
                                                 display_name='vol2')]
@@ -1276,7 +1277,8 @@ class VolumeApiTest(test.TestCase):
         def fake_volume_get_all2(context, marker, limit,
                                  sort_keys=None, sort_dirs=None,
                                  filters=None,
-                                 viewable_admin_meta=False, offset=0):
+                                 viewable_admin_meta=False, offset=0,
+                                 fields=None):
             return []
         self.mock_object(db, 'volume_get_all_by_project',
                          fake_volume_get_all_by_project2)
@@ -1293,13 +1295,14 @@ class VolumeApiTest(test.TestCase):
                                             sort_keys=None, sort_dirs=None,
                                             filters=None,
                                             viewable_admin_meta=False,
-                                            offset=0):
+                                            offset=0, fields=None):
             return []
 
         def fake_volume_get_all3(context, marker, limit,
                                  sort_keys=None, sort_dirs=None,
                                  filters=None,
-                                 viewable_admin_meta=False, offset=0):
+                                 viewable_admin_meta=False, offset=0,
+                                 fields=None):
             self.assertNotIn('no_migration_targets', filters)
             self.assertNotIn('all_tenants', filters)
             return [v2_fakes.create_fake_volume(fake.VOLUME3_ID,
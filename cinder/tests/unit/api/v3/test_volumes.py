@@ -159,6 +159,40 @@ class VolumeApiTest(test.TestCase):
         volumes = res_dict['volumes']
         self.assertEqual(2, len(volumes))
 
+    @mock.patch('cinder.volume.group_types.get_default_cgsnapshot_type')
+    @mock.patch.object(group_api.API, 'get')
+    def test_volume_detail_prefetches_groups(self, mock_get_group,
+                                             mock_cgsnap_type):
+        vols = self._create_volume_with_group()
+        vols.append(db.volume_create(self.ctxt, {'display_name': 'test3',
+                                                 'project_id':
+                                                 self.ctxt.project_id,
+                                                 'group_id':
+                                                 fake.GROUP_ID}))
+        groups = {
+            fake.GROUP_ID: objects.Group(id=fake.GROUP_ID,
+                                         group_type_id=fake.GROUP_TYPE_ID),
+            fake.GROUP2_ID: objects.Group(id=fake.GROUP2_ID,
+                                          group_type_id=fake.GROUP_TYPE2_ID),
+        }
+        mock_get_group.side_effect = lambda ctxt, group_id: groups[group_id]
+        mock_cgsnap_type.return_value = {'id': fake.GROUP_TYPE_ID,
+                                         'name': 'default_cgsnapshot_type'}
+        req = fakes.HTTPRequest.blank('/v3/volumes/detail')
+        req.headers["OpenStack-API-Version"] = "volume 3.13"
+        req.api_version_request = api_version.APIVersionRequest('3.13')
+        req.environ['cinder.context'] = self.ctxt
+
+        res_dict = self.controller.detail(req)
+
+        self.assertEqual(2, mock_get_group.call_count)
+        mock_cgsnap_type.assert_called_once_with()
+        cg_ids = {vol['id']: vol['consistencygroup_id']
+                  for vol in res_dict['volumes']}
+        self.assertEqual({vols[0].id: fake.GROUP_ID,
+                          vols[1].id: None,
+                          vols[2].id: fake.GROUP_ID}, cg_ids)
+
     def _fake_volumes_summary_request(self, version='3.12', all_tenant=False,
                                       is_admin=False):
         req_url = '/v3/volumes/summary'
@@ -378,6 +378,24 @@ class BackupCephTestCase(test.TestCase):
             # Ensure the files are equal
             self.assertEqual(checksum.digest(), self.checksum.digest())
 
+    @common_mocks
+    def test_transfer_data_skips_zero_chunks(self):
+        self.service.chunk_size = self.chunk_size
+        data = (os.urandom(self.chunk_size) + b'\0' * self.chunk_size * 2 +
+                os.urandom(self.chunk_size))
+        src = six.BytesIO(data)
+
+        with tempfile.NamedTemporaryFile() as test_file:
+            mock_write = self.mock_object(test_file, 'write',
+                                          side_effect=test_file.write)
+            self.service._transfer_data(src, 'src_foo', test_file,
+                                        'dest_foo', len(data),
+                                        dest_is_zeroed=True)
+
+            self.assertEqual(2, mock_write.call_count)
+            test_file.seek(0)
+            self.assertEqual(data, test_file.read())
+
     @common_mocks
     def test_transfer_data_from_file_to_file(self):
         with tempfile.NamedTemporaryFile() as test_file:
@@ -17,6 +17,7 @@ Tests for Backup NFS driver.
 
 """
 import bz2
+import datetime
 import filecmp
 import hashlib
 import os
@@ -27,6 +28,7 @@ import zlib
 import mock
 from os_brick.remotefs import remotefs as remotefs_brick
 from oslo_config import cfg
+from oslo_utils import timeutils
 import six
 
 from cinder.backup.drivers import nfs
@@ -649,6 +651,241 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
             self.assertTrue(filecmp.cmp(self.volume_file.name,
                             restored_file.name))
 
+    def test_backup_delta_binary_sha256file(self):
+        volume_id = fake.VOLUME_ID
+
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     backup_id=fake.BACKUP_ID)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+        service.backup(backup, self.volume_file)
+
+        self.volume_file.seek(16 * 1024)
+        self.volume_file.write(os.urandom(1024))
+        self.volume_file.seek(20 * 1024)
+        self.volume_file.write(os.urandom(1024))
+
+        # The parent has a JSON sha256 file, the incremental a binary one.
+        self.flags(backup_sha256file_format='binary')
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     backup_id=fake.BACKUP2_ID,
+                                     parent_id=fake.BACKUP_ID)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        deltabackup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP2_ID)
+        service.backup(deltabackup, self.volume_file)
+        deltabackup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP2_ID)
+
+        with service.get_object_reader(
+                deltabackup.container,
+                service._sha256_filename(deltabackup)) as reader:
+            content = reader.read()
+        self.assertTrue(content.startswith(service.SHA256FILE_MAGIC))
+        self.assertEqual(32 * 32, len(content.split(b'\n', 2)[2]))
+
+        content1 = service._read_sha256file(backup)
+        content2 = service._read_sha256file(deltabackup)
+        self.assertEqual(32, len(content2['sha256s']))
+        changed = [idx for idx in range(32)
+                   if content1['sha256s'][idx] != content2['sha256s'][idx]]
+        self.assertEqual([16, 20], changed)
+        metadata = service._read_metadata(deltabackup)
+        self.assertEqual([(16 * 1024, 1024), (20 * 1024, 1024)],
+                         [(obj['offset'], obj['length'])
+                          for o in metadata['objects']
+                          for obj in o.values()])
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(deltabackup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+    def test_backup_sparse(self):
+        volume_id = fake.VOLUME_ID
+
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_sparse_detection=True)
+        self.volume_file.seek(4 * 1024)
+        self.volume_file.write(b'\0' * 16 * 1024)
+        self.volume_file.flush()
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+        service.backup(backup, self.volume_file)
+
+        backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+        metadata = service._read_metadata(backup)
+        self.assertEqual(service.SPARSE_DRIVER_VERSION, metadata['version'])
+        self.assertEqual([{'offset': 4 * 1024, 'length': 16 * 1024}],
+                         metadata['holes'])
+        self.assertEqual([(0, 4 * 1024), (20 * 1024, 4 * 1024),
+                          (24 * 1024, 8 * 1024)],
+                         [(obj['offset'], obj['length'])
+                          for o in metadata['objects']
+                          for obj in o.values()])
+        self.assertEqual(32, len(service._read_sha256file(backup)['sha256s']))
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            restored_file.write(os.urandom(32 * 1024))
+            service.restore(backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+    def test_backup_dedup(self):
+        volume_id = fake.VOLUME_ID
+
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_deduplication=True)
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     backup_id=fake.BACKUP_ID)
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     backup_id=fake.BACKUP2_ID)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        for backup_id in (fake.BACKUP_ID, fake.BACKUP2_ID):
+            self.volume_file.seek(0)
+            backup = objects.Backup.get_by_id(self.ctxt, backup_id)
+            service.backup(backup, self.volume_file)
+
+        backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+        backup2 = objects.Backup.get_by_id(self.ctxt, fake.BACKUP2_ID)
+        metadata = service._read_metadata(backup)
+        metadata2 = service._read_metadata(backup2)
+        self.assertEqual(service.DEDUP_DRIVER_VERSION, metadata2['version'])
+        # The second backup only references the chunks of the first one.
+        self.assertEqual(metadata['objects'], metadata2['objects'])
+        self.assertEqual([service._metadata_filename(backup2),
+                          service._sha256_filename(backup2)],
+                         sorted(service._generate_object_names(backup2)))
+        index = service._read_dedup_index(backup.container)
+        self.assertEqual(4, len(index['chunks']))
+        self.assertEqual({2}, {chunk['refs']
+                               for chunk in index['chunks'].values()})
+
+        # Chunks still referenced by the second backup are kept.
+        service.delete_backup(backup)
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(backup2, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+        service.delete_backup(backup2)
+        self.assertEqual({}, service._read_dedup_index(
+            backup.container)['chunks'])
+        self.assertEqual([service.DEDUP_INDEX_FILENAME],
+                         os.listdir(os.path.join(service.backup_path,
+                                                 backup.container)))
+
+    def test_backup_dedup_failed_backup_unregistered(self):
+        volume_id = fake.VOLUME_ID
+
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_deduplication=True)
+        self._create_backup_db_entry(volume_id=volume_id)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+        self.mock_object(service, '_upload_chunk',
+                         side_effect=exception.InvalidBackup(reason='fake'))
+
+        self.assertRaises(exception.InvalidBackup,
+                          service.backup, backup, self.volume_file)
+
+        index = service._read_dedup_index(backup.container)
+        self.assertEqual({}, index['active'])
+
+    def test_backup_dedup_abandoned_backup_expired(self):
+        volume_id = fake.VOLUME_ID
+
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_deduplication=True)
+        self.flags(backup_deduplication_active_timeout=3600)
+        self._create_backup_db_entry(volume_id=volume_id)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+        service.backup(backup, self.volume_file)
+
+        # A backup whose service stopped long ago is still registered.
+        index = service._read_dedup_index(backup.container)
+        started = timeutils.utcnow() - datetime.timedelta(hours=2)
+        index['active'][fake.BACKUP2_ID] = started.isoformat()
+        service._write_dedup_index(backup.container, index)
+
+        service.delete_backup(backup)
+
+        index = service._read_dedup_index(backup.container)
+        self.assertEqual({}, index['chunks'])
+        self.assertEqual({}, index['active'])
+
+    def test_restore_prefetch(self):
+        volume_id = fake.VOLUME_ID
+
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 3))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_restore_max_objects_in_flight=4)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+        service.backup(backup, self.volume_file)
+
+        fetch = self.mock_object(service, '_fetch_restore_data',
+                                 side_effect=service._fetch_restore_data)
+        with tempfile.NamedTemporaryFile() as restored_file:
+            backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+            service.restore(backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+        self.assertEqual(backup.object_count - 1, fetch.call_count)
+
+    def test_backup_pipelined_matches_serial(self):
+        volume_id = fake.VOLUME_ID
+
+        self.flags(backup_file_size=(1024 * 4))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     backup_id=fake.BACKUP_ID)
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     backup_id=fake.BACKUP2_ID)
+
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+        service.backup(backup, self.volume_file)
+
+        self.flags(backup_max_chunks_in_flight=4)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        pipelined = objects.Backup.get_by_id(self.ctxt, fake.BACKUP2_ID)
+        service.backup(pipelined, self.volume_file)
+
+        backup = objects.Backup.get_by_id(self.ctxt, fake.BACKUP_ID)
+        pipelined = objects.Backup.get_by_id(self.ctxt, fake.BACKUP2_ID)
+        self.assertEqual(backup.object_count, pipelined.object_count)
+        self.assertEqual(service._read_sha256file(backup)['sha256s'],
+                         service._read_sha256file(pipelined)['sha256s'])
+
+        def _objects(b):
+            return [{name.rsplit('-', 1)[1]: obj}
+                    for o in service._read_metadata(b)['objects']
+                    for name, obj in o.items()]
+
+        self.assertEqual(_objects(backup), _objects(pipelined))
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(pipelined, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
     def test_delete(self):
         volume_id = fake.VOLUME_ID
         self._create_backup_db_entry(volume_id=volume_id)
@@ -705,3 +942,26 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
 
         self.assertEqual('none', result[0])
         self.assertEqual(already_compressed_data, result[1])
+
+    @mock.patch('cinder.backup.chunkeddriver.tpool.execute')
+    def test_prepare_output_data_serial_no_tpool(self, mock_execute):
+        service = nfs.NFSBackupDriver(self.ctxt)
+        fake_data = self.create_buffer(128)
+
+        result = service._prepare_output_data(fake_data)
+
+        self.assertEqual('zlib', result[0])
+        mock_execute.assert_not_called()
+
+    @mock.patch('cinder.backup.chunkeddriver.tpool.execute',
+                side_effect=lambda func, *args: func(*args))
+    def test_prepare_output_data_pipelined_tpool(self, mock_execute):
+        self.flags(backup_max_chunks_in_flight=4)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        fake_data = self.create_buffer(128)
+
+        result = service._prepare_output_data(fake_data)
+
+        self.assertEqual('zlib', result[0])
+        mock_execute.assert_called_once_with(service.compressor.compress,
+                                             fake_data)
@@ -154,6 +154,12 @@ class BrickLvmTestCase(test.TestCase):
                 data = "  9.5:20\n"
             else:
                 data = "  9:12\n"
+        elif (_lvm_prefix + 'lvs, --noheadings, --unit=g, '
+              '-o, name,size,attr,origin, --separator, |' in cmd_string):
+            data = "  fake-1|1.00|owi-a-----|\n"
+            data += "  fake-snapshot|1.00|swi-a-s---|fake-1\n"
+            data += "  fake-open|1.00|-wi-ao----|\n"
+            data += "  fake-inactive|1.00|-wi-------|\n"
         elif 'lvcreate, -T, -L, ' in cmd_string:
             pass
         elif 'lvcreate, -T, -V, ' in cmd_string:
@@ -390,6 +396,44 @@ class BrickLvmTestCase(test.TestCase):
                          self.vg.lv_get_origin('fake-snapshot'))
         self.assertFalse(None, self.vg.lv_get_origin('test-volumes'))
 
+    def test_lv_cache(self):
+        self.vg._lv_cache_ttl = 60
+        execute = mock.Mock(side_effect=self.fake_execute)
+        self.vg.set_execute(execute)
+
+        self.assertTrue(self.vg.lv_has_snapshot('fake-1'))
+        self.assertTrue(self.vg.lv_is_snapshot('fake-snapshot'))
+        self.assertEqual('fake-1', self.vg.lv_get_origin('fake-snapshot'))
+        self.assertIsNone(self.vg.lv_get_origin('fake-1'))
+        self.assertTrue(self.vg.lv_is_open('fake-open'))
+        self.assertFalse(self.vg._lv_is_active('fake-inactive'))
+        self.assertEqual({'vg': 'fake-vg', 'name': 'fake-1', 'size': '1.00'},
+                         self.vg.get_volume('fake-1'))
+        self.assertEqual(1, execute.call_count)
+
+        # LVs missing from the cache are looked up on their own
+        self.assertTrue(self.vg.lv_is_snapshot('snapshot-new'))
+        self.assertEqual(2, execute.call_count)
+
+        # Changes made through this object refresh the cache
+        self.vg.extend_volume('fake-open', '2G')
+        self.assertTrue(self.vg.lv_is_open('fake-open'))
+        self.assertEqual(4, execute.call_count)
+
+    def test_lv_cache_invalidated_during_refresh(self):
+        self.vg._lv_cache_ttl = 60
+
+        def _execute(*cmd, **kwargs):
+            # An LV is changed while lvs is running.
+            self.vg._invalidate_lv_cache()
+            return self.fake_execute(*cmd, **kwargs)
+
+        self.vg.set_execute(mock.Mock(side_effect=_execute))
+
+        self.assertTrue(self.vg.lv_is_snapshot('fake-snapshot'))
+        # What lvs returned may predate the change, so it is not kept.
+        self.assertIsNone(self.vg._lv_cache)
+
     def test_activate_lv(self):
         with mock.patch.object(self.vg, '_execute'):
             self.vg._supports_lvchange_ignoreskipactivation = True
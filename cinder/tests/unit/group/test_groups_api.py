@@ -33,6 +33,7 @@ from cinder.tests.unit import utils
 
 
 GROUP_QUOTAS = quota.GROUP_QUOTAS
+QUOTAS = quota.QUOTAS
 
 
 @ddt.ddt
@@ -391,6 +392,10 @@ class GroupAPITestCase(test.TestCase):
         mock_delete_api.assert_called_once_with(mock.ANY, ret_group_snap)
         mock_policy.assert_called_with(self.ctxt, 'delete_group_snapshot')
 
+    @mock.patch('cinder.db.volume_type_get',
+                return_value={'name': 'fake_volume_type'})
+    @mock.patch.object(QUOTAS, 'reserve_bulk',
+                       return_value=[[fake.OBJECT_ID]])
     @mock.patch('cinder.objects.VolumeType.get_by_name_or_id')
     @mock.patch('cinder.db.group_volume_type_mapping_create')
     @mock.patch('cinder.volume.api.API.create')
@@ -403,7 +408,9 @@ class GroupAPITestCase(test.TestCase):
                                     mock_snap_get_all, mock_group_snap_get,
                                     mock_volume_api_create,
                                     mock_mapping_create,
-                                    mock_get_volume_type):
+                                    mock_get_volume_type,
+                                    mock_reserve_bulk,
+                                    mock_volume_type_get):
         vol_type = fake_volume.fake_volume_type_obj(
             self.ctxt,
             id=fake.VOLUME_TYPE_ID,
@@ -446,13 +453,18 @@ class GroupAPITestCase(test.TestCase):
         self.group_api._create_group_from_group_snapshot(self.ctxt, grp,
                                                          grp_snap.id)
 
+        mock_reserve_bulk.assert_called_once_with(
+            self.ctxt, [{'volumes': 1, 'gigabytes': 1,
+                         'volumes_fake_volume_type': 1,
+                         'gigabytes_fake_volume_type': 1}])
         mock_volume_api_create.assert_called_once_with(
             self.ctxt, 1, None, None,
             availability_zone=grp.availability_zone,
             group_snapshot=grp_snap,
             group=grp,
             snapshot=snap,
-            volume_type=vol_type)
+            volume_type=vol_type,
+            reservations=[fake.OBJECT_ID])
 
         mock_rpc_create_group_from_src.assert_called_once_with(
             self.ctxt, grp, grp_snap)
@@ -463,6 +475,10 @@ class GroupAPITestCase(test.TestCase):
         vol1.destroy()
         grp_snap.destroy()
 
+    @mock.patch('cinder.db.volume_type_get',
+                return_value={'name': 'fake_volume_type'})
+    @mock.patch.object(QUOTAS, 'reserve_bulk',
+                       return_value=[[fake.OBJECT_ID]])
     @mock.patch('cinder.objects.VolumeType.get_by_name_or_id')
     @mock.patch('cinder.db.group_volume_type_mapping_create')
     @mock.patch('cinder.volume.api.API.create')
@@ -475,7 +491,9 @@ class GroupAPITestCase(test.TestCase):
                                      mock_group_get,
                                      mock_volume_api_create,
                                      mock_mapping_create,
-                                     mock_get_volume_type):
+                                     mock_get_volume_type,
+                                     mock_reserve_bulk,
+                                     mock_volume_type_get):
         vol_type = fake_volume.fake_volume_type_obj(
             self.ctxt,
             id=fake.VOLUME_TYPE_ID,
@@ -512,13 +530,18 @@ class GroupAPITestCase(test.TestCase):
         self.group_api._create_group_from_source_group(self.ctxt, grp2,
                                                        grp.id)
 
+        mock_reserve_bulk.assert_called_once_with(
+            self.ctxt, [{'volumes': 1, 'gigabytes': 1,
+                         'volumes_fake_volume_type': 1,
+                         'gigabytes_fake_volume_type': 1}])
         mock_volume_api_create.assert_called_once_with(
             self.ctxt, 1, None, None,
             availability_zone=grp.availability_zone,
             source_group=grp,
             group=grp2,
             source_volume=vol,
-            volume_type=vol_type)
+            volume_type=vol_type,
+            reservations=[fake.OBJECT_ID])
 
         mock_rpc_create_group_from_src.assert_called_once_with(
             self.ctxt, grp2, None, grp)
@@ -20,6 +20,7 @@ from oslo_utils import timeutils
 
 from cinder import context as ctxt
 from cinder.db.sqlalchemy import models
+from cinder import exception
 from cinder.image import cache as image_cache
 from cinder import objects
 from cinder import test
@@ -42,24 +43,30 @@ class ImageVolumeCacheTestCase(test.TestCase):
         self.volume.update(vol_params)
         self.volume_ovo = objects.Volume(self.context, **vol_params)
 
-    def _build_cache(self, max_gb=0, max_count=0):
+    def _build_cache(self, max_gb=0, max_count=0, eviction_policy=None,
+                     headroom_percent=0):
         cache = image_cache.ImageVolumeCache(self.mock_db,
                                              self.mock_volume_api,
                                              max_gb,
-                                             max_count)
+                                             max_count,
+                                             eviction_policy,
+                                             headroom_percent)
         cache.notifier = self.notifier
         return cache
 
-    def _build_entry(self, size=10):
+    def _build_entry(self, size=10,
+                     volume_id='70a599e0-31e7-49b7-b260-868f441e862b',
+                     hit_count=0):
         entry = {
             'id': 1,
             'host': 'test@foo#bar',
             'cluster_name': 'cluster@foo#bar',
             'image_id': 'c7a8b8d4-e519-46c7-a0df-ddf1b9b9fff2',
             'image_updated_at': timeutils.utcnow(with_timezone=True),
-            'volume_id': '70a599e0-31e7-49b7-b260-868f441e862b',
+            'volume_id': volume_id,
             'size': size,
-            'last_used': timeutils.utcnow(with_timezone=True)
+            'last_used': timeutils.utcnow(with_timezone=True),
+            'hit_count': hit_count,
         }
         return entry
 
@@ -305,3 +312,98 @@ class ImageVolumeCacheTestCase(test.TestCase):
         has_space = cache.ensure_space(self.context, self.volume_ovo)
         self.assertFalse(has_space)
         mock_delete.assert_not_called()
+
+    def test_invalid_eviction_policy(self):
+        self.assertRaises(exception.InvalidInput, self._build_cache,
+                          eviction_policy='fifo')
+
+    @ddt.data(('lru', [fake.VOLUME3_ID, fake.VOLUME2_ID]),
+              ('lfu', [fake.VOLUME2_ID]),
+              ('gdsf', [fake.VOLUME_ID]))
+    @ddt.unpack
+    def test_ensure_space_eviction_policy(self, policy, expected):
+        cache = self._build_cache(max_gb=30, max_count=10,
+                                  eviction_policy=policy)
+        mock_delete = mock.patch.object(cache, '_delete_image_volume').start()
+
+        # Most recently used first, like the DB returns them.
+        entries = [self._build_entry(size=20, volume_id=fake.VOLUME_ID,
+                                     hit_count=1),
+                   self._build_entry(size=5, volume_id=fake.VOLUME2_ID),
+                   self._build_entry(size=1, volume_id=fake.VOLUME3_ID,
+                                     hit_count=5)]
+        self.mock_db.image_volume_cache_get_all.return_value = entries
+
+        self.volume_ovo.size = 8
+        has_space = cache.ensure_space(self.context, self.volume_ovo)
+
+        self.assertTrue(has_space)
+        self.assertEqual(
+            expected,
+            [c[0][1]['volume_id'] for c in mock_delete.call_args_list])
+
+    def test_ensure_space_reuses_index(self):
+        cache = self._build_cache(max_gb=30, max_count=10)
+        entries = [self._build_entry(size=10, volume_id=fake.VOLUME_ID),
+                   self._build_entry(size=5, volume_id=fake.VOLUME2_ID)]
+        self.mock_db.image_volume_cache_get_all.return_value = entries
+        last_used = max(e['last_used'] for e in entries)
+        self.mock_db.image_volume_cache_get_usage.return_value = (2, 15,
+                                                                  last_used)
+
+        self.volume_ovo.size = 5
+        self.assertTrue(cache.ensure_space(self.context, self.volume_ovo))
+        self.assertTrue(cache.ensure_space(self.context, self.volume_ovo))
+
+        self.assertEqual(1,
+                         self.mock_db.image_volume_cache_get_all.call_count)
+
+        # Another service changed the cache, the entries are read again.
+        self.mock_db.image_volume_cache_get_usage.return_value = (3, 16,
+                                                                  last_used)
+        self.assertTrue(cache.ensure_space(self.context, self.volume_ovo))
+        self.assertEqual(2,
+                         self.mock_db.image_volume_cache_get_all.call_count)
+
+        # Another service used an entry, which changes the LRU order.
+        self.mock_db.image_volume_cache_get_usage.return_value = (
+            2, 15, last_used + timedelta(seconds=1))
+        self.assertTrue(cache.ensure_space(self.context, self.volume_ovo))
+        self.assertEqual(3,
+                         self.mock_db.image_volume_cache_get_all.call_count)
+
+    @mock.patch('cinder.objects.Volume.get_by_id')
+    def test_ensure_space_volume_already_deleted(self, mock_volume_by_id):
+        cache = self._build_cache(max_gb=30, max_count=10)
+        entries = [self._build_entry(size=25, volume_id=fake.VOLUME_ID)]
+        self.mock_db.image_volume_cache_get_all.return_value = entries
+        mock_volume_by_id.side_effect = exception.VolumeNotFound(
+            volume_id=fake.VOLUME_ID)
+
+        self.volume_ovo.size = 10
+        self.assertTrue(cache.ensure_space(self.context, self.volume_ovo))
+
+        self.mock_db.image_volume_cache_delete.assert_called_once_with(
+            self.context, fake.VOLUME_ID)
+        self.mock_volume_api.delete.assert_not_called()
+
+    @mock.patch('cinder.objects.Volume.get_by_id')
+    def test_reclaim_headroom(self, mock_volume_by_id):
+        cache = self._build_cache(max_gb=20, max_count=10,
+                                  headroom_percent=50)
+        entries = [self._build_entry(size=8, volume_id=fake.VOLUME_ID),
+                   self._build_entry(size=8, volume_id=fake.VOLUME2_ID)]
+        self.mock_db.image_volume_cache_get_all.return_value = entries
+        self.mock_db.image_volume_cache_get_usage.return_value = (
+            2, 16, max(e['last_used'] for e in entries))
+
+        self.volume_ovo.size = 2
+        self.assertTrue(cache.ensure_space(self.context, self.volume_ovo))
+        self.mock_volume_api.delete.assert_not_called()
+
+        cache.reclaim_headroom(self.context)
+
+        mock_volume_by_id.assert_called_once_with(self.context,
+                                                  fake.VOLUME2_ID)
+        self.mock_volume_api.delete.assert_called_once_with(
+            self.context, mock_volume_by_id.return_value)
@@ -215,6 +215,123 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         weighed_host = sched._schedule(fake_context, request_spec, {})
         self.assertEqual('host1#lvm1', weighed_host.obj.host)
 
+    @mock.patch('cinder.scheduler.driver.volume_update_db')
+    @mock.patch('cinder.db.service_get_all')
+    def test_schedule_create_volumes(self, _mock_service_get_all,
+                                     _mock_volume_update_db):
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fakes.mock_host_manager_db_calls(_mock_service_get_all)
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+        mock_create = self.mock_object(sched.volume_rpcapi, 'create_volume')
+
+        request_specs = [
+            {'volume_properties': {'project_id': 1, 'size': 1},
+             'volume_type': {'name': 'LVM_iSCSI'},
+             'volume_id': volume_id}
+            for volume_id in (fake.VOLUME_ID, fake.VOLUME2_ID,
+                              fake.VOLUME3_ID, fake.VOLUME4_ID)]
+        request_specs[3]['group_backend'] = 'host@lvmdriver'
+        request_specs = [objects.RequestSpec.from_primitives(spec)
+                         for spec in request_specs]
+
+        host_manager = sched.host_manager
+        with mock.patch.object(
+                host_manager, 'get_filtered_backends',
+                wraps=host_manager.get_filtered_backends) as mock_filter, \
+                mock.patch.object(
+                    host_manager, 'weigh_backends',
+                    wraps=host_manager.weigh_backends) as mock_weigh, \
+                mock.patch.object(
+                    host_manager, 'get_weighed_backends') as mock_weighed:
+            results = sched.schedule_create_volumes([fake_context] * 4,
+                                                    request_specs,
+                                                    [{}, {}, {}, {}])
+
+        self.assertEqual([None, None, None], results[:3])
+        self.assertIsInstance(results[3], exception.NoValidBackend)
+        self.assertEqual(3, mock_create.call_count)
+        # Each of the 2 groups is filtered and weighed once, then only the
+        # chosen backend is checked again for each volume that gets placed.
+        self.assertEqual(2, mock_weigh.call_count)
+        mock_weighed.assert_not_called()
+        self.assertEqual(2 + 3, mock_filter.call_count)
+        for call in mock_filter.call_args_list[1:4]:
+            self.assertEqual(1, len(call[0][0]))
+
+    @mock.patch('cinder.scheduler.driver.volume_update_db')
+    @mock.patch('cinder.db.service_get_all')
+    def test_schedule_create_volumes_keeps_skipped_backend(
+            self, _mock_service_get_all, _mock_volume_update_db):
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fakes.mock_host_manager_db_calls(_mock_service_get_all)
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+        self.mock_object(sched.volume_rpcapi, 'create_volume')
+        request_specs = [objects.RequestSpec.from_primitives(
+            {'volume_properties': {'project_id': 1, 'size': 1},
+             'volume_type': {'name': 'LVM_iSCSI'},
+             'volume_id': volume_id})
+            for volume_id in (fake.VOLUME_ID, fake.VOLUME2_ID,
+                              fake.VOLUME3_ID)]
+
+        get_filtered_backends = sched.host_manager.get_filtered_backends
+        checks = []
+
+        def fake_get_filtered_backends(backends, filter_properties):
+            backends = list(backends)
+            if len(backends) == 1:
+                checks.append(backends[0])
+                # The best backend does not pass for the second volume only.
+                if len(checks) == 2:
+                    return []
+            return get_filtered_backends(backends, filter_properties)
+
+        self.mock_object(sched.host_manager, 'get_filtered_backends',
+                         side_effect=fake_get_filtered_backends)
+
+        results = sched.schedule_create_volumes([fake_context] * 3,
+                                                request_specs, [{}, {}, {}])
+
+        self.assertEqual([None, None, None], results)
+        hosts = [call[0][2] for call in _mock_volume_update_db.call_args_list]
+        self.assertNotEqual(hosts[0], hosts[1])
+        self.assertEqual(hosts[0], hosts[2])
+
+    @mock.patch('cinder.scheduler.driver.volume_update_db')
+    @mock.patch('cinder.db.service_get_all')
+    def test_schedule_create_volumes_spreads_equal_backends(
+            self, _mock_service_get_all, _mock_volume_update_db):
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fakes.mock_host_manager_db_calls(_mock_service_get_all)
+        _mock_service_get_all.return_value = (
+            _mock_service_get_all.return_value[:2])
+        capabilities = sched.host_manager.service_states['host1']
+        sched.host_manager.service_states = {'host1': dict(capabilities),
+                                             'host2': dict(capabilities)}
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+        self.mock_object(sched.volume_rpcapi, 'create_volume')
+        request_specs = [objects.RequestSpec.from_primitives(
+            {'volume_properties': {'project_id': 1, 'size': 100},
+             'volume_type': {'name': 'LVM_iSCSI'},
+             'volume_id': volume_id})
+            for volume_id in (fake.VOLUME_ID, fake.VOLUME2_ID,
+                              fake.VOLUME3_ID, fake.VOLUME4_ID)]
+
+        results = sched.schedule_create_volumes([fake_context] * 4,
+                                                request_specs,
+                                                [{}, {}, {}, {}])
+
+        self.assertEqual([None] * 4, results)
+        hosts = [utils.extract_host(call[0][2])
+                 for call in _mock_volume_update_db.call_args_list]
+        self.assertEqual({'host1', 'host2'}, set(hosts[:2]))
+        self.assertEqual(hosts[:2], hosts[2:])
+
     def test_max_attempts(self):
         self.flags(scheduler_max_attempts=4)
 
@@ -1231,6 +1231,30 @@ class ExtraSpecsOpsTestCase(test.TestCase):
             req=req,
             matches=matches)
 
+    @ddt.data({'value': '1', 'req': '1'},
+              {'value': '3', 'req': '1'},
+              {'value': 1, 'req': '1'},
+              {'value': None, 'req': '1'},
+              {'value': ['a', 'b'], 'req': 'b'},
+              {'value': {'a': 1}, 'req': 'a'},
+              {'value': True, 'req': '<is> True'},
+              {'value': 'false', 'req': '<is> True'},
+              {'value': 'no', 'req': '<is> False'},
+              {'value': None, 'req': '<is> False'},
+              {'value': '12', 'req': '<or> 11 <or> 12'},
+              {'value': '13', 'req': '<or> 11 <or> 12 <or>'})
+    @ddt.unpack
+    def test_extra_specs_index_keys(self, value, req):
+        index_keys = extra_specs_ops.index_keys(value)
+        req_keys = extra_specs_ops.requirement_keys(req)
+        cap_list = value if isinstance(value, list) else [value]
+        matches = any(extra_specs_ops.match(v, req) for v in cap_list)
+        self.assertEqual(matches, bool(index_keys & req_keys))
+
+    @ddt.data(None, '= 123', '<in> abc', 's== abc', '<is>')
+    def test_extra_specs_requirement_keys_not_indexable(self, req):
+        self.assertIsNone(extra_specs_ops.requirement_keys(req))
+
 
 @ddt.ddt
 class BasicFiltersTestCase(BackendFiltersTestCase):
@@ -30,6 +30,7 @@ from cinder import db
 from cinder import exception
 from cinder import objects
 from cinder.scheduler import filters
+from cinder.scheduler.filters import capabilities_filter
 from cinder.scheduler import host_manager
 from cinder import test
 from cinder.tests.unit import fake_constants as fake
@@ -749,6 +750,127 @@ class HostManagerTestCase(test.TestCase):
             test_service.TestService._compare(self, volume_node,
                                               backend_state_map[host].service)
 
+    @mock.patch('cinder.db.service_get_all')
+    @mock.patch('cinder.objects.service.Service.is_up',
+                new_callable=mock.PropertyMock, return_value=True)
+    def test_get_all_backend_states_incremental(self, _mock_service_is_up,
+                                                _mock_service_get_all):
+        self.flags(scheduler_service_refresh_interval=60)
+        context = 'fake_context'
+        timestamp = datetime.utcnow()
+        _mock_service_get_all.return_value = [
+            dict(id=1, host='host1', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+            dict(id=2, host='host2', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+        ]
+        self.host_manager.service_states = {
+            'host1': dict(total_capacity_gb=512, free_capacity_gb=200,
+                          timestamp=timestamp),
+            'host2': dict(total_capacity_gb=256, free_capacity_gb=100,
+                          timestamp=timestamp),
+        }
+        self.host_manager._services_updated_at = None
+
+        self.host_manager.get_all_backend_states(context)
+        self.assertEqual(1, _mock_service_get_all.call_count)
+        self.assertEqual(2, len(self.host_manager.backend_state_map))
+
+        with mock.patch.object(host_manager.BackendState,
+                               'update_from_volume_capability') as mock_update:
+            # Nothing changed, so no backend is updated
+            self.host_manager.get_all_backend_states(context)
+            self.assertFalse(mock_update.called)
+
+            # Only the backend with new capabilities is updated, from the
+            # cached service list
+            host2_capabs = dict(total_capacity_gb=256, free_capacity_gb=50,
+                                timestamp=datetime.utcnow())
+            self.host_manager.service_states['host2'] = host2_capabs
+            self.host_manager.get_all_backend_states(context)
+            mock_update.assert_called_once_with(host2_capabs,
+                                                service=mock.ANY)
+        self.assertEqual(1, _mock_service_get_all.call_count)
+
+        # A report from an unknown backend reads the service list again
+        self.host_manager.update_service_capabilities(
+            'volume', 'host3', dict(free_capacity_gb=10), None,
+            datetime.utcnow())
+        self.host_manager.get_all_backend_states(context)
+        self.assertEqual(2, _mock_service_get_all.call_count)
+
+    @mock.patch('cinder.db.service_get_all')
+    @mock.patch('cinder.objects.service.Service.is_up',
+                new_callable=mock.PropertyMock, return_value=True)
+    def test_get_filtered_backends_capabilities_index(self,
+                                                      _mock_service_is_up,
+                                                      _mock_service_get_all):
+        self.flags(scheduler_default_filters=['CapabilitiesFilter'])
+        context = 'fake_context'
+        timestamp = datetime.utcnow()
+        _mock_service_get_all.return_value = [
+            dict(id=1, host='host1', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+            dict(id=2, host='host2', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+        ]
+        self.host_manager.service_states = {
+            'host1': {'timestamp': timestamp,
+                      'pools': [{'pool_name': 'pool1', 'thin': True,
+                                 'tier': 'gold'},
+                                {'pool_name': 'pool2', 'thin': False,
+                                 'tier': ['gold', 'silver']}]},
+            'host2': {'timestamp': timestamp,
+                      'pools': [{'pool_name': 'pool3', 'thin': True,
+                                 'tier': 'bronze'}]},
+        }
+        backends = list(self.host_manager.get_all_backend_states(context))
+        fake_backend = host_manager.BackendState('fake_be', None)
+        backends.append(fake_backend)
+
+        def _get_filtered(extra_specs):
+            filter_properties = {'resource_type': {'extra_specs':
+                                                   extra_specs}}
+            with mock.patch.object(
+                    capabilities_filter.CapabilitiesFilter, 'backend_passes',
+                    return_value=True) as mock_passes:
+                result = self.host_manager.get_filtered_backends(
+                    backends, filter_properties)
+            self.assertEqual(len(result), mock_passes.call_count)
+            return set(b.host for b in result)
+
+        self.assertSetEqual({'host1#pool1', 'host1#pool2', 'host2#pool3',
+                             'fake_be'}, _get_filtered({}))
+        self.assertSetEqual({'host1#pool1', 'host1#pool2', 'fake_be'},
+                            _get_filtered({'capabilities:tier': 'gold'}))
+        self.assertSetEqual({'host1#pool1', 'fake_be'},
+                            _get_filtered({'tier': 'gold',
+                                           'thin': '<is> True'}))
+        self.assertSetEqual({'host1#pool2', 'host2#pool3', 'fake_be'},
+                            _get_filtered({'tier': '<or> silver <or> bronze',
+                                           'vendor:tier': 'gold'}))
+        # Specs that can't be indexed are left to the filters
+        self.assertSetEqual({'host1#pool1', 'host1#pool2', 'host2#pool3',
+                             'fake_be'}, _get_filtered({'tier': '<in> ol'}))
+
+        # A volume type without extra specs loaded must not be lazy-loaded
+        filter_properties = {'resource_type': objects.VolumeType(
+            name='fake_type')}
+        with mock.patch.object(objects.VolumeType,
+                               'obj_load_attr') as mock_load:
+            result = self.host_manager.get_filtered_backends(
+                backends, filter_properties)
+        mock_load.assert_not_called()
+        self.assertEqual(4, len(result))
+
+        # Removed backends are dropped from the index
+        _mock_service_get_all.return_value = (
+            _mock_service_get_all.return_value[1:])
+        self.host_manager.get_all_backend_states(context)
+        self.assertSetEqual({'host2#pool3'},
+                            set(p.host for p in
+                                self.host_manager._indexed_pools))
+
     @mock.patch('cinder.db.service_get_all')
     @mock.patch('cinder.objects.service.Service.is_up',
                 new_callable=mock.PropertyMock)
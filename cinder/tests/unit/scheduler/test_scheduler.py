@@ -198,6 +198,82 @@ class SchedulerManagerTestCase(test.TestCase):
             resource_uuid=volume.id,
             exception=mock.ANY)
 
+    @mock.patch('eventlet.spawn_after')
+    @mock.patch('cinder.scheduler.flows.create_volume.get_flow')
+    def test_create_volume_batched(self, _mock_get_flow, _mock_spawn_after):
+        self.flags(scheduler_volume_batch_window=0.5)
+        volumes = [
+            fake_volume.fake_volume_obj(self.context, id=fake.VOLUME_ID),
+            fake_volume.fake_volume_obj(self.context, id=fake.VOLUME2_ID)]
+        request_specs = [objects.RequestSpec.from_primitives(
+            {'volume_id': volume.id}) for volume in volumes]
+
+        for volume, request_spec in zip(volumes, request_specs):
+            self.manager.create_volume(self.context, volume,
+                                       request_spec=request_spec,
+                                       filter_properties={})
+
+        _mock_get_flow.assert_not_called()
+        _mock_spawn_after.assert_called_once_with(
+            0.5, self.manager._create_volume_batch)
+        self.assertEqual([(self.context, volume, request_spec, {})
+                          for volume, request_spec in zip(volumes,
+                                                          request_specs)],
+                         self.manager._volume_batch)
+
+    @mock.patch('eventlet.spawn_after')
+    @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
+    def test_create_volume_batched_reschedule(self, _mock_sched_create,
+                                              _mock_spawn_after):
+        self.flags(scheduler_volume_batch_window=0.5)
+        volume = fake_volume.fake_volume_obj(self.context)
+        request_spec = objects.RequestSpec.from_primitives(
+            {'volume_id': volume.id})
+        filter_properties = {'retry': {'num_attempts': 1, 'backends': []}}
+
+        self.manager.create_volume(self.context, volume,
+                                   request_spec=request_spec,
+                                   filter_properties=filter_properties)
+
+        _mock_sched_create.assert_called_once_with(self.context,
+                                                   request_spec,
+                                                   filter_properties)
+        _mock_spawn_after.assert_not_called()
+
+    @mock.patch('cinder.objects.Volume.refresh')
+    @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
+    @mock.patch('cinder.message.api.API.create')
+    @mock.patch('cinder.db.volume_update')
+    def test_create_volume_batch_puts_failed_volumes_in_error_state(
+            self, _mock_volume_update, _mock_message_create,
+            _mock_sched_create, _mock_refresh):
+        error = exception.NoValidBackend(reason="")
+        _mock_sched_create.side_effect = [None, error]
+        volumes = [
+            fake_volume.fake_volume_obj(self.context, id=fake.VOLUME_ID),
+            fake_volume.fake_volume_obj(self.context, id=fake.VOLUME2_ID)]
+        request_specs = [objects.RequestSpec.from_primitives(
+            {'volume_id': volume.id}) for volume in volumes]
+        self.manager._volume_batch = [
+            (self.context, volume, request_spec, {})
+            for volume, request_spec in zip(volumes, request_specs)]
+
+        self.manager._create_volume_batch()
+
+        _mock_sched_create.assert_has_calls([
+            mock.call(self.context, request_specs[0], {}),
+            mock.call(self.context, request_specs[1], {})])
+        _mock_volume_update.assert_called_once_with(self.context,
+                                                    fake.VOLUME2_ID,
+                                                    {'status': 'error'})
+        _mock_message_create.assert_called_once_with(
+            self.context, message_field.Action.SCHEDULE_ALLOCATE_VOLUME,
+            resource_uuid=fake.VOLUME2_ID,
+            exception=error)
+        self.assertEqual(2, _mock_refresh.call_count)
+        self.assertEqual([], self.manager._volume_batch)
+        self.assertIsNone(self.manager._volume_batch_thread)
+
     @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
     @mock.patch('eventlet.sleep')
     def test_create_volume_no_delay(self, _mock_sleep, _mock_sched_create):
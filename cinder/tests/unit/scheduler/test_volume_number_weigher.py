@@ -44,6 +44,11 @@ def fake_volume_data_get_for_host(context, host, count_only=False):
         return 6
 
 
+def fake_volume_count_get_for_hosts(context, hosts):
+    return {host: fake_volume_data_get_for_host(context, host, True)
+            for host in hosts}
+
+
 class VolumeNumberWeigherTestCase(test.TestCase):
 
     def setUp(self):
@@ -91,8 +96,8 @@ class VolumeNumberWeigherTestCase(test.TestCase):
         # host4: 4 volumes
         # host5: 5 volumes   Norm=-1.0
         # so, host1 should win:
-        with mock.patch.object(api, 'volume_data_get_for_host',
-                               fake_volume_data_get_for_host):
+        with mock.patch.object(api, 'volume_count_get_for_hosts',
+                               fake_volume_count_get_for_hosts):
             weighed_host = self._get_weighed_host(backend_info_list)
             self.assertEqual(0.0, weighed_host.weight)
             self.assertEqual('host1',
@@ -108,9 +113,30 @@ class VolumeNumberWeigherTestCase(test.TestCase):
         # host4: 4 volumes
         # host5: 5 volumes     Norm=1
         # so, host5 should win:
-        with mock.patch.object(api, 'volume_data_get_for_host',
-                               fake_volume_data_get_for_host):
+        with mock.patch.object(api, 'volume_count_get_for_hosts',
+                               fake_volume_count_get_for_hosts):
             weighed_host = self._get_weighed_host(backend_info_list)
             self.assertEqual(1.0, weighed_host.weight)
             self.assertEqual('host5',
                              utils.extract_host(weighed_host.obj.host))
+
+    def test_volume_number_weight_counts_cached(self):
+        self.flags(volume_number_multiplier=-1.0)
+        backend_info_list = self._get_all_backends()
+
+        with mock.patch.object(api, 'volume_count_get_for_hosts',
+                               side_effect=fake_volume_count_get_for_hosts
+                               ) as mock_count:
+            weighed_host = self._get_weighed_host(backend_info_list)
+            self.assertEqual('host1',
+                             utils.extract_host(weighed_host.obj.host))
+            mock_count.assert_called_once_with(
+                mock.ANY, set(b.host for b in backend_info_list))
+
+            # Consuming updates the tracked count without another query
+            for i in range(5):
+                weighed_host.obj.consume_from_volume({'size': 1})
+            weighed_host = self._get_weighed_host(backend_info_list)
+            self.assertEqual(1, mock_count.call_count)
+            self.assertEqual('host2',
+                             utils.extract_host(weighed_host.obj.host))
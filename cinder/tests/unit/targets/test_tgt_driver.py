@@ -20,6 +20,7 @@ from oslo_concurrency import processutils as putils
 from cinder import context
 from cinder import exception
 from cinder import test
+from cinder.tests.unit import fake_constants as fake
 from cinder.tests.unit.targets import targets_fixture as tf
 from cinder import utils
 from cinder.volume.targets import tgt
@@ -388,6 +389,45 @@ class TestTgtAdmDriver(tf.TargetDriverFixture):
             portals_ips=[self.configuration.iscsi_ip_address],
             portals_port=self.configuration.iscsi_port)
 
+    @mock.patch.object(tgt.TgtAdm, '_get_target_chap_auth',
+                       return_value=None)
+    @mock.patch.object(tgt.TgtAdm, 'ensure_export')
+    def test_ensure_exports(self, mock_ensure_export, mock_get_chap):
+        ctxt = context.get_admin_context()
+        exported_vol = dict(self.testvol, id=self.VOLUME_ID,
+                            name=self.VOLUME_NAME)
+        unbacked_vol = dict(self.testvol, id=fake.VOLUME2_ID,
+                            name='volume-' + fake.VOLUME2_ID)
+        volumes = [(self.testvol, self.testvol_path),
+                   (exported_vol, self.testvol_path),
+                   (unbacked_vol, self.testvol_path)]
+        iscsi_scan = (self.fake_iscsi_scan +
+                      'Target 2: %s%s\n'
+                      '    LUN information:\n'
+                      '        LUN: 0\n'
+                      '            Type: controller\n' %
+                      (self.iscsi_target_prefix, unbacked_vol['name']))
+
+        with mock.patch('cinder.utils.execute',
+                        return_value=(iscsi_scan, '')) as m_exec:
+            failures = self.target.ensure_exports(ctxt, volumes)
+
+        self.assertEqual({}, failures)
+        m_exec.assert_has_calls([
+            mock.call('tgt-admin', '--update', 'ALL', run_as_root=True),
+            mock.call('tgt-admin', '--show', run_as_root=True)])
+        self.assertEqual(2, m_exec.call_count)
+        for name in (self.testvol['name'], self.VOLUME_NAME,
+                     unbacked_vol['name']):
+            self.assertTrue(os.path.exists(
+                os.path.join(self.fake_volumes_dir, name)))
+        # Only the volumes missing a target or its backing lun are exported
+        # on their own
+        mock_ensure_export.assert_has_calls([
+            mock.call(ctxt, self.testvol, self.testvol_path),
+            mock.call(ctxt, unbacked_vol, self.testvol_path)])
+        self.assertEqual(2, mock_ensure_export.call_count)
+
     @test.testtools.skipIf(sys.platform == "darwin", "SKIP on OSX")
     def test_create_iscsi_target_retry(self):
         with mock.patch('cinder.utils.execute', return_value=('', '')),\
@@ -14,6 +14,7 @@
 """Unit tests for cinder.db.api."""
 
 
+import collections
 import datetime
 
 import ddt
@@ -21,9 +22,12 @@ import enum
 import mock
 from mock import call
 from oslo_config import cfg
+from oslo_db import exception as db_exc
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
 import six
+from sqlalchemy.dialects import mysql
+from sqlalchemy import orm as sqlalchemy_orm
 from sqlalchemy.sql import operators
 
 from cinder.api import common
@@ -489,6 +493,44 @@ class DBAPIVolumeTestCase(BaseTest):
                              db.volume_data_get_for_host(
                                  self.ctxt, 'h%d@lvmdriver-1' % i))
 
+    def test_volume_count_get_for_hosts(self):
+        for i in range(THREE):
+            for j in range(i + 1):
+                db.volume_create(self.ctxt, {'host':
+                                             'h%d@lvmdriver-1#pool' % i,
+                                             'size': ONE_HUNDREDS})
+        db.volume_create(self.ctxt, {'host': 'h0', 'size': ONE_HUNDREDS})
+        hosts = ['h0', 'h0@lvmdriver-1', 'h1@lvmdriver-1#pool',
+                 'h2@lvmdriver-1', 'h3@lvmdriver-1']
+        self.assertEqual({'h0': 1,
+                          'h0@lvmdriver-1': 1,
+                          'h1@lvmdriver-1#pool': 2,
+                          'h2@lvmdriver-1': 3,
+                          'h3@lvmdriver-1': 0},
+                         db.volume_count_get_for_hosts(self.ctxt, hosts))
+        for host in hosts:
+            self.assertEqual(db.volume_data_get_for_host(self.ctxt, host,
+                                                         count_only=True),
+                             db.volume_count_get_for_hosts(self.ctxt,
+                                                           [host])[host])
+
+    def test_volume_size_get_by_host(self):
+        for pool in ('pool0', 'pool0', 'pool1'):
+            db.volume_create(self.ctxt, {'host': 'h0@lvmdriver-1#' + pool,
+                                         'size': ONE_HUNDREDS,
+                                         'status': 'available'})
+        db.volume_create(self.ctxt, {'host': 'h0@lvmdriver-1#pool1',
+                                     'size': ONE_HUNDREDS,
+                                     'status': 'error'})
+        db.volume_create(self.ctxt, {'host': 'h1@lvmdriver-1#pool0',
+                                     'size': ONE_HUNDREDS,
+                                     'status': 'available'})
+        filters = {'host': 'h0@lvmdriver-1',
+                   'status': ['available', 'in-use']}
+        self.assertEqual({'h0@lvmdriver-1#pool0': 2 * ONE_HUNDREDS,
+                          'h0@lvmdriver-1#pool1': ONE_HUNDREDS},
+                         db.volume_size_get_by_host(self.ctxt, filters))
+
     def test_volume_data_get_for_project(self):
         for i in range(THREE):
             for j in range(THREE):
@@ -759,6 +801,26 @@ class DBAPIVolumeTestCase(BaseTest):
                                             self.ctxt, 'p%d' % i, None,
                                             None, ['host'], None))
 
+    def test_volume_get_all_by_project_fields(self):
+        volumes = [db.volume_create(self.ctxt, {'project_id': 'p1',
+                                                'display_name': 'vol%d' % i,
+                                                'metadata': {'key': str(i)}})
+                   for i in range(3)]
+        db.volume_create(self.ctxt, {'project_id': 'p2'})
+
+        result = db.volume_get_all_by_project(
+            self.ctxt, 'p1', None, 2, ['display_name'], ['asc'],
+            filters={'metadata': {'key': '1'}},
+            fields=('id', 'display_name'))
+        self.assertEqual([{'id': volumes[1].id, 'display_name': 'vol1'}],
+                         result)
+
+        result = db.volume_get_all_by_project(
+            self.ctxt, 'p1', None, 2, ['display_name'], ['asc'],
+            fields=('id', 'display_name'))
+        self.assertEqual([{'id': v.id, 'display_name': v.display_name}
+                          for v in volumes[:2]], result)
+
     def test_volume_get_by_name(self):
         db.volume_create(self.ctxt, {'display_name': 'vol1'})
         db.volume_create(self.ctxt, {'display_name': 'vol2'})
@@ -2426,6 +2488,123 @@ class DBAPIQuotaTestCase(BaseTest):
                           'volumes': {'reserved': 1, 'in_use': 0}},
                          quota_usage)
 
+    def test_get_quota_usages_by_resources(self):
+        _quota_reserve(self.ctxt, 'project1')
+        session = sqlalchemy_api.get_session()
+        with session.begin():
+            usages = sqlalchemy_api._get_quota_usages(
+                self.ctxt, session, 'project1', resources=['gigabytes'])
+        self.assertEqual(['gigabytes'], list(usages))
+
+    def _get_locked_quota_usages(self, func, *args):
+        """Call func and return the resources of the usages it locks."""
+        locked = []
+        with_lockmode = sqlalchemy_orm.Query.with_lockmode
+
+        def _with_lockmode(query, mode):
+            query = with_lockmode(query, mode)
+            if query.column_descriptions[0]['type'] is models.QuotaUsage:
+                statement = query.statement.compile(dialect=mysql.dialect())
+                self.assertIn('FOR UPDATE', six.text_type(statement))
+                # The rows the query matches are the ones it locks, as long
+                # as an index covers the columns it filters on.
+                locked.extend(row.resource for row in query)
+            return query
+
+        with mock.patch.object(sqlalchemy_orm.Query, 'with_lockmode',
+                               _with_lockmode):
+            func(*args)
+        return sorted(locked)
+
+    def test_quota_reserve_locks_reserved_resources(self):
+        resources = {res: quota.ReservableResource(res, '_sync_%s' % res)
+                     for res in ('volumes', 'gigabytes')}
+        quotas = {'volumes': 10, 'gigabytes': 100}
+        expire = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        db.quota_reserve(self.ctxt, resources, quotas,
+                         {'volumes': 1, 'gigabytes': 1}, expire, None, 0,
+                         'project1')
+
+        locked = self._get_locked_quota_usages(
+            db.quota_reserve, self.ctxt, resources, quotas,
+            {'gigabytes': 1}, expire, None, 0, 'project1')
+
+        self.assertEqual(['gigabytes'], locked)
+
+    def test_quota_reserve_locks_synced_resources_first(self):
+        def _sync_shared(context, project_id, session, volume_type_id=None,
+                         volume_type_name=None):
+            return {'res1': 0, 'res2': 0}
+
+        def _sync_other(context, project_id, session, volume_type_id=None,
+                        volume_type_name=None):
+            return {'res3': 0}
+
+        self.mock_object(sqlalchemy_api, 'QUOTA_SYNC_FUNCTIONS',
+                         {'_sync_shared': _sync_shared,
+                          '_sync_other': _sync_other})
+        resources = {'res1': quota.ReservableResource('res1', '_sync_shared'),
+                     'res2': quota.ReservableResource('res2', '_sync_shared'),
+                     'res3': quota.ReservableResource('res3', '_sync_other')}
+        quotas = {'res1': 10, 'res2': 10, 'res3': 10}
+        expire = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        db.quota_reserve(self.ctxt, resources, quotas,
+                         {'res1': 1, 'res3': 1}, expire, 1, 0, 'project1')
+
+        # The usage of res1 is refreshed, which refreshes res2 as well
+        with mock.patch.object(sqlalchemy_api, '_get_quota_usages',
+                               wraps=sqlalchemy_api._get_quota_usages) as get:
+            locked = self._get_locked_quota_usages(
+                db.quota_reserve, self.ctxt, resources, quotas,
+                {'res1': 1}, expire, 1, 0, 'project1')
+
+        self.assertEqual(['res1', 'res2'], locked)
+        self.assertEqual(1, get.call_count)
+
+    def test_reservation_commit_locks_reserved_resources(self):
+        reservations = _quota_reserve(self.ctxt, 'project1')
+        reservation = sqlalchemy_api.model_query(
+            self.ctxt, models.Reservation).filter_by(
+                uuid=reservations[0]).one()
+
+        locked = self._get_locked_quota_usages(
+            db.reservation_commit, self.ctxt, reservations[:1], 'project1')
+
+        self.assertEqual([reservation.resource], locked)
+        quota_usage = db.quota_usage_get(self.ctxt, 'project1',
+                                         reservation.resource)
+        self.assertEqual(0, quota_usage.reserved)
+        self.assertGreater(quota_usage.in_use, 0)
+
+    def test_reservation_rollback_locks_reserved_resources(self):
+        reservations = _quota_reserve(self.ctxt, 'project1')
+        reservation = sqlalchemy_api.model_query(
+            self.ctxt, models.Reservation).filter_by(
+                uuid=reservations[0]).one()
+
+        locked = self._get_locked_quota_usages(
+            db.reservation_rollback, self.ctxt, reservations[:1], 'project1')
+
+        self.assertEqual([reservation.resource], locked)
+
+    @mock.patch.object(sqlalchemy_api.time, 'sleep')
+    def test_retry_on_deadlock_counts_retries(self, mock_sleep):
+        results = [db_exc.DBDeadlock, db_exc.DBDeadlock, mock.sentinel.result]
+
+        def fake_func():
+            result = results.pop(0)
+            if result is db_exc.DBDeadlock:
+                raise result()
+            return result
+
+        self.mock_object(sqlalchemy_api, 'DEADLOCK_RETRIES',
+                         collections.Counter())
+
+        result = sqlalchemy_api._retry_on_deadlock(fake_func)()
+
+        self.assertEqual(mock.sentinel.result, result)
+        self.assertEqual({'fake_func': 2}, sqlalchemy_api.DEADLOCK_RETRIES)
+
     @mock.patch('oslo_utils.timeutils.utcnow', return_value=UTC_NOW)
     def test_quota_destroy(self, utcnow_mock):
         db.quota_create(self.ctxt, 'project1', 'resource1', 41)
@@ -2941,6 +3120,28 @@ class DBAPIImageVolumeCacheEntryTestCase(BaseTest):
         entries = db.image_volume_cache_get_all(self.ctxt, host=host)
         self.assertEqual([], entries)
 
+    def test_cache_entry_hit_count_and_usage(self):
+        host = 'abc@123#poolz'
+        image_updated_at = datetime.datetime.utcnow()
+        self.assertEqual((0, 0, None),
+                         db.image_volume_cache_get_usage(self.ctxt, host=host))
+
+        for i in range(0, 3):
+            db.image_volume_cache_create(self.ctxt, host, None,
+                                         'image-%s' % i, image_updated_at,
+                                         'vol-%s' % i, i + 1)
+        db.image_volume_cache_create(self.ctxt, 'someOtherHost', None,
+                                     'image-12345', image_updated_at,
+                                     'vol-1234', 100)
+
+        for i in range(0, 2):
+            entry = db.image_volume_cache_get_and_update_last_used(
+                self.ctxt, 'image-0', host=host)
+            self.assertEqual(i + 1, entry['hit_count'])
+
+        self.assertEqual((3, 6, entry['last_used']),
+                         db.image_volume_cache_get_usage(self.ctxt, host=host))
+
     @ddt.data('host1@backend1#pool1', 'host1@backend1')
     def test_cache_entry_include_in_cluster_by_host(self, host):
         """Basic cache include test filtering by host and with full rename."""
@@ -137,3 +137,30 @@ class EvaluatorTestCase(test.TestCase):
         self.assertRaises(exception.EvaluatorParseException,
                           evaluator.evaluate,
                           "7 / 0")
+
+    def test_expression_parsed_once(self):
+        self.mock_object(evaluator, '_expressions',
+                         evaluator.collections.OrderedDict())
+        parser = evaluator._def_parser()
+        self.mock_object(evaluator, '_parser', parser)
+        parse = self.mock_object(parser, 'parseString',
+                                 side_effect=parser.parseString)
+
+        stats = {'free_capacity_gb': 20}
+        self.assertTrue(evaluator.evaluate("stats.free_capacity_gb > 10",
+                                           stats=stats))
+        stats = {'free_capacity_gb': 5}
+        self.assertFalse(evaluator.evaluate("stats.free_capacity_gb > 10",
+                                            stats=stats))
+        self.assertEqual(1, parse.call_count)
+
+    def test_expression_cache_eviction(self):
+        self.mock_object(evaluator, '_expressions',
+                         evaluator.collections.OrderedDict())
+        self.mock_object(evaluator, '_MAX_CACHED_EXPRESSIONS', 2)
+
+        evaluator.evaluate("1 + 1")
+        evaluator.evaluate("2 + 2")
+        evaluator.evaluate("1 + 1")
+        evaluator.evaluate("3 + 3")
+        self.assertEqual(["1 + 1", "3 + 3"], list(evaluator._expressions))
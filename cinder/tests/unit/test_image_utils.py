@@ -17,12 +17,16 @@
 
 import errno
 import math
+import os
+import tempfile
 
+import ddt
 import mock
 from oslo_concurrency import processutils
 from oslo_utils import units
 
 from cinder import exception
+from cinder.image import glance
 from cinder.image import image_utils
 from cinder import test
 from cinder.tests.unit import fake_constants as fake
@@ -466,6 +470,7 @@ class TestTemporaryDir(test.TestCase):
         self.assertEqual(output, mock_tempdir.return_value)
 
 
+@ddt.ddt
 class TestUploadVolume(test.TestCase):
     @mock.patch('cinder.image.image_utils.CONF')
     @mock.patch('six.moves.builtins.open')
@@ -498,8 +503,10 @@ class TestUploadVolume(test.TestCase):
         self.assertEqual(2, mock_info.call_count)
         mock_open.assert_called_once_with(temp_file, 'rb')
         image_service.update.assert_called_once_with(
-            ctxt, image_meta['id'], {},
-            mock_open.return_value.__enter__.return_value)
+            ctxt, image_meta['id'], {}, mock.ANY)
+        upload_file = image_service.update.call_args[0][3]
+        self.assertEqual(mock_open.return_value.__enter__.return_value,
+                         upload_file._image_file)
 
     @mock.patch('cinder.image.image_utils.utils.temporary_chown')
     @mock.patch('cinder.image.image_utils.CONF')
@@ -527,8 +534,10 @@ class TestUploadVolume(test.TestCase):
         mock_chown.assert_called_once_with(volume_path)
         mock_open.assert_called_once_with(volume_path, 'rb')
         image_service.update.assert_called_once_with(
-            ctxt, image_meta['id'], {},
-            mock_open.return_value.__enter__.return_value)
+            ctxt, image_meta['id'], {}, mock.ANY)
+        upload_file = image_service.update.call_args[0][3]
+        self.assertEqual(mock_open.return_value.__enter__.return_value,
+                         upload_file._image_file)
 
     @mock.patch('cinder.image.image_utils.utils.temporary_chown')
     @mock.patch('cinder.image.image_utils.CONF')
@@ -555,8 +564,10 @@ class TestUploadVolume(test.TestCase):
         self.assertFalse(mock_info.called)
         mock_open.assert_called_once_with(volume_path, 'rb')
         image_service.update.assert_called_once_with(
-            ctxt, image_meta['id'], {},
-            mock_open.return_value.__enter__.return_value)
+            ctxt, image_meta['id'], {}, mock.ANY)
+        upload_file = image_service.update.call_args[0][3]
+        self.assertEqual(mock_open.return_value.__enter__.return_value,
+                         upload_file._image_file)
 
     @mock.patch('cinder.image.image_utils.CONF')
     @mock.patch('six.moves.builtins.open')
@@ -588,6 +599,38 @@ class TestUploadVolume(test.TestCase):
         self.assertEqual(2, mock_info.call_count)
         self.assertFalse(image_service.update.called)
 
+    @ddt.data(1, 2)
+    def test_upload_through_glance(self, version):
+        self.flags(glance_api_version=version)
+        image_data = b'a' * 100000
+        uploaded = []
+
+        def fake_client_call(context, method, image_id, *args, **kwargs):
+            data = args[0] if method == 'upload' else kwargs.get('data')
+            if data is not None:
+                # Like glanceclient, find the size with seek and tell, then
+                # send the data in chunks.
+                data.seek(0, os.SEEK_END)
+                size = data.tell()
+                data.seek(0)
+                body = b''.join(iter(lambda: data.read(65536), b''))
+                uploaded.append((size, body))
+            return {}
+
+        client = mock.Mock(call=mock.Mock(side_effect=fake_client_call))
+        service = glance.GlanceImageService(client=client)
+        self.mock_object(service, '_translate_from_glance')
+        with tempfile.NamedTemporaryFile() as volume_file:
+            volume_file.write(image_data)
+            volume_file.flush()
+
+            image_utils.upload_volume(mock.sentinel.context, service,
+                                      {'id': fake.IMAGE_ID,
+                                       'disk_format': 'raw'},
+                                      volume_file.name)
+
+        self.assertEqual([(len(image_data), image_data)], uploaded)
+
 
 class TestFetchToVhd(test.TestCase):
     @mock.patch('cinder.image.image_utils.fetch_to_volume_format')
@@ -1328,6 +1371,108 @@ class TestFetchToVolumeFormat(test.TestCase):
             dest, run_as_root=run_as_root)
 
 
+class FakeStreamingImageService(object):
+    def __init__(self, chunks, disk_format='raw'):
+        self.temp_images = None
+        self.chunks = chunks
+        self.disk_format = disk_format
+
+    def show(self, context, image_id):
+        return {'size': sum(len(chunk) for chunk in self.chunks),
+                'disk_format': self.disk_format,
+                'container_format': 'bare',
+                'status': 'active'}
+
+    def download(self, context, image_id, data=None):
+        return iter(self.chunks)
+
+
+class TestStreamToVolume(test.TestCase):
+    def setUp(self):
+        super(TestStreamToVolume, self).setUp()
+        self.flags(image_download_streaming=True)
+        fd, self.dest = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.dest)
+
+    def test_detect_image_format(self):
+        self.assertEqual('qcow2',
+                         image_utils.detect_image_format(b'QFI\xfb\0\0\0'))
+        self.assertEqual('vdi', image_utils.detect_image_format(
+            b'\0' * 64 + b'\x7f\x10\xda\xbe'))
+        self.assertIsNone(image_utils.detect_image_format(b'\0' * 512))
+
+    def test_can_stream_image(self):
+        image_meta = {'size': 1, 'disk_format': 'raw',
+                      'container_format': 'bare'}
+        self.assertTrue(image_utils.can_stream_image(image_meta))
+        self.assertFalse(image_utils.can_stream_image(image_meta, 'vpc'))
+        self.assertFalse(image_utils.can_stream_image(
+            dict(image_meta, disk_format='qcow2')))
+        self.flags(image_download_streaming=False)
+        self.assertFalse(image_utils.can_stream_image(image_meta))
+
+    @mock.patch('cinder.image.image_utils.convert_image')
+    @mock.patch('cinder.image.image_utils.fetch')
+    def test_stream_raw(self, mock_fetch, mock_convert):
+        chunks = [b'\x01' * 300, b'\x02' * 300, b'\0' * 1024, b'\x03' * 10]
+        image_service = FakeStreamingImageService(chunks)
+        with open(self.dest, 'wb') as volume_file:
+            volume_file.write(b'\xff' * 4096)
+
+        image_utils.fetch_to_volume_format(mock.sentinel.context,
+                                           image_service,
+                                           mock.sentinel.image_id, self.dest,
+                                           'raw', mock.sentinel.blocksize,
+                                           size=1)
+
+        with open(self.dest, 'rb') as volume_file:
+            data = volume_file.read()
+        self.assertEqual(b''.join(chunks) + b'\0' * (4096 - 1634), data)
+        mock_fetch.assert_not_called()
+        mock_convert.assert_not_called()
+
+    @mock.patch('cinder.image.image_utils.fetch')
+    def test_stream_raw_size_error(self, mock_fetch):
+        image_service = FakeStreamingImageService([b'\x01' * 512])
+        image_service.show = mock.Mock(return_value={
+            'size': 2 * units.Gi, 'disk_format': 'raw',
+            'container_format': 'bare'})
+
+        self.assertRaises(exception.ImageUnacceptable,
+                          image_utils.fetch_to_volume_format,
+                          mock.sentinel.context, image_service,
+                          mock.sentinel.image_id, self.dest, 'raw',
+                          mock.sentinel.blocksize, size=1)
+        mock_fetch.assert_not_called()
+
+    @mock.patch('cinder.image.image_utils.check_available_space')
+    @mock.patch('cinder.image.image_utils.convert_image')
+    @mock.patch('cinder.image.image_utils.fetch')
+    @mock.patch('cinder.image.image_utils.qemu_img_info')
+    def test_stream_falls_back_for_other_format(self, mock_info, mock_fetch,
+                                                mock_convert,
+                                                mock_check_space):
+        image_service = FakeStreamingImageService([b'QFI\xfb', b'\0' * 1024])
+        data = mock_info.return_value
+        data.file_format = 'qcow2'
+        data.backing_file = '/etc/shadow'
+        data.virtual_size = 1234
+        with open(self.dest, 'wb') as volume_file:
+            volume_file.write(b'\xff' * 16)
+
+        self.assertRaises(exception.ImageUnacceptable,
+                          image_utils.fetch_to_volume_format,
+                          mock.sentinel.context, image_service,
+                          mock.sentinel.image_id, self.dest, 'raw',
+                          mock.sentinel.blocksize, size=1)
+
+        self.assertTrue(mock_fetch.called)
+        mock_convert.assert_not_called()
+        with open(self.dest, 'rb') as volume_file:
+            self.assertEqual(b'\xff' * 16, volume_file.read())
+
+
 class TestXenserverUtils(test.TestCase):
     def test_is_xenserver_format(self):
         image_meta1 = {'disk_format': 'vhd', 'container_format': 'ovf'}
@@ -1261,6 +1261,23 @@ class MigrationsMixin(test_migrations.WalkVersionsMixin):
         messages = db_utils.get_table(engine, 'messages')
         self.assertEqual(255, messages.c.project_id.type.length)
 
+    def _check_105(self, engine, data):
+        entries = db_utils.get_table(engine, 'image_volume_cache_entries')
+        self.assertIsInstance(entries.c.hit_count.type,
+                              self.INTEGER_TYPE)
+
+    def _check_106(self, engine, data):
+        for table_name in ('backups', 'messages', 'snapshots',
+                           'volume_attachment', 'volumes'):
+            indexes = [index['column_names']
+                       for index in db_utils.get_indexes(engine, table_name)]
+            self.assertIn(['created_at', 'id'], indexes)
+
+    def _check_107(self, engine, data):
+        indexes = [index['column_names']
+                   for index in db_utils.get_indexes(engine, 'quota_usages')]
+        self.assertIn(['project_id', 'resource'], indexes)
+
     def test_walk_versions(self):
         self.walk_versions(False, False)
         self.assert_each_foreign_key_is_part_of_an_index()
@@ -9,6 +9,9 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+
+import datetime
+
 from cinder.common import sqlalchemyutils
 from cinder import context
 from cinder.db.sqlalchemy import api as db_api
@@ -39,3 +42,36 @@ class TestPaginateQuery(test.TestCase):
                                                   'size'],
                                        marker=marker_object,
                                        sort_dirs=['desc', 'asc', 'desc'])
+
+    def _create_volumes(self, names):
+        volumes = [
+            db_api.volume_create(
+                self.ctxt,
+                {'display_name': name,
+                 'created_at': datetime.datetime(2017, 1, i + 1)})
+            for i, name in enumerate(names)]
+        return [db_api.volume_get(self.ctxt, vol.id) for vol in volumes]
+
+    def test_paginate_query_marker(self):
+        volumes = self._create_volumes(['a', 'b', 'c', 'd', 'e'])
+
+        query = sqlalchemyutils.paginate_query(
+            self.query, self.model, 2, sort_keys=['created_at', 'id'],
+            marker=volumes[3], sort_dirs=['desc', 'desc'])
+        self.assertEqual([volumes[2].id, volumes[1].id],
+                         [vol.id for vol in query.all()])
+
+        query = sqlalchemyutils.paginate_query(
+            self.query, self.model, 2, sort_keys=['created_at', 'id'],
+            marker=volumes[1], sort_dirs=['asc', 'asc'])
+        self.assertEqual([volumes[2].id, volumes[3].id],
+                         [vol.id for vol in query.all()])
+
+    def test_paginate_query_marker_nullable_leading_key(self):
+        volumes = self._create_volumes(['a', None, 'b'])
+
+        query = sqlalchemyutils.paginate_query(
+            self.query, self.model, None, sort_keys=['display_name', 'id'],
+            marker=volumes[2], sort_dirs=['desc', 'desc'])
+        self.assertEqual({volumes[0].id, volumes[1].id},
+                         {vol.id for vol in query.all()})
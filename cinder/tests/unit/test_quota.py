@@ -1478,6 +1478,21 @@ class NestedDbQuotaDriverTestCase(NestedDbQuotaDriverBaseTestCase):
                           {'volumes': 1, 'gigabytes': 1},
                           project_id=self._child_proj_id)
 
+    @mock.patch.object(db, 'reservation_rollback')
+    def test_reserve_bulk_rolls_back_on_error(self, mock_rollback):
+        self.mock_object(self.driver, '_reserve',
+                         side_effect=[['resv1', 'resv2'],
+                                      exception.CinderException()])
+
+        self.assertRaises(exception.CinderException,
+                          self.driver._reserve_bulk, self.context,
+                          quota.QUOTAS.resources, {},
+                          [{'volumes': 1}, {'volumes': 1}], None,
+                          self._non_child_proj_id)
+        mock_rollback.assert_called_once_with(self.context,
+                                              ['resv1', 'resv2'],
+                                              self._non_child_proj_id)
+
     def test_get_subproject_quotas(self):
         self._mock_get_by_subproject()
         self._mock_volume_type_get_all()
@@ -1712,7 +1727,8 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
         def fake_get_session():
             return FakeSession()
 
-        def fake_get_quota_usages(context, session, project_id):
+        def fake_get_quota_usages(context, session, project_id,
+                                  resources=None):
             return self.usages.copy()
 
         def fake_quota_usage_create(context, project_id, resource, in_use,
@@ -2124,6 +2140,69 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
         self.assertEqual({}, self.usages_created)
         self.assertEqual({}, self.reservations_created)
 
+    def test_quota_reserve_bulk(self):
+        self.init_usage('test_project', 'volumes', 1, 0)
+        self.init_usage('test_project', 'gigabytes', 1024, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        deltas_list = [dict(volumes=1, gigabytes=1024, ),
+                       dict(volumes=1, gigabytes=2 * 1024, )]
+        self._mock_allocated_get_all_by_project()
+        result = sqa_api.quota_reserve_bulk(context, self.resources, quotas,
+                                            deltas_list, self.expire, 0, 0)
+
+        self.compare_usage(self.usages, [dict(resource='volumes',
+                                              project_id='test_project',
+                                              in_use=1,
+                                              reserved=2,
+                                              until_refresh=None),
+                                         dict(resource='gigabytes',
+                                              project_id='test_project',
+                                              in_use=1024,
+                                              reserved=3 * 1024,
+                                              until_refresh=None), ])
+        self.assertEqual(2, len(result))
+        self.assertEqual([2, 2], [len(item) for item in result])
+        self.assertEqual(4, len(set(result[0] + result[1])))
+        # The last reservation created for each resource is the one of the
+        # second item.
+        self.compare_reservation(
+            result[1],
+            [dict(resource='volumes',
+                  usage_id=self.usages['volumes'],
+                  project_id='test_project',
+                  delta=1),
+             dict(resource='gigabytes',
+                  usage_id=self.usages['gigabytes'],
+                  delta=2 * 1024), ])
+
+    def test_quota_reserve_bulk_overs_aggregate(self):
+        self.init_usage('test_project', 'volumes', 3, 0)
+        self.init_usage('test_project', 'gigabytes', 1024, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        # Each item fits within the quota, but together they do not.
+        deltas_list = [dict(volumes=1, gigabytes=1024, ),
+                       dict(volumes=1, gigabytes=1024, ),
+                       dict(volumes=1, gigabytes=1024, )]
+        self._mock_allocated_get_all_by_project()
+        self.assertRaises(exception.OverQuota,
+                          sqa_api.quota_reserve_bulk,
+                          context, self.resources, quotas,
+                          deltas_list, self.expire, 0, 0)
+
+        self.compare_usage(self.usages, [dict(resource='volumes',
+                                              project_id='test_project',
+                                              in_use=3,
+                                              reserved=0,
+                                              until_refresh=None),
+                                         dict(resource='gigabytes',
+                                              project_id='test_project',
+                                              in_use=1024,
+                                              reserved=0,
+                                              until_refresh=None), ])
+        self.assertEqual({}, self.reservations_created)
+
     def test_quota_reserve_reduction(self):
         self.init_usage('test_project', 'volumes', 10, 0)
         self.init_usage('test_project', 'gigabytes', 20 * 1024, 0)
@@ -17,9 +17,12 @@
 
 
 import datetime
+import errno
 import io
 import mock
+import os
 import six
+import tempfile
 
 import ddt
 from oslo_concurrency import processutils
@@ -556,6 +559,7 @@ class ClearVolumeTestCase(test.TestCase):
                           1024, "volume_path")
 
 
+@ddt.ddt
 class CopyVolumeTestCase(test.TestCase):
     @mock.patch('cinder.volume.utils.check_for_odirect_support',
                 return_value=True)
@@ -679,7 +683,8 @@ class CopyVolumeTestCase(test.TestCase):
         handle2 = io.RawIOBase()
         output = volume_utils.copy_volume(handle1, handle2, 1024, 1)
         self.assertIsNone(output)
-        mock_copy.assert_called_once_with(handle1, handle2, 1024)
+        mock_copy.assert_called_once_with(handle1, handle2, 1024,
+                                          sparse=False)
 
     @mock.patch('cinder.volume.utils._transfer_data')
     @mock.patch('cinder.volume.utils._open_volume_with_path')
@@ -688,7 +693,170 @@ class CopyVolumeTestCase(test.TestCase):
         output = volume_utils.copy_volume('/foo/bar', handle, 1024, 1)
         self.assertIsNone(output)
         mock_transfer.assert_called_once_with(mock.ANY, mock.ANY,
-                                              1073741824, mock.ANY)
+                                              1073741824, mock.ANY,
+                                              sparse=False,
+                                              read_ahead=mock.ANY)
+
+    @mock.patch('cinder.volume.utils.check_for_odirect_support',
+                return_value=True)
+    @mock.patch('cinder.utils.execute')
+    def test_copy_volume_dd_streams(self, mock_exec, mock_support):
+        output = volume_utils.copy_volume('/dev/sda', '/dev/sdb', 1024, '3M',
+                                          sync=True, execute=utils.execute,
+                                          sparse=True, streams=3)
+        self.assertIsNone(output)
+        extents = ((0, 342), (342, 342), (684, 340))
+        mock_exec.assert_has_calls(
+            [mock.call('dd', 'if=/dev/sda', 'of=/dev/sdb',
+                       'count=%d' % (length * units.Mi), 'bs=3M',
+                       'skip=%d' % (offset * units.Mi),
+                       'seek=%d' % (offset * units.Mi),
+                       'iflag=count_bytes,skip_bytes,direct',
+                       'oflag=seek_bytes,direct', 'conv=notrunc,sparse',
+                       run_as_root=True)
+             for offset, length in extents], any_order=True)
+        self.assertEqual(3, mock_exec.call_count)
+
+    def test_get_copy_extents(self):
+        self.assertEqual([(0, 0)], volume_utils._get_copy_extents(0, 4))
+        self.assertEqual([(0, 2 * units.Mi)],
+                         volume_utils._get_copy_extents(2, 1))
+        self.assertEqual([(0, units.Mi), (units.Mi, units.Mi)],
+                         volume_utils._get_copy_extents(2, 8))
+
+    @ddt.data(0, 2)
+    def test_transfer_data(self, read_ahead):
+        data = b'\x01' * 5 + b'\0' * 10 + b'\x02' * 5 + b'\0' * 5
+        src = io.BytesIO(data)
+        dest = io.BytesIO()
+
+        volume_utils._transfer_data(src, dest, len(data), 5, sparse=True,
+                                    read_ahead=read_ahead)
+
+        # Zero chunks were skipped except the last one.
+        self.assertEqual(data, dest.getvalue())
+        self.assertEqual(len(data), dest.tell())
+
+    @ddt.data(1, 2)
+    def test_transfer_data_read_ahead(self, read_ahead):
+        data = bytes(bytearray(range(256))) * 4 + b'end'
+        src = io.BytesIO(data)
+        dest = io.BytesIO()
+
+        volume_utils._transfer_data(src, dest, len(data), 7,
+                                    read_ahead=read_ahead)
+
+        # Every chunk is written once, in order.
+        self.assertEqual(data, dest.getvalue())
+
+    @ddt.data(0, 2)
+    def test_transfer_data_bytes_only_dest(self, read_ahead):
+        class BytesOnlyFile(object):
+            """Like an RBD image, only accepts bytes."""
+            def __init__(self):
+                self.data = b''
+
+            def write(self, data):
+                if not isinstance(data, bytes):
+                    raise TypeError('data must be a byte string')
+                self.data += data
+
+            def flush(self):
+                pass
+
+        data = b'\x01' * 12
+        dest = BytesOnlyFile()
+
+        volume_utils._transfer_data(io.BytesIO(data), dest, len(data), 5,
+                                    read_ahead=read_ahead)
+
+        self.assertEqual(data, dest.data)
+
+    @ddt.data(0, 2)
+    @mock.patch.object(volume_utils, '_transfer_data_in_kernel',
+                       return_value=0)
+    def test_transfer_data_files_buffer_ring(self, read_ahead,
+                                             mock_kernel_copy):
+        data = bytes(bytearray(range(256))) * 4 + b'end'
+        src_path = self._make_file(data)
+        dest_path = self._make_file(b'')
+
+        with open(src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+            volume_utils._transfer_data(src, dest, len(data), 7,
+                                        read_ahead=read_ahead)
+
+        # Buffers are not reused while their chunk is still to be written.
+        with open(dest_path, 'rb') as dest:
+            self.assertEqual(data, dest.read())
+
+    def test_transfer_data_read_error(self):
+        src = mock.Mock(spec=['read'])
+        src.read.side_effect = IOError
+        dest = io.BytesIO()
+
+        self.assertRaises(IOError, volume_utils._transfer_data, src, dest,
+                          10, 5, read_ahead=2)
+
+    def _make_file(self, data):
+        fd, path = tempfile.mkstemp()
+        os.write(fd, data)
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_transfer_data_in_kernel(self):
+        data = b'\x01' * 10 + b'\0' * 10
+        src_path = self._make_file(data)
+        dest_path = self._make_file(b'')
+
+        with open(src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+            copied = volume_utils._transfer_data_in_kernel(src, dest,
+                                                           len(data), 8)
+
+        if hasattr(os, 'copy_file_range') or hasattr(os, 'sendfile'):
+            self.assertEqual(len(data), copied)
+            with open(dest_path, 'rb') as dest:
+                self.assertEqual(data, dest.read())
+        else:
+            self.assertEqual(0, copied)
+
+    @mock.patch.object(volume_utils, '_copy_file_range')
+    @mock.patch.object(volume_utils, '_sendfile')
+    def test_transfer_data_in_kernel_fallback(self, mock_sendfile,
+                                              mock_copy_file_range):
+        self.mock_object(volume_utils.os, 'copy_file_range', create=True)
+        self.mock_object(volume_utils.os, 'sendfile', create=True)
+        mock_copy_file_range.side_effect = OSError(errno.EXDEV, 'error')
+        mock_sendfile.side_effect = [8, 2]
+        src = mock.Mock(**{'fileno.return_value': 3})
+        dest = mock.Mock(**{'fileno.return_value': 4})
+
+        copied = volume_utils._transfer_data_in_kernel(src, dest, 10, 8)
+
+        self.assertEqual(10, copied)
+        mock_copy_file_range.assert_called_once_with(3, 4, 8)
+        mock_sendfile.assert_has_calls([mock.call(3, 4, 8),
+                                        mock.call(3, 4, 2)])
+
+    def test_transfer_data_in_kernel_error(self):
+        self.mock_object(volume_utils.os, 'copy_file_range', create=True)
+        self.mock_object(volume_utils, '_copy_file_range',
+                         side_effect=OSError(errno.EIO, 'error'))
+        src = mock.Mock(**{'fileno.return_value': 3})
+        dest = mock.Mock(**{'fileno.return_value': 4})
+
+        self.assertRaises(OSError, volume_utils._transfer_data_in_kernel,
+                          src, dest, 10, 8)
+
+    def test_chunk_reader_read_fallback(self):
+        src = mock.Mock(**{'readinto.side_effect': NotImplementedError,
+                           'read.return_value': b'data'})
+        reader = volume_utils._ChunkReader(src, 4, 2)
+
+        self.assertEqual(b'data', reader.read(4))
+        self.assertEqual(b'data', reader.read(4))
+        src.readinto.assert_called_once_with(mock.ANY)
+        self.assertEqual(2, src.read.call_count)
 
 
 @ddt.ddt
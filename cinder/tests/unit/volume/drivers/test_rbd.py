@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
 import ddt
 import math
 import os
@@ -1166,6 +1167,64 @@ class RBDTestCase(test.TestCase):
             '{"prefix":"df", "format":"json"}', '')
         self.assertDictEqual(expected, actual)
 
+    @mock.patch('cinder.volume.drivers.rbd.RADOSClient')
+    def test_get_usage_info(self, mock_client):
+        self.driver.rbd = mock.Mock()
+        self.driver.rbd.ImageNotFound = MockImageNotFoundException
+        self.driver.rbd.RBD.return_value.list.return_value = [
+            'volume-a', 'snapshot-a', 'volume-b', 'volume-c']
+        images = {'volume-a': mock.Mock(**{'size.return_value': units.Gi}),
+                  'volume-b': mock.Mock(**{'size.return_value': units.Mi})}
+
+        def _open_image(ioctx, name, read_only):
+            if name not in images:
+                raise MockImageNotFoundException()
+            return images[name]
+        self.driver.rbd.Image.side_effect = _open_image
+
+        self.assertEqual({'volume-a': units.Gi, 'volume-b': units.Mi},
+                         self.driver._get_usage_info())
+        for image in images.values():
+            image.close.assert_called_once_with()
+
+    @common_mocks
+    def test_get_provisioned_capacity(self):
+        self.cfg.rbd_usage_reconcile_interval = 3600
+        mock_usage_info = self.mock_object(
+            self.driver, '_get_usage_info',
+            return_value={'volume-a': 10 * units.Gi})
+
+        self.assertEqual(10, self.driver._get_provisioned_capacity())
+        self.driver._set_usage('volume-b', units.Gi / 2)
+        self.driver._set_usage('snapshot-b', units.Gi)
+        self.assertEqual(11, self.driver._get_provisioned_capacity())
+        self.driver._set_usage('volume-a', None)
+        self.assertEqual(1, self.driver._get_provisioned_capacity())
+        mock_usage_info.assert_called_once_with()
+
+    @common_mocks
+    @mock.patch('eventlet.spawn_n', side_effect=lambda f: f())
+    def test_get_provisioned_capacity_reconcile(self, mock_spawn):
+        self.cfg.rbd_usage_reconcile_interval = 60
+
+        def _get_usage_info():
+            # Changes made during the scan are kept
+            self.driver._set_usage('volume-c', units.Gi)
+            return {'volume-a': 2 * units.Gi}
+
+        self.mock_object(self.driver, '_get_usage_info',
+                         return_value={'volume-b': units.Gi})
+        self.assertEqual(1, self.driver._get_provisioned_capacity())
+        mock_spawn.assert_not_called()
+
+        self.driver._usage_reconciled_at -= datetime.timedelta(seconds=61)
+        self.driver._get_usage_info.side_effect = _get_usage_info
+        self.driver._get_provisioned_capacity()
+        mock_spawn.assert_called_once_with(
+            self.driver._reconcile_usage_in_background)
+        self.assertEqual({'volume-a': 2 * units.Gi, 'volume-c': units.Gi},
+                         self.driver._image_sizes)
+
     @common_mocks
     def test_get_mon_addrs(self):
         with mock.patch.object(self.driver, '_execute') as mock_execute:
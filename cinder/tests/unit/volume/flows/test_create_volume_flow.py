@@ -14,6 +14,7 @@
 #    under the License.
 """ Tests for create_volume TaskFlow """
 
+import hashlib
 import sys
 
 import ddt
@@ -1098,6 +1099,48 @@ class CreateVolumeFlowManagerImageCacheTestCase(test.TestCase):
             image_meta=image_meta
         )
 
+    @ddt.data(True, False)
+    @mock.patch('cinder.image.image_utils.qemu_img_info')
+    @mock.patch('cinder.image.image_utils.check_available_space')
+    def test_create_from_image_streamed(
+            self, driver_streams, mock_check_space, mock_qemu_info,
+            mock_get_internal_context, mock_create_from_img_dl,
+            mock_create_from_src, mock_handle_bootable, mock_fetch_img):
+        self.override_config('image_download_streaming', True)
+        mock_get_internal_context.return_value = None
+        self.mock_driver.clone_image.return_value = (None, False)
+        self.mock_driver.can_stream_image_to_volume.return_value = (
+            driver_streams)
+        image_info = imageutils.QemuImgInfo()
+        image_info.virtual_size = '1073741824'
+        mock_qemu_info.return_value = image_info
+        volume = fake_volume.fake_volume_obj(self.ctxt,
+                                             host='host@backend#pool')
+        image_id = fakes.IMAGE_ID
+        image_meta = {'id': image_id, 'disk_format': 'raw',
+                      'container_format': 'bare', 'size': 1073741824}
+
+        manager = create_volume_manager.CreateVolumeFromSpecTask(
+            self.mock_volume_manager,
+            self.mock_db,
+            self.mock_driver,
+            image_volume_cache=self.mock_cache
+        )
+
+        manager._create_from_image(self.ctxt,
+                                   volume,
+                                   'someImageLocationStr',
+                                   image_id,
+                                   image_meta,
+                                   self.mock_image_service)
+
+        self.mock_driver.can_stream_image_to_volume.assert_called_with(
+            volume, image_meta)
+        # The image is only staged when the driver does not stream it.
+        self.assertEqual(not driver_streams, mock_check_space.called)
+        self.assertEqual(not driver_streams, mock_fetch_img.called)
+        self.assertTrue(mock_create_from_img_dl.called)
+
     @ddt.data(
         NotImplementedError('Driver does not support clone'),
         exception.CinderException('Error during cloning'))
@@ -1248,6 +1291,49 @@ class CreateVolumeFlowManagerImageCacheTestCase(test.TestCase):
             image_meta=image_meta
         )
 
+    @ddt.data(None, fakes.ENCRYPTION_KEY_ID)
+    @mock.patch('cinder.image.image_utils.qemu_img_info')
+    @mock.patch('cinder.coordination.COORDINATOR.get_lock')
+    def test_create_from_image_cache_coalesced(
+            self, encryption_key_id, mock_get_lock, mock_qemu_info,
+            mock_get_internal_context, mock_create_from_img_dl,
+            mock_create_from_src, mock_handle_bootable, mock_fetch_img):
+        image_info = imageutils.QemuImgInfo()
+        image_info.virtual_size = '1073741824'
+        mock_qemu_info.return_value = image_info
+        self.mock_cache.get_entry.return_value = {
+            'volume_id': fakes.VOLUME2_ID
+        }
+        volume = fake_volume.fake_volume_obj(
+            self.ctxt, host='host@backend#pool',
+            encryption_key_id=encryption_key_id)
+        image_id = fakes.IMAGE_ID
+        image_meta = {'id': image_id, 'size': 1024,
+                      'updated_at': '2017-01-01T00:00:00.000000'}
+
+        manager = create_volume_manager.CreateVolumeFromSpecTask(
+            self.mock_volume_manager,
+            self.mock_db,
+            self.mock_driver,
+            image_volume_cache=self.mock_cache
+        )
+        manager._create_from_image_cache_or_download(
+            self.ctxt, volume, 'someImageLocationStr', image_id, image_meta,
+            self.mock_image_service)
+
+        if encryption_key_id:
+            # Encrypted volumes aren't cached, so there's nothing to wait for
+            self.assertFalse(mock_get_lock.called)
+        else:
+            # Requests for the same image version on the same backend share
+            # the lock, and the waiting ones clone the cached image-volume.
+            key = 'host@backend-%s-2017-01-01T00:00:00.000000' % image_id
+            mock_get_lock.assert_called_once_with(
+                'image-cache-' + hashlib.sha1(key.encode('utf-8')).hexdigest())
+            mock_create_from_src.assert_called_once_with(self.ctxt, volume,
+                                                         fakes.VOLUME2_ID)
+            self.assertFalse(mock_create_from_img_dl.called)
+
     @mock.patch('cinder.db.volume_update')
     @mock.patch('cinder.objects.Volume.get_by_id')
     @mock.patch('cinder.image.image_utils.qemu_img_info')
@@ -487,6 +487,31 @@ class GenericVolumeDriverTestCase(BaseDriverTestCase):
         mock_detach_volume.assert_called_once_with(
             self.context, attach_info, volume, properties)
 
+    @mock.patch.object(image_utils, 'can_stream_image', return_value=True)
+    def test_can_stream_image_to_volume(self, mock_can_stream):
+        class StagingDriver(driver.VolumeDriver):
+            def copy_image_to_volume(self, context, volume, image_service,
+                                     image_id):
+                pass
+
+        image_meta = {'disk_format': 'raw'}
+        volume = fake_volume.fake_volume_obj(self.context)
+        encrypted_volume = fake_volume.fake_volume_obj(
+            self.context, encryption_key_id=fake.ENCRYPTION_KEY_ID)
+        generic = driver.VolumeDriver(configuration=self.configuration)
+        staging = StagingDriver(configuration=self.configuration)
+
+        self.assertTrue(generic.can_stream_image_to_volume(volume,
+                                                           image_meta))
+        self.assertFalse(staging.can_stream_image_to_volume(volume,
+                                                            image_meta))
+        # The encrypted copy still goes through the generic implementation.
+        self.assertTrue(staging.can_stream_image_to_volume(encrypted_volume,
+                                                           image_meta))
+        mock_can_stream.return_value = False
+        self.assertFalse(generic.can_stream_image_to_volume(volume,
+                                                            image_meta))
+
 
 class FibreChannelTestCase(BaseDriverTestCase):
     """Test Case for FibreChannelDriver."""
@@ -391,6 +391,100 @@ class ImageVolumeCacheTestCase(base.BaseVolumeTestCase):
                                                        volume['id'])
         self.assertIsNone(entry)
 
+    def test_get_image_volume_cache_warm_list(self):
+        opts = {'image_volume_cache_warm_images': [fake.IMAGE_ID],
+                'image_volume_cache_warm_popular_count': 2}
+        updated_at = datetime.datetime.utcnow()
+        for i, image_id in enumerate((fake.IMAGE_ID, fake.VOLUME_ID,
+                                      fake.VOLUME2_ID, fake.VOLUME3_ID)):
+            db.image_volume_cache_create(self.context, 'host@backend#pool',
+                                         None, image_id, updated_at,
+                                         'vol-%s' % i, 1)
+            for _hit in range(i):
+                db.image_volume_cache_get_and_update_last_used(
+                    self.context, image_id, host='host@backend#pool')
+
+        with mock.patch.object(self.volume.driver.configuration, 'safe_get',
+                               side_effect=opts.get):
+            image_ids = self.volume._get_image_volume_cache_warm_list(
+                self.context)
+
+        self.assertEqual([fake.IMAGE_ID, fake.VOLUME3_ID, fake.VOLUME2_ID],
+                         image_ids)
+
+    @mock.patch('cinder.context.get_internal_tenant_context')
+    @mock.patch.object(vol_manager.VolumeManager,
+                       '_warm_image_volume_cache_entry')
+    @mock.patch.object(vol_manager.VolumeManager, '_get_pool_names',
+                       return_value=['pool'])
+    @mock.patch.object(vol_manager.VolumeManager,
+                       '_get_image_volume_cache_warm_list',
+                       return_value=[fake.IMAGE_ID, fake.VOLUME_ID,
+                                     fake.VOLUME2_ID])
+    def test_warm_image_volume_cache(self, mock_warm_list, mock_pools,
+                                     mock_warm, mock_internal_ctx):
+        self.volume.image_volume_cache = mock.Mock()
+        self.volume._image_cache_warm_failures = {}
+        self.volume._image_cache_warming = False
+        self.volume.cluster = None
+        mock_spawn = self.mock_object(
+            self.volume, '_add_to_threadpool',
+            side_effect=lambda func, *args: func(*args))
+        host = self.volume.host + '#pool'
+        db.image_volume_cache_create(self.context, host, None, fake.IMAGE_ID,
+                                     datetime.datetime.utcnow(),
+                                     fake.VOLUME4_ID, 1)
+        mock_warm.side_effect = (False, True, True)
+
+        # The image that failed is not tried again right away.
+        self.volume._warm_image_volume_cache(self.context)
+        self.volume._warm_image_volume_cache(self.context)
+
+        self.assertEqual(2, mock_spawn.call_count)
+        self.assertFalse(self.volume._image_cache_warming)
+        internal_ctx = mock_internal_ctx.return_value
+        self.assertEqual([mock.call(internal_ctx, 'pool', fake.VOLUME_ID),
+                          mock.call(internal_ctx, 'pool', fake.VOLUME2_ID),
+                          mock.call(internal_ctx, 'pool', fake.VOLUME2_ID)],
+                         mock_warm.call_args_list)
+        self.assertEqual([(host, fake.VOLUME_ID)],
+                         list(self.volume._image_cache_warm_failures))
+
+    def test_warm_image_volume_cache_already_running(self):
+        self.volume.image_volume_cache = mock.Mock()
+        self.volume._image_cache_warming = True
+        mock_spawn = self.mock_object(self.volume, '_add_to_threadpool')
+
+        self.volume._warm_image_volume_cache(self.context)
+
+        mock_spawn.assert_not_called()
+
+    @mock.patch('cinder.image.image_utils.qemu_img_info')
+    @mock.patch('cinder.image.image_utils.TemporaryImages.fetch')
+    @mock.patch('cinder.image.glance.get_remote_image_service')
+    def test_warm_image_volume_cache_entry_size(self, mock_get_service,
+                                                mock_fetch, mock_qemu_info):
+        image_service = mock.Mock()
+        image_service.show.return_value = {'disk_format': 'qcow2',
+                                           'container_format': 'bare',
+                                           'size': units.Gi // 2,
+                                           'virtual_size': None}
+        mock_get_service.return_value = (image_service, fake.IMAGE_ID)
+        mock_qemu_info.return_value.virtual_size = 3 * units.Gi
+        self.volume.image_volume_cache = mock.Mock(max_cache_size_gb=0)
+        self.volume.cluster = None
+        mock_create = self.mock_object(self.volume, 'create_volume')
+        self.mock_object(self.volume, 'delete_volume')
+
+        self.assertFalse(self.volume._warm_image_volume_cache_entry(
+            self.context, 'pool', fake.IMAGE_ID))
+
+        # Like in the create volume flow, the size comes from the virtual
+        # size of the downloaded image.
+        mock_qemu_info.assert_called_once_with(
+            mock_fetch.return_value.__enter__.return_value)
+        self.assertEqual(3, mock_create.call_args[0][1].size)
+
     def test_delete_volume_with_keymanager_exception(self):
         volume_params = {
             'host': 'some_host',
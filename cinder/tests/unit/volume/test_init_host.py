@@ -19,6 +19,7 @@ import mock
 from oslo_config import cfg
 
 from cinder import context
+from cinder import exception
 from cinder import objects
 from cinder.tests.unit import utils as tests_utils
 from cinder.tests.unit import volume as base
@@ -120,6 +121,52 @@ class VolumeInitHostTestCase(base.BaseVolumeTestCase):
         self.assertEqual(
             1024, stats['pools']['pool2']['allocated_capacity_gb'])
 
+    @mock.patch('cinder.manager.CleanableManager.init_host')
+    def test_init_host_ensure_exports(self, init_host_mock):
+        host = volutils.append_host(CONF.host, 'pool0')
+        vol0 = tests_utils.create_volume(self.context, status='in-use',
+                                         host=host)
+        vol1 = tests_utils.create_volume(self.context, status='in-use',
+                                         host=host)
+        tests_utils.create_volume(self.context, host=host)
+
+        with mock.patch.object(self.volume.driver, 'ensure_exports',
+                               return_value={vol1.id: Exception()}) as m_ens:
+            self.volume.init_host(service_id=self.service_id)
+
+        m_ens.assert_called_once_with(mock.ANY, mock.ANY)
+        self.assertEqual({vol0.id, vol1.id},
+                         {vol.id for vol in m_ens.call_args[0][1]})
+        vol0.refresh()
+        vol1.refresh()
+        self.assertEqual('in-use', vol0.status)
+        self.assertEqual('error', vol1.status)
+
+    @mock.patch('cinder.manager.CleanableManager.init_host')
+    def test_init_host_ensure_exports_one_by_one(self, init_host_mock):
+        self.override_config('volume_service_inithost_export_workers', 2)
+        host = volutils.append_host(CONF.host, 'pool0')
+        vol0 = tests_utils.create_volume(self.context, status='in-use',
+                                         host=host)
+        vol1 = tests_utils.create_volume(self.context, status='in-use',
+                                         host=host)
+
+        def _ensure_export(context, volume):
+            if volume.id == vol1.id:
+                raise exception.VolumeBackendAPIException(data='fake')
+
+        with mock.patch.object(self.volume.driver, 'ensure_exports',
+                               side_effect=NotImplementedError), \
+                mock.patch.object(self.volume.driver, 'ensure_export',
+                                  side_effect=_ensure_export) as m_ens:
+            self.volume.init_host(service_id=self.service_id)
+
+        self.assertEqual(2, m_ens.call_count)
+        vol0.refresh()
+        vol1.refresh()
+        self.assertEqual('in-use', vol0.status)
+        self.assertEqual('error', vol1.status)
+
     @mock.patch.object(driver.BaseVD, "update_provider_info")
     def test_init_host_sync_provider_info(self, mock_update):
         vol0 = tests_utils.create_volume(
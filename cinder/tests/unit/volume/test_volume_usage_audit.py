@@ -177,9 +177,9 @@ class GetActiveByWindowTestCase(base.BaseVolumeTestCase):
             datetime.datetime(1, 4, 1, 1, 1, 1),
             project_id=fake.PROJECT_ID)
         self.assertEqual(3, len(volumes))
-        self.assertEqual(fake.VOLUME2_ID, volumes[0].id)
-        self.assertEqual(fake.VOLUME3_ID, volumes[1].id)
-        self.assertEqual(fake.VOLUME4_ID, volumes[2].id)
+        self.assertSetEqual({fake.VOLUME2_ID, fake.VOLUME3_ID,
+                             fake.VOLUME4_ID},
+                            {volume.id for volume in volumes})
 
     def test_snapshot_get_all_active_by_window(self):
         # Find all all snapshots valid within a timeframe window.
@@ -217,12 +217,10 @@ class GetActiveByWindowTestCase(base.BaseVolumeTestCase):
             datetime.datetime(1, 3, 1, 1, 1, 1),
             datetime.datetime(1, 4, 1, 1, 1, 1)).objects
         self.assertEqual(3, len(snapshots))
-        self.assertEqual(snap2.id, snapshots[0].id)
-        self.assertEqual(fake.VOLUME_ID, snapshots[0].volume_id)
-        self.assertEqual(snap3.id, snapshots[1].id)
-        self.assertEqual(fake.VOLUME_ID, snapshots[1].volume_id)
-        self.assertEqual(snap4.id, snapshots[2].id)
-        self.assertEqual(fake.VOLUME_ID, snapshots[2].volume_id)
+        self.assertSetEqual({snap2.id, snap3.id, snap4.id},
+                            {snapshot.id for snapshot in snapshots})
+        for snapshot in snapshots:
+            self.assertEqual(fake.VOLUME_ID, snapshot.volume_id)
 
     def test_backup_get_all_active_by_window(self):
         # Find all backups valid within a timeframe window.
@@ -252,6 +250,6 @@ class GetActiveByWindowTestCase(base.BaseVolumeTestCase):
             project_id=fake.PROJECT_ID
         )
         self.assertEqual(3, len(backups))
-        self.assertEqual(fake.BACKUP2_ID, backups[0].id)
-        self.assertEqual(fake.BACKUP3_ID, backups[1].id)
-        self.assertEqual(fake.BACKUP4_ID, backups[2].id)
+        self.assertSetEqual({fake.BACKUP2_ID, fake.BACKUP3_ID,
+                             fake.BACKUP4_ID},
+                            {backup.id for backup in backups})
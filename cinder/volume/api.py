@@ -220,7 +220,14 @@ class API(base.Base):
                scheduler_hints=None,
                source_replica=None, consistencygroup=None,
                cgsnapshot=None, multiattach=False, source_cg=None,
-               group=None, group_snapshot=None, source_group=None):
+               group=None, group_snapshot=None, source_group=None,
+               reservations=None):
+        """Create a volume.
+
+        If reservations is given, it must hold the quota reservations made
+        for this volume (see QuotaEngine.reserve_bulk), which are then used
+        instead of reserving the quota again.
+        """
 
         check_policy(context, 'create_from_image' if image_id else 'create')
 
@@ -315,7 +322,8 @@ class API(base.Base):
             'scheduler_hints': scheduler_hints,
             'key_manager': self.key_manager,
             'source_replica': source_replica,
-            'optional_args': {'is_quota_committed': False},
+            'optional_args': {'is_quota_committed': False,
+                              'reservations': reservations},
             'consistencygroup': consistencygroup,
             'cgsnapshot': cgsnapshot,
             'multiattach': multiattach,
@@ -550,7 +558,13 @@ class API(base.Base):
 
     def get_all(self, context, marker=None, limit=None, sort_keys=None,
                 sort_dirs=None, filters=None, viewable_admin_meta=False,
-                offset=None):
+                offset=None, fields=None):
+        """Get a list of volumes.
+
+        When fields is given only those volume columns are loaded and a list
+        of dictionaries is returned instead of a VolumeList, which is enough
+        for callers that don't need the full volume objects.
+        """
         check_policy(context, 'get_all')
 
         if filters is None:
@@ -581,18 +595,32 @@ class API(base.Base):
         if context.is_admin and allTenants:
             # Need to remove all_tenants to pass the filtering below.
             del filters['all_tenants']
-            volumes = objects.VolumeList.get_all(context, marker, limit,
+            if fields:
+                volumes = self.db.volume_get_all(context, marker, limit,
                                                  sort_keys=sort_keys,
                                                  sort_dirs=sort_dirs,
                                                  filters=filters,
-                                                 offset=offset)
+                                                 offset=offset,
+                                                 fields=fields)
+            else:
+                volumes = objects.VolumeList.get_all(context, marker, limit,
+                                                     sort_keys=sort_keys,
+                                                     sort_dirs=sort_dirs,
+                                                     filters=filters,
+                                                     offset=offset)
         else:
             if viewable_admin_meta:
                 context = context.elevated()
-            volumes = objects.VolumeList.get_all_by_project(
-                context, context.project_id, marker, limit,
-                sort_keys=sort_keys, sort_dirs=sort_dirs, filters=filters,
-                offset=offset)
+            if fields:
+                volumes = self.db.volume_get_all_by_project(
+                    context, context.project_id, marker, limit,
+                    sort_keys=sort_keys, sort_dirs=sort_dirs, filters=filters,
+                    offset=offset, fields=fields)
+            else:
+                volumes = objects.VolumeList.get_all_by_project(
+                    context, context.project_id, marker, limit,
+                    sort_keys=sort_keys, sort_dirs=sort_dirs,
+                    filters=filters, offset=offset)
 
         LOG.info("Get all volumes completed successfully.")
         return volumes
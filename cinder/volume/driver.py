@@ -117,6 +117,20 @@ volume_opts = [
                default='1M',
                help='The default block size used when copying/clearing '
                     'volumes'),
+    cfg.IntOpt('volume_copy_streams',
+               default=1,
+               min=1,
+               help='Number of dd processes that copy a volume in parallel, '
+                    'each handling its own extent of the volume. Increasing '
+                    'it helps when a single stream can not use the full '
+                    'bandwidth of the storage.'),
+    cfg.IntOpt('volume_copy_read_ahead',
+               default=2,
+               min=0,
+               help='Number of chunks read ahead of the writes when copying '
+                    'a volume through file handles, so that reading and '
+                    'writing overlap. 0 => read and write one chunk at a '
+                    'time.'),
     cfg.StrOpt('volume_copy_blkio_cgroup_name',
                default='cinder-volume-copy',
                help='The blkio cgroup name to be used to limit bandwidth '
@@ -243,6 +257,36 @@ volume_opts = [
                default=0,
                help='Max number of entries allowed in the image volume cache. '
                     '0 => unlimited.'),
+    cfg.StrOpt('image_volume_cache_eviction_policy',
+               default='lru',
+               choices=['lru', 'lfu', 'gdsf'],
+               help='Order in which image volume cache entries are evicted '
+                    'to make room for new ones: least recently used (lru), '
+                    'least frequently used (lfu), or GreedyDual-Size-'
+                    'Frequency (gdsf), which prefers evicting large entries '
+                    'that are rarely used.'),
+    cfg.ListOpt('image_volume_cache_warm_images',
+                default=[],
+                help='IDs of images that a periodic task keeps in the image '
+                     'volume cache of every pool of this backend, so that '
+                     'the first volume created from them is as fast as the '
+                     'following ones.'),
+    cfg.IntOpt('image_volume_cache_warm_popular_count',
+               default=0,
+               min=0,
+               help='Number of images with the most image volume cache hits '
+                    'across all backends that a periodic task keeps in the '
+                    'image volume cache of every pool of this backend, in '
+                    'addition to image_volume_cache_warm_images.'),
+    cfg.IntOpt('image_volume_cache_headroom_percent',
+               default=0,
+               min=0,
+               max=99,
+               help='Percentage of the image volume cache limits that a '
+                    'periodic task keeps free by evicting entries ahead of '
+                    'time, so that creating new entries does not have to '
+                    'wait for evictions. 0 => only evict when an entry is '
+                    'created.'),
     cfg.BoolOpt('report_discard_supported',
                 default=False,
                 help='Report to clients of Cinder that the backend supports '
@@ -779,6 +823,24 @@ class BaseVD(object):
         self._copy_image_data_to_volume(
             context, volume, image_service, image_id, encrypted=True)
 
+    def can_stream_image_to_volume(self, volume, image_meta):
+        """Check if copying the image will stream it into the volume.
+
+        This is the case when the generic copy_image_to_volume and
+        copy_image_to_encrypted_volume implementations are used, as they
+        fetch raw images straight into the attached volume. Drivers that
+        override them stage the image in image_conversion_dir unless they
+        override this method as well.
+        """
+        if volume.encryption_key_id:
+            copy_method = 'copy_image_to_encrypted_volume'
+        else:
+            copy_method = 'copy_image_to_volume'
+        if getattr(type(self), copy_method) is not getattr(BaseVD,
+                                                           copy_method):
+            return False
+        return image_utils.can_stream_image(image_meta)
+
     def _copy_image_data_to_volume(self, context, volume, image_service,
                                    image_id, encrypted=False):
         """Fetch the image from image_service and write it to the volume."""
@@ -1321,6 +1383,17 @@ class BaseVD(object):
         """Synchronously recreates an export for a volume."""
         return
 
+    def ensure_exports(self, context, volumes):
+        """Synchronously recreates the exports of many volumes at once.
+
+        Optional, for drivers that can do it faster than one volume at a
+        time. Otherwise ensure_export is called for each volume.
+
+        :returns: dict mapping the ids of the volumes that could not be
+                  re-exported to the error raised for them
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def create_export(self, context, volume, connector):
         """Exports the volume.
@@ -74,7 +74,14 @@ volume_opts = [
     cfg.BoolOpt('lvm_suppress_fd_warnings',
                 default=False,
                 help='Suppress leaked file descriptor warnings in LVM '
-                     'commands.')
+                     'commands.'),
+    cfg.IntOpt('lvm_metadata_cache_ttl',
+               default=5,
+               min=0,
+               help='Number of seconds the attributes of all the logical '
+                    'volumes, read with a single lvs command, are reused '
+                    'for. Changes made by the driver refresh them right '
+                    'away. Set to 0 to run lvdisplay for every check.'),
 ]
 
 CONF = cfg.CONF
@@ -305,7 +312,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
                     executor=self._execute,
                     lvm_conf=lvm_conf_file,
                     suppress_fd_warn=(
-                        self.configuration.lvm_suppress_fd_warnings))
+                        self.configuration.lvm_suppress_fd_warnings),
+                    lv_cache_ttl=self.configuration.lvm_metadata_cache_ttl)
 
             except exception.VolumeGroupNotFound:
                 message = (_("Volume Group %s does not exist") %
@@ -499,6 +507,11 @@ class LVMVolumeDriver(driver.VolumeDriver):
                                  self.configuration.volume_dd_blocksize,
                                  size=volume['size'])
 
+    def can_stream_image_to_volume(self, volume, image_meta):
+        # copy_image_to_volume fetches into the logical volume directly, and
+        # encrypted volumes use the generic implementation.
+        return image_utils.can_stream_image(image_meta)
+
     def copy_volume_to_image(self, context, volume, image_service, image_meta):
         """Copy the volume to the specified image."""
         image_utils.upload_volume(context,
@@ -803,6 +816,25 @@ class LVMVolumeDriver(driver.VolumeDriver):
             self.target_driver.ensure_export(context, volume, volume_path)
         return model_update
 
+    def ensure_exports(self, context, volumes):
+        if not self.target_driver.SUPPORTS_ENSURE_EXPORTS:
+            raise NotImplementedError()
+
+        failures = {}
+        exports = []
+        for volume in volumes:
+            try:
+                self.vg.activate_lv(volume['name'])
+            except Exception as e:
+                failures[volume['id']] = e
+            else:
+                volume_path = "/dev/%s/%s" % (
+                    self.configuration.volume_group, volume['name'])
+                exports.append((volume, volume_path))
+
+        failures.update(self.target_driver.ensure_exports(context, exports))
+        return failures
+
     def create_export(self, context, volume, connector, vg=None):
         if vg is None:
             vg = self.configuration.volume_group
@@ -19,10 +19,12 @@ import math
 import os
 import tempfile
 
+import eventlet
 from eventlet import tpool
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import fileutils
+from oslo_utils import timeutils
 from oslo_utils import units
 import six
 from six.moves import urllib
@@ -92,6 +94,12 @@ RBD_OPTS = [
                     'ceph cluster to do a demotion/promotion of volumes. '
                     'If value < 0, no timeout is set and default librados '
                     'value is used.'),
+    cfg.IntOpt('rbd_usage_reconcile_interval', default=3600, min=0,
+               help='Interval value (in seconds) between scans of the '
+                    'whole pool for the provisioned capacity. In between, '
+                    'it is updated from the volume operations of this '
+                    'service. If value is 0, the pool is scanned on every '
+                    'stats update.'),
 ]
 
 CONF = cfg.CONF
@@ -197,6 +205,11 @@ class RBDDriver(driver.CloneableImageVD,
         self._is_replication_enabled = False
         self._replication_targets = []
         self._target_names = []
+        # Provisioned size of each volume image, tracked from the volume
+        # operations and periodically reconciled with the pool
+        self._image_sizes = None
+        self._usage_updates = None
+        self._usage_reconciled_at = None
 
     def _get_target_config(self, target_id):
         """Get a replication target from known replication targets."""
@@ -360,19 +373,84 @@ class RBDDriver(driver.CloneableImageVD,
             ports.append(port)
         return hosts, ports
 
-    def _iterate_cb(self, offset, length, exists):
-        if exists:
-            self._total_usage += length
+    def _get_image_size(self, ioctx, name):
+        image = self.rbd.Image(ioctx, name, read_only=True)
+        try:
+            return image.size()
+        finally:
+            image.close()
 
     def _get_usage_info(self):
+        """Return the provisioned size of every volume image in the pool."""
+        image_sizes = {}
         with RADOSClient(self) as client:
             for t in self.RBDProxy().list(client.ioctx):
                 if t.startswith('volume'):
                     # Only check for "volume" to allow some flexibility with
                     # non-default volume_name_template settings.  Template
                     # must start with "volume".
-                    with RBDVolumeProxy(self, t, read_only=True) as v:
-                        v.diff_iterate(0, v.size(), None, self._iterate_cb)
+                    try:
+                        image_sizes[t] = tpool.execute(self._get_image_size,
+                                                       client.ioctx, t)
+                    except self.rbd.ImageNotFound:
+                        LOG.debug("Image %s was deleted while listing the "
+                                  "pool.", t)
+        return image_sizes
+
+    def _reconcile_usage(self):
+        """Replace the tracked image sizes with those found in the pool.
+
+        Changes made while the pool is being scanned are applied on top of
+        what the scan found.
+        """
+        try:
+            image_sizes = self._get_usage_info()
+        finally:
+            updates, self._usage_updates = self._usage_updates, None
+        for name, size in updates.items():
+            if size is None:
+                image_sizes.pop(name, None)
+            else:
+                image_sizes[name] = size
+        self._image_sizes = image_sizes
+        self._usage_reconciled_at = timeutils.utcnow()
+
+    def _reconcile_usage_in_background(self):
+        try:
+            self._reconcile_usage()
+        except Exception:
+            LOG.exception('Error reconciling the provisioned capacity.')
+
+    def _set_usage(self, name, size):
+        """Track the provisioned size of an image, None once deleted."""
+        if not name.startswith('volume'):
+            return
+        if self._usage_updates is not None:
+            self._usage_updates[name] = size
+        if self._image_sizes is not None:
+            if size is None:
+                self._image_sizes.pop(name, None)
+            else:
+                self._image_sizes[name] = size
+
+    def _get_provisioned_capacity(self):
+        """Return the provisioned capacity of the pool in GiB.
+
+        The pool is only scanned the first time. Later calls reconcile the
+        tracked sizes with it in the background when they are older than
+        rbd_usage_reconcile_interval.
+        """
+        if self._image_sizes is None:
+            self._usage_updates = {}
+            self._reconcile_usage()
+        elif self._usage_updates is None and timeutils.is_older_than(
+                self._usage_reconciled_at,
+                self.configuration.rbd_usage_reconcile_interval):
+            self._usage_updates = {}
+            eventlet.spawn_n(self._reconcile_usage_in_background)
+
+        total_usage = sum(self._image_sizes.values())
+        return math.ceil(float(total_usage) / units.Gi)
 
     def _update_volume_stats(self):
         stats = {
@@ -415,10 +493,8 @@ class RBDDriver(driver.CloneableImageVD,
                     stats['total_capacity_gb'] = round(
                         (stats['free_capacity_gb'] + used_capacity_gb), 2)
 
-            self._total_usage = 0
-            self._get_usage_info()
-            total_usage_gb = math.ceil(float(self._total_usage) / units.Gi)
-            stats['provisioned_capacity_gb'] = total_usage_gb
+            stats['provisioned_capacity_gb'] = (
+                self._get_provisioned_capacity())
         except self.rados.Error:
             # just log and return unknown capacities
             LOG.exception('error refreshing volume stats')
@@ -486,6 +562,7 @@ class RBDDriver(driver.CloneableImageVD,
             with RBDVolumeProxy(self, src_name, read_only=True) as vol:
                 vol.copy(vol.ioctx, dest_name)
                 self._extend_if_required(volume, src_vref)
+            self._set_usage(dest_name, int(volume.size) * units.Gi)
             return
 
         # Otherwise do COW clone.
@@ -554,6 +631,7 @@ class RBDDriver(driver.CloneableImageVD,
 
             self._extend_if_required(volume, src_vref)
 
+        self._set_usage(dest_name, int(volume.size) * units.Gi)
         LOG.debug("clone created successfully")
         return volume_update
 
@@ -615,6 +693,7 @@ class RBDDriver(driver.CloneableImageVD,
                 err_msg = (_('Failed to enable image replication'))
                 raise exception.ReplicationError(reason=err_msg,
                                                  volume_id=volume.id)
+        self._set_usage(vol_name, size)
         return volume_update
 
     def _flatten(self, pool, volume_name):
@@ -649,6 +728,7 @@ class RBDDriver(driver.CloneableImageVD,
                 err_msg = (_('Failed to enable image replication'))
                 raise exception.ReplicationError(reason=err_msg,
                                                  volume_id=volume.id)
+            self._set_usage(vol_name, int(volume.size) * units.Gi)
             return volume_update or {}
 
     def _resize(self, volume, **kwargs):
@@ -658,6 +738,7 @@ class RBDDriver(driver.CloneableImageVD,
 
         with RBDVolumeProxy(self, volume.name) as vol:
             vol.resize(size)
+        self._set_usage(utils.convert_str(volume.name), size)
 
     def create_volume_from_snapshot(self, volume, snapshot):
         """Creates a volume from a snapshot."""
@@ -744,6 +825,7 @@ class RBDDriver(driver.CloneableImageVD,
         if (not parent_has_snaps) and parent_name.endswith('.deleted'):
             LOG.debug("deleting parent %s", parent_name)
             self.RBDProxy().remove(client.ioctx, parent_name)
+            self._set_usage(parent_name, None)
 
             # Now move up to grandparent if there is one
             if g_parent:
@@ -760,6 +842,7 @@ class RBDDriver(driver.CloneableImageVD,
             except self.rbd.ImageNotFound:
                 LOG.info("volume %s no longer exists in backend",
                          volume_name)
+                self._set_usage(volume_name, None)
                 return
 
             clone_snap = None
@@ -812,7 +895,9 @@ class RBDDriver(driver.CloneableImageVD,
                 except self.rbd.ImageNotFound:
                     LOG.info("RBD volume %s not found, allowing delete "
                              "operation to proceed.", volume_name)
+                    self._set_usage(volume_name, None)
                     return
+                self._set_usage(volume_name, None)
 
                 # If it is a clone, walk back up the parent chain deleting
                 # references.
@@ -825,6 +910,8 @@ class RBDDriver(driver.CloneableImageVD,
                 # will be deleted when it's snapshot and clones are deleted.
                 new_name = "%s.deleted" % (volume_name)
                 self.RBDProxy().rename(client.ioctx, volume_name, new_name)
+                self._set_usage(volume_name, None)
+                self._set_usage(new_name, int(volume.size) * units.Gi)
 
     def create_snapshot(self, snapshot):
         """Creates an rbd snapshot."""
@@ -1023,6 +1110,8 @@ class RBDDriver(driver.CloneableImageVD,
                    for volume, is_demoted in zip(volumes, demotion_results)]
         self._active_backend_id = secondary_id
         self._active_config = remote
+        # The pool of the new active cluster has to be scanned
+        self._image_sizes = None
         LOG.info('RBD driver failover completed.')
         return secondary_id, updates, []
 
@@ -1243,6 +1332,9 @@ class RBDDriver(driver.CloneableImageVD,
             self.RBDProxy().rename(client.ioctx,
                                    utils.convert_str(rbd_name),
                                    utils.convert_str(volume.name))
+        self._set_usage(utils.convert_str(rbd_name), None)
+        self._set_usage(utils.convert_str(volume.name),
+                        int(volume.size) * units.Gi)
 
     def manage_existing_get_size(self, volume, existing_ref):
         """Return size of an existing image for manage_existing.
@@ -1316,6 +1408,9 @@ class RBDDriver(driver.CloneableImageVD,
                 self.RBDProxy().rename(client.ioctx,
                                        utils.convert_str(existing_name),
                                        utils.convert_str(wanted_name))
+                self._set_usage(utils.convert_str(existing_name), None)
+                self._set_usage(utils.convert_str(wanted_name),
+                                int(new_volume.size) * units.Gi)
             except self.rbd.ImageNotFound:
                 LOG.error('Unable to rename the logical volume '
                           'for volume %s.', volume.id)
@@ -634,6 +634,12 @@ class QuotaReserveTask(flow_utils.CinderTask):
             raise exception.VolumeSizeExceedsLimit(
                 size=size, limit=quotas['per_volume_gigabytes'])
 
+        # The quota may have already been reserved along with other volumes
+        if optional_args.get('reservations') is not None:
+            return {
+                'reservations': optional_args['reservations'],
+            }
+
         try:
             reserve_opts = {'volumes': 1, 'gigabytes': size}
             QUOTAS.add_volume_type_opts(context, reserve_opts, volume_type_id)
@@ -10,6 +10,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
 import os
 import traceback
 
@@ -742,30 +743,59 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                         '%(exception)s', {'exception': e})
         return None, False
 
-    @coordination.synchronized('{image_id}')
     def _create_from_image_cache_or_download(self, context, volume,
                                              image_location, image_id,
                                              image_meta, image_service):
-        # Try and use the image cache.
-        should_create_cache_entry = False
-        cloned = False
-        model_update = None
+        internal_context = None
         if self.image_volume_cache:
             internal_context = cinder_context.get_internal_tenant_context()
             if not internal_context:
                 LOG.info('Unable to get Cinder internal context, will '
                          'not use image-volume cache.')
-            else:
-                model_update, cloned = self._create_from_image_cache(
-                    context,
-                    internal_context,
-                    volume,
-                    image_id,
-                    image_meta
-                )
-                # Don't cache encrypted volume.
-                if not cloned and not volume.encryption_key_id:
-                    should_create_cache_entry = True
+
+        # Don't cache encrypted volume.
+        if not internal_context or volume.encryption_key_id:
+            return self._create_from_image_or_cache(
+                context, None, volume, image_location, image_id,
+                image_meta, image_service)
+
+        # NOTE: Concurrent requests for the same version of an image on the
+        # same backend are coalesced: the first one downloads the image and
+        # creates the cache entry, the others wait for it and clone it.
+        backend_name = volume_utils.extract_host(volume.service_topic_queue)
+        cache_key = '%s-%s-%s' % (backend_name, image_id,
+                                  image_meta.get('updated_at'))
+        cache_key = hashlib.sha1(cache_key.encode('utf-8')).hexdigest()
+        return self._create_from_image_or_cache_synchronized(
+            context, internal_context, volume, image_location, image_id,
+            image_meta, image_service, cache_key)
+
+    @coordination.synchronized('image-cache-{cache_key}')
+    def _create_from_image_or_cache_synchronized(self, context,
+                                                 internal_context, volume,
+                                                 image_location, image_id,
+                                                 image_meta, image_service,
+                                                 cache_key):
+        return self._create_from_image_or_cache(
+            context, internal_context, volume, image_location, image_id,
+            image_meta, image_service)
+
+    def _create_from_image_or_cache(self, context, internal_context, volume,
+                                    image_location, image_id, image_meta,
+                                    image_service):
+        # Try and use the image cache.
+        should_create_cache_entry = False
+        cloned = False
+        model_update = None
+        if internal_context:
+            model_update, cloned = self._create_from_image_cache(
+                context,
+                internal_context,
+                volume,
+                image_id,
+                image_meta
+            )
+            should_create_cache_entry = not cloned
 
         # Fall back to default behavior of creating volume,
         # download the image data and copy it into the volume.
@@ -774,28 +804,24 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
         try:
             if not cloned:
                 try:
-                    with image_utils.TemporaryImages.fetch(
-                            image_service, context, image_id,
-                            backend_name) as tmp_image:
-                        # Try to create the volume as the minimal size,
-                        # then we can extend once the image has been
-                        # downloaded.
-                        data = image_utils.qemu_img_info(tmp_image)
-
-                        virtual_size = image_utils.check_virtual_size(
-                            data.virtual_size, volume.size, image_id)
-
-                        if should_create_cache_entry:
-                            if virtual_size and virtual_size != original_size:
-                                    volume.size = virtual_size
-                                    volume.save()
-                        model_update = self._create_from_image_download(
-                            context,
-                            volume,
-                            image_location,
-                            image_meta,
-                            image_service
-                        )
+                    if self._image_streams_to_volume(volume, image_meta):
+                        # The virtual size of a raw image is its size, so
+                        # there is no need to stage it to find out.
+                        model_update = self._create_from_image_download_sized(
+                            context, volume, image_location, image_id,
+                            image_meta, image_service, image_meta['size'],
+                            should_create_cache_entry)
+                    else:
+                        with image_utils.TemporaryImages.fetch(
+                                image_service, context, image_id,
+                                backend_name) as tmp_image:
+                            data = image_utils.qemu_img_info(tmp_image)
+                            model_update = (
+                                self._create_from_image_download_sized(
+                                    context, volume, image_location,
+                                    image_id, image_meta, image_service,
+                                    data.virtual_size,
+                                    should_create_cache_entry))
                 except exception.ImageTooBig as e:
                     with excutils.save_and_reraise_exception():
                         self.message.create(
@@ -830,6 +856,32 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
 
         return model_update
 
+    def _image_streams_to_volume(self, volume, image_meta):
+        # Only when the driver writes the image straight into the volume can
+        # the staging in image_conversion_dir be skipped.
+        return (image_utils.can_stream_image(image_meta) and
+                self.driver.can_stream_image_to_volume(volume, image_meta))
+
+    def _create_from_image_download_sized(self, context, volume,
+                                          image_location, image_id,
+                                          image_meta, image_service,
+                                          image_virtual_size,
+                                          should_create_cache_entry):
+        # Try to create the volume as the minimal size, then we can extend
+        # once the image has been downloaded.
+        virtual_size = image_utils.check_virtual_size(
+            image_virtual_size, volume.size, image_id)
+
+        if should_create_cache_entry:
+            if virtual_size and virtual_size != volume.size:
+                volume.size = virtual_size
+                volume.save()
+        return self._create_from_image_download(context,
+                                                volume,
+                                                image_location,
+                                                image_meta,
+                                                image_service)
+
     def _create_from_image(self, context, volume,
                            image_location, image_id, image_meta,
                            image_service, **kwargs):
@@ -839,13 +891,16 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                    'image_location': image_location, 'image_id': image_id})
 
         # NOTE(e0ne): check for free space in image_conversion_dir before
-        # image downloading.
+        # image downloading. Raw images streamed into the volume never land
+        # there.
         if (CONF.image_conversion_dir and not
                 os.path.exists(CONF.image_conversion_dir)):
             os.makedirs(CONF.image_conversion_dir)
         try:
-            image_utils.check_available_space(CONF.image_conversion_dir,
-                                              image_meta['size'], image_id)
+            if not self._image_streams_to_volume(volume, image_meta):
+                image_utils.check_available_space(CONF.image_conversion_dir,
+                                                  image_meta['size'],
+                                                  image_id)
         except exception.ImageTooBig as err:
             with excutils.save_and_reraise_exception():
                 self.message.create(
@@ -36,9 +36,11 @@ intact.
 """
 
 
+import math
 import requests
 import time
 
+from eventlet import greenpool
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
@@ -110,6 +112,9 @@ VALID_CREATE_GROUP_SRC_SNAP_STATUS = (fields.SnapshotStatus.AVAILABLE,)
 VALID_CREATE_CG_SRC_CG_STATUS = ('available',)
 VALID_CREATE_GROUP_SRC_GROUP_STATUS = ('available',)
 VA_LIST = objects.VolumeAttachmentList
+# Seconds to wait before trying again to add an image to the image-volume
+# cache of a pool after failing to.
+IMAGE_CACHE_WARM_RETRY_INTERVAL = 3600
 
 volume_manager_opts = [
     cfg.IntOpt('migration_create_volume_timeout_secs',
@@ -120,6 +125,12 @@ volume_manager_opts = [
                 default=False,
                 help='Offload pending volume delete during '
                      'volume service startup'),
+    cfg.IntOpt('volume_service_inithost_export_workers',
+               default=1,
+               min=1,
+               help='Number of in-use volumes re-exported concurrently '
+                    'during volume service startup, when the driver can '
+                    'not re-export them all at once'),
 ]
 
 volume_backend_opts = [
@@ -292,12 +303,20 @@ class VolumeManager(manager.CleanableManager,
                 'image_volume_cache_max_size_gb')
             max_cache_entries = self.driver.configuration.safe_get(
                 'image_volume_cache_max_count')
+            eviction_policy = self.driver.configuration.safe_get(
+                'image_volume_cache_eviction_policy')
+            headroom_percent = self.driver.configuration.safe_get(
+                'image_volume_cache_headroom_percent')
 
+            self._image_cache_warm_failures = {}
+            self._image_cache_warming = False
             self.image_volume_cache = image_cache.ImageVolumeCache(
                 self.db,
                 cinder_volume.API(),
                 max_cache_size,
-                max_cache_entries
+                max_cache_entries,
+                eviction_policy,
+                headroom_percent
             )
             LOG.info('Image-volume cache enabled for host %(host)s.',
                      {'host': self.host})
@@ -333,6 +352,9 @@ class VolumeManager(manager.CleanableManager,
                 pool = (self.driver.configuration.safe_get(
                     'volume_backend_name') or vol_utils.extract_host(
                     volume['host'], 'pool', True))
+        self._add_allocated_capacity(pool, volume['size'])
+
+    def _add_allocated_capacity(self, pool, size):
         try:
             pool_stat = self.stats['pools'][pool]
         except KeyError:
@@ -341,10 +363,77 @@ class VolumeManager(manager.CleanableManager,
                 allocated_capacity_gb=0)
             pool_stat = self.stats['pools'][pool]
         pool_sum = pool_stat['allocated_capacity_gb']
-        pool_sum += volume['size']
+        pool_sum += size
 
         self.stats['pools'][pool]['allocated_capacity_gb'] = pool_sum
-        self.stats['allocated_capacity_gb'] += volume['size']
+        self.stats['allocated_capacity_gb'] += size
+
+    def _count_all_allocated_capacity(self, ctxt, volumes):
+        """Count the allocated capacity of all our volumes.
+
+        Sizes are summed per host by the DB, only volumes without a pool in
+        their host are counted one by one since the driver has to find it.
+        """
+        filters = self._get_cluster_or_host_filters()
+        filters['status'] = ['in-use', 'available']
+        sizes = self.db.volume_size_get_by_host(ctxt, filters=filters)
+        for host, size in sizes.items():
+            pool = vol_utils.extract_host(host, 'pool')
+            if pool is not None:
+                self._add_allocated_capacity(pool, size)
+
+        for volume in volumes:
+            # available volume should also be counted into allocated
+            if (volume['status'] in ['in-use', 'available'] and
+                    vol_utils.extract_host(volume['host'], 'pool') is None):
+                self._count_allocated_capacity(ctxt, volume)
+
+    def _ensure_exports(self, ctxt, volumes):
+        """Recreate the exports of volumes, setting failed ones to ERROR.
+
+        Drivers that can re-export many volumes at once get them all in one
+        call, otherwise they are re-exported by a pool of
+        volume_service_inithost_export_workers green threads.
+        """
+        if not volumes:
+            return
+
+        try:
+            failures = self.driver.ensure_exports(ctxt, volumes)
+        except NotImplementedError:
+            failures = self._ensure_exports_in_pool(ctxt, volumes)
+        except Exception:
+            LOG.exception("Failed to re-export volumes in a batch, "
+                          "re-exporting them one by one.")
+            failures = self._ensure_exports_in_pool(ctxt, volumes)
+        else:
+            for volume in volumes:
+                if volume.id in failures:
+                    LOG.error("Failed to re-export volume, setting to "
+                              "ERROR: %(error)s",
+                              {'error': failures[volume.id]},
+                              resource=volume)
+
+        for volume in volumes:
+            if volume.id in failures:
+                volume.conditional_update({'status': 'error'},
+                                          {'status': 'in-use'})
+
+    def _ensure_exports_in_pool(self, ctxt, volumes):
+        def _ensure_export(volume):
+            try:
+                self.driver.ensure_export(ctxt, volume)
+            except Exception as e:
+                LOG.exception("Failed to re-export volume, "
+                              "setting to ERROR.",
+                              resource=volume)
+                return e
+
+        pool = greenpool.GreenPool(
+            CONF.volume_service_inithost_export_workers)
+        errors = pool.imap(_ensure_export, volumes)
+        return {volume.id: error for volume, error in zip(volumes, errors)
+                if error is not None}
 
     def _set_voldb_empty_at_startup_indicator(self, ctxt):
         """Determine if the Cinder volume DB is empty.
@@ -467,26 +556,14 @@ class VolumeManager(manager.CleanableManager,
         self.stats.update({'allocated_capacity_gb': 0})
 
         try:
-            for volume in volumes:
-                # available volume should also be counted into allocated
-                if volume['status'] in ['in-use', 'available']:
-                    # calculate allocated capacity for driver
-                    self._count_allocated_capacity(ctxt, volume)
-
-                    try:
-                        if volume['status'] in ['in-use']:
-                            self.driver.ensure_export(ctxt, volume)
-                    except Exception:
-                        LOG.exception("Failed to re-export volume, "
-                                      "setting to ERROR.",
-                                      resource=volume)
-                        volume.conditional_update({'status': 'error'},
-                                                  {'status': 'in-use'})
+            # calculate allocated capacity for driver
+            self._count_all_allocated_capacity(ctxt, volumes)
+            self._ensure_exports(ctxt, [volume for volume in volumes
+                                        if volume['status'] == 'in-use'])
             # All other cleanups are processed by parent class CleanableManager
 
         except Exception:
-            LOG.exception("Error during re-export on driver init.",
-                          resource=volume)
+            LOG.exception("Error during re-export on driver init.")
             return
 
         self.driver.set_throttle()
@@ -1375,6 +1452,98 @@ class VolumeManager(manager.CleanableManager,
             if image_volume:
                 self.delete_volume(ctx, image_volume)
 
+    def _get_image_volume_cache_warm_list(self, ctxt):
+        """Get the IDs of the images to keep in the image-volume cache."""
+        image_ids = list(self.driver.configuration.safe_get(
+            'image_volume_cache_warm_images') or [])
+        popular_count = self.driver.configuration.safe_get(
+            'image_volume_cache_warm_popular_count')
+        if popular_count:
+            image_ids.extend(
+                image_id for image_id in
+                self.db.image_volume_cache_get_popular(ctxt, popular_count)
+                if image_id not in image_ids)
+        return image_ids
+
+    def _get_pool_names(self):
+        stats = self.driver.get_volume_stats() or {}
+        pools = [pool.get('pool_name') for pool in stats.get('pools') or []]
+        if not any(pools):
+            pools = [stats.get('volume_backend_name') or
+                     vol_utils.extract_host(self.host, 'pool', True)]
+        return [pool for pool in pools if pool]
+
+    def _get_image_cache_filters(self, pool):
+        if self.cluster:
+            return {'cluster_name': vol_utils.append_host(self.cluster, pool)}
+        return {'host': vol_utils.append_host(self.host, pool)}
+
+    def _warm_image_volume_cache_entry(self, ctx, pool, image_id):
+        """Create the image-volume cache entry of an image on a pool.
+
+        A volume is created from the image on the pool, which makes the
+        create volume flow download the image and add it to the cache. That
+        volume is deleted afterwards. Returns True if the cache entry exists
+        once done.
+        """
+        image_service, image_id = glance.get_remote_image_service(ctx,
+                                                                  image_id)
+        image_meta = image_service.show(ctx, image_id)
+        # The create volume flow sizes cache entries by the virtual size of
+        # the image, which is only known for sure once it is downloaded,
+        # unless it is a raw image that is streamed.
+        if image_utils.can_stream_image(image_meta):
+            virtual_size = image_meta['size']
+        elif image_meta.get('virtual_size'):
+            virtual_size = image_meta['virtual_size']
+        else:
+            # NOTE: The flow downloads the image again, as it does not use
+            # this image service.
+            with image_utils.TemporaryImages.fetch(
+                    image_service, ctx, image_id) as tmp_image:
+                virtual_size = image_utils.qemu_img_info(
+                    tmp_image).virtual_size
+        size = max(int(math.ceil(float(virtual_size) / units.Gi)),
+                   image_meta.get('min_disk') or 0, 1)
+
+        max_size_gb = self.image_volume_cache.max_cache_size_gb
+        if max_size_gb and size > max_size_gb:
+            LOG.warning('Image %(image_id)s does not fit in the image-volume '
+                        'cache, it will not be cached in advance.',
+                        {'image_id': image_id})
+            return False
+
+        reservations = QUOTAS.reserve(ctx, volumes=1, gigabytes=size)
+        try:
+            volume = objects.Volume(
+                context=ctx,
+                size=size,
+                user_id=ctx.user_id,
+                project_id=ctx.project_id,
+                host=vol_utils.append_host(self.host, pool),
+                cluster_name=vol_utils.append_host(self.cluster, pool),
+                availability_zone=self.availability_zone,
+                status='creating',
+                attach_status=fields.VolumeAttachStatus.DETACHED,
+                display_name='image-%s' % image_id)
+            volume.create()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                QUOTAS.rollback(ctx, reservations)
+        QUOTAS.commit(ctx, reservations, project_id=ctx.project_id)
+
+        try:
+            self.create_volume(ctx, volume,
+                               request_spec=objects.RequestSpec(
+                                   image_id=image_id),
+                               allow_reschedule=False)
+        finally:
+            self.delete_volume(ctx, volume)
+
+        entries = self.db.image_volume_cache_get_all(
+            ctx, **self._get_image_cache_filters(pool))
+        return any(entry['image_id'] == image_id for entry in entries)
+
     def _clone_image_volume(self, ctx, volume, image_meta):
         volume_type_id = volume.get('volume_type_id')
         reserve_opts = {'volumes': 1, 'gigabytes': volume.size}
@@ -2358,6 +2527,74 @@ class VolumeManager(manager.CleanableManager,
         LOG.info("Migrate volume completed successfully.",
                  resource=volume)
 
+    @periodic_task.periodic_task
+    def _reclaim_image_volume_cache(self, context):
+        if not self.image_volume_cache or not self.driver.initialized:
+            return
+        try:
+            self.image_volume_cache.reclaim_headroom(context)
+        except exception.CinderException as e:
+            LOG.warning('Failed to reclaim image-volume cache space. '
+                        'Error: %(exception)s', {'exception': e})
+
+    @periodic_task.periodic_task
+    def _warm_image_volume_cache(self, ctxt):
+        if not self.image_volume_cache or not self.driver.initialized:
+            return
+        # Adding an image to the cache means downloading it, so this is done
+        # in a green thread to not hold up the other periodic tasks.
+        if self._image_cache_warming:
+            return
+        self._image_cache_warming = True
+        self._add_to_threadpool(self._warm_image_volume_cache_entries, ctxt)
+
+    def _warm_image_volume_cache_entries(self, ctxt):
+        try:
+            image_ids = self._get_image_volume_cache_warm_list(ctxt)
+            if not image_ids:
+                return
+            internal_ctx = context.get_internal_tenant_context()
+            if not internal_ctx:
+                LOG.warning('Unable to get Cinder internal context, will not '
+                            'warm the image-volume cache.')
+                return
+
+            for pool in self._get_pool_names():
+                self._warm_image_volume_cache_pool(ctxt, internal_ctx, pool,
+                                                   image_ids)
+        finally:
+            self._image_cache_warming = False
+
+    def _warm_image_volume_cache_pool(self, ctxt, internal_ctx, pool,
+                                      image_ids):
+        host = vol_utils.append_host(self.host, pool)
+        cached = {entry['image_id'] for entry in
+                  self.db.image_volume_cache_get_all(
+                      ctxt, **self._get_image_cache_filters(pool))}
+        for image_id in image_ids:
+            if image_id in cached:
+                continue
+            failed_at = self._image_cache_warm_failures.get((host, image_id))
+            if failed_at and not timeutils.is_older_than(
+                    failed_at, IMAGE_CACHE_WARM_RETRY_INTERVAL):
+                continue
+
+            LOG.info('Adding image %(image_id)s to the image-volume cache '
+                     'of %(host)s.', {'image_id': image_id, 'host': host})
+            try:
+                warmed = self._warm_image_volume_cache_entry(
+                    internal_ctx, pool, image_id)
+            except Exception:
+                LOG.exception('Failed to add image %(image_id)s to the '
+                              'image-volume cache of %(host)s.',
+                              {'image_id': image_id, 'host': host})
+                warmed = False
+            if warmed:
+                self._image_cache_warm_failures.pop((host, image_id), None)
+            else:
+                self._image_cache_warm_failures[(host, image_id)] = (
+                    timeutils.utcnow())
+
     @periodic_task.periodic_task
     def _report_driver_status(self, context):
         if not self.driver.initialized:
@@ -32,6 +32,9 @@ class Target(object):
 
     """
 
+    # Whether ensure_exports is implemented
+    SUPPORTS_ENSURE_EXPORTS = False
+
     def __init__(self, *args, **kwargs):
         self.db = kwargs.get('db')
         self.configuration = kwargs.get('configuration')
@@ -44,6 +47,15 @@ class Target(object):
         """Synchronously recreates an export for a volume."""
         pass
 
+    def ensure_exports(self, context, volumes):
+        """Synchronously recreates the exports of many volumes at once.
+
+        :param volumes: list of (volume, volume_path) tuples
+        :returns: dict mapping the ids of the volumes that could not be
+                  re-exported to the error raised for them
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def create_export(self, context, volume, volume_path):
         """Exports a Target/Volume.
@@ -23,6 +23,9 @@ LOG = logging.getLogger(__name__)
 
 class LioAdm(iscsi.ISCSITarget):
     """iSCSI target administration for LIO using python-rtslib."""
+
+    SUPPORTS_ENSURE_EXPORTS = True
+
     def __init__(self, *args, **kwargs):
         super(LioAdm, self).__init__(*args, **kwargs)
 
@@ -218,3 +221,13 @@ class LioAdm(iscsi.ISCSITarget):
             return
 
         LOG.info("Skipping ensure_export. Found existing iSCSI target.")
+
+    def ensure_exports(self, context, volumes):
+        """Recreate exports for logical volumes.
+
+        LIO saves the configuration of all the targets together, so they
+        are all restored at once when there is none.
+        """
+        if volumes:
+            self.ensure_export(context, volumes[0][0], volumes[0][1])
+        return {}
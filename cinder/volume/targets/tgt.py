@@ -34,6 +34,8 @@ class TgtAdm(iscsi.ISCSITarget):
     etc.
     """
 
+    SUPPORTS_ENSURE_EXPORTS = True
+
     VOLUME_CONF = textwrap.dedent("""
                 <target %(name)s>
                     backing-store %(path)s
@@ -117,25 +119,8 @@ class TgtAdm(iscsi.ISCSITarget):
         LOG.debug("StdOut from tgt-admin --update: %s", out)
         LOG.debug("StdErr from tgt-admin --update: %s", err)
 
-    @utils.retry(exception.NotFound)
-    def create_iscsi_target(self, name, tid, lun, path,
-                            chap_auth=None, **kwargs):
-
-        # Note(jdg) tid and lun aren't used by TgtAdm but remain for
-        # compatibility
-
-        # NOTE(jdg): Remove this when we get to the bottom of bug: #1398078
-        # for now, since we intermittently hit target already exists we're
-        # adding some debug info to try and pinpoint what's going on
-        (out, err) = utils.execute('tgtadm',
-                                   '--lld',
-                                   'iscsi',
-                                   '--op',
-                                   'show',
-                                   '--mode',
-                                   'target',
-                                   run_as_root=True)
-        LOG.debug("Targets prior to update: %s", out)
+    def _write_volume_conf(self, name, path, chap_auth=None):
+        """Write the persistence file of a target, returning its path."""
         fileutils.ensure_tree(self.volumes_dir)
 
         vol_id = name.split(':')[1]
@@ -167,6 +152,32 @@ class TgtAdm(iscsi.ISCSITarget):
                    'content: %(vc)s'),
                   {'vp': volume_path, 'vc': volume_conf})
 
+        return volume_path
+
+    @utils.retry(exception.NotFound)
+    def create_iscsi_target(self, name, tid, lun, path,
+                            chap_auth=None, **kwargs):
+
+        # Note(jdg) tid and lun aren't used by TgtAdm but remain for
+        # compatibility
+
+        # NOTE(jdg): Remove this when we get to the bottom of bug: #1398078
+        # for now, since we intermittently hit target already exists we're
+        # adding some debug info to try and pinpoint what's going on
+        (out, err) = utils.execute('tgtadm',
+                                   '--lld',
+                                   'iscsi',
+                                   '--op',
+                                   'show',
+                                   '--mode',
+                                   'target',
+                                   run_as_root=True)
+        LOG.debug("Targets prior to update: %s", out)
+
+        vol_id = name.split(':')[1]
+        volumes_dir = self.volumes_dir
+        volume_path = self._write_volume_conf(name, path, chap_auth)
+
         old_persist_file = None
         old_name = kwargs.get('old_name', None)
         if old_name is not None:
@@ -246,6 +257,53 @@ class TgtAdm(iscsi.ISCSITarget):
 
         return tid
 
+    def _get_backed_targets(self):
+        """Return the IQNs of the targets that have their backing lun."""
+        (out, err) = utils.execute('tgt-admin', '--show', run_as_root=True)
+        targets = set()
+        iqn = None
+        for line in out.split('\n'):
+            if line.startswith('Target '):
+                iqn = line.split()[2]
+            elif iqn is not None and line == '        LUN: 1':
+                targets.add(iqn)
+        return targets
+
+    def ensure_exports(self, context, volumes):
+        """Recreate the exports of many volumes with one target update.
+
+        The persistence files of all the volumes are written first and
+        tgt-admin then updates all the targets at once. Volumes whose target
+        or backing lun is still missing afterwards go through ensure_export
+        one by one, which verifies and recreates the backing lun.
+        """
+        failures = {}
+        for volume, volume_path in volumes:
+            iscsi_name = "%s%s" % (self.iscsi_target_prefix, volume['name'])
+            chap_auth = self._get_target_chap_auth(context, volume)
+            try:
+                self._write_volume_conf(iscsi_name, volume_path, chap_auth)
+            except Exception as e:
+                failures[volume['id']] = e
+
+        try:
+            self._do_tgt_update('ALL')
+        except putils.ProcessExecutionError as e:
+            LOG.warning('Failed to update all iSCSI targets at once: %s', e)
+
+        targets = self._get_backed_targets()
+        for volume, volume_path in volumes:
+            iqn = '%s%s' % (self.iscsi_target_prefix, volume['name'])
+            if volume['id'] in failures or iqn in targets:
+                continue
+            LOG.debug('Target %s or its backing lun is missing after the '
+                      'update, creating it.', iqn)
+            try:
+                self.ensure_export(context, volume, volume_path)
+            except Exception as e:
+                failures[volume['id']] = e
+        return failures
+
     def remove_iscsi_target(self, tid, lun, vol_id, vol_name, **kwargs):
         LOG.info('Removing iscsi_target for Volume ID: %s', vol_id)
         vol_uuid_file = vol_name
@@ -16,10 +16,13 @@
 
 
 import ast
+import errno
 import functools
+import io
 import json
 import math
 import operator
+import os
 from os import urandom
 import re
 import time
@@ -429,9 +432,26 @@ def check_for_odirect_support(src, dest, flag='oflag=direct'):
         return False
 
 
+def _get_copy_extents(size_in_m, streams):
+    """Split a copy of size_in_m MiB into at most streams extents.
+
+    Extents are (offset, length) pairs in bytes, aligned on MiB boundaries
+    so that they remain usable with O_DIRECT.
+    """
+    if size_in_m <= 0:
+        return [(0, 0)]
+    streams = max(1, min(int(streams), size_in_m))
+    extent_m = int(math.ceil(float(size_in_m) / streams))
+    extents = []
+    for offset_m in range(0, size_in_m, extent_m):
+        length_m = min(extent_m, size_in_m - offset_m)
+        extents.append((offset_m * units.Mi, length_m * units.Mi))
+    return extents
+
+
 def _copy_volume_with_path(prefix, srcstr, deststr, size_in_m, blocksize,
                            sync=False, execute=utils.execute, ionice=None,
-                           sparse=False):
+                           sparse=False, streams=1):
     cmd = prefix[:]
 
     if ionice:
@@ -439,18 +459,12 @@ def _copy_volume_with_path(prefix, srcstr, deststr, size_in_m, blocksize,
 
     blocksize = _check_blocksize(blocksize)
     size_in_bytes = size_in_m * units.Mi
-
-    cmd.extend(('dd', 'if=%s' % srcstr, 'of=%s' % deststr,
-                'count=%d' % size_in_bytes, 'bs=%s' % blocksize))
+    extents = _get_copy_extents(size_in_m, streams)
 
     # Use O_DIRECT to avoid thrashing the system buffer cache
-    odirect = check_for_odirect_support(srcstr, deststr, 'iflag=direct')
-
-    cmd.append('iflag=count_bytes,direct' if odirect else 'iflag=count_bytes')
-
-    if check_for_odirect_support(srcstr, deststr, 'oflag=direct'):
-        cmd.append('oflag=direct')
-        odirect = True
+    iflag_direct = check_for_odirect_support(srcstr, deststr, 'iflag=direct')
+    oflag_direct = check_for_odirect_support(srcstr, deststr, 'oflag=direct')
+    odirect = iflag_direct or oflag_direct
 
     # If the volume is being unprovisioned then
     # request the data is persisted before returning,
@@ -460,13 +474,49 @@ def _copy_volume_with_path(prefix, srcstr, deststr, size_in_m, blocksize,
         conv.append('fdatasync')
     if sparse:
         conv.append('sparse')
-    if conv:
-        conv_options = 'conv=' + ",".join(conv)
-        cmd.append(conv_options)
+
+    if len(extents) == 1:
+        cmd.extend(('dd', 'if=%s' % srcstr, 'of=%s' % deststr,
+                    'count=%d' % size_in_bytes, 'bs=%s' % blocksize))
+        iflag = ['count_bytes']
+        oflag = []
+        cmds = [cmd]
+    else:
+        # Each extent is copied by its own dd process. The output must not
+        # be truncated, as the other processes are writing to it too.
+        conv.insert(0, 'notrunc')
+        iflag = ['count_bytes', 'skip_bytes']
+        oflag = ['seek_bytes']
+        cmds = []
+        for offset, length in extents:
+            extent_cmd = cmd + ['dd', 'if=%s' % srcstr, 'of=%s' % deststr,
+                                'count=%d' % length, 'bs=%s' % blocksize]
+            # Reading /dev/zero anywhere returns the same data.
+            if srcstr != '/dev/zero':
+                extent_cmd.append('skip=%d' % offset)
+            extent_cmd.append('seek=%d' % offset)
+            cmds.append(extent_cmd)
+
+    if iflag_direct:
+        iflag.append('direct')
+    if oflag_direct:
+        oflag.append('direct')
+
+    for extent_cmd in cmds:
+        extent_cmd.append('iflag=%s' % ','.join(iflag))
+        if oflag:
+            extent_cmd.append('oflag=%s' % ','.join(oflag))
+        if conv:
+            extent_cmd.append('conv=%s' % ','.join(conv))
 
     # Perform the copy
     start_time = timeutils.utcnow()
-    execute(*cmd, run_as_root=True)
+    if len(cmds) == 1:
+        execute(*cmds[0], run_as_root=True)
+    else:
+        pool = eventlet.GreenPool(len(cmds))
+        for _out in pool.imap(lambda c: execute(*c, run_as_root=True), cmds):
+            pass
     duration = timeutils.delta_seconds(start_time, timeutils.utcnow())
 
     # NOTE(jdg): use a default of 1, mostly for unit test, but in
@@ -475,11 +525,13 @@ def _copy_volume_with_path(prefix, srcstr, deststr, size_in_m, blocksize,
         duration = 1
     mbps = (size_in_m / duration)
     LOG.debug("Volume copy details: src %(src)s, dest %(dest)s, "
-              "size %(sz).2f MB, duration %(duration).2f sec",
+              "size %(sz).2f MB, duration %(duration).2f sec, "
+              "streams %(streams)d",
               {"src": srcstr,
                "dest": deststr,
                "sz": size_in_m,
-               "duration": duration})
+               "duration": duration,
+               "streams": len(cmds)})
     LOG.info("Volume copy %(size_in_m).2f MB at %(mbps).2f MB/s",
              {'size_in_m': size_in_m, 'mbps': mbps})
 
@@ -493,38 +545,198 @@ def _open_volume_with_path(path, mode):
         LOG.error("Failed to open volume from %(path)s.", {'path': path})
 
 
-def _transfer_data(src, dest, length, chunk_size):
-    """Transfer data between files (Python IO objects)."""
+def is_all_zero(chunk):
+    """Return True if the chunk of bytes only contains zeroes."""
+    return chunk == b'\0' * len(chunk)
+
+
+# Errors telling that a kernel copy primitive can not be used for a pair of
+# files, in which case the next primitive, or user space, is used instead.
+_KERNEL_COPY_FALLBACK_ERRNOS = (errno.EBADF, errno.EINVAL, errno.ENOSYS,
+                                errno.EOPNOTSUPP, errno.EXDEV)
+
+
+def _copy_file_range(src_fd, dest_fd, count):
+    return os.copy_file_range(src_fd, dest_fd, count)
+
+
+def _sendfile(src_fd, dest_fd, count):
+    offset = os.lseek(src_fd, 0, os.SEEK_CUR)
+    sent = os.sendfile(dest_fd, src_fd, offset, count)
+    os.lseek(src_fd, offset + sent, os.SEEK_SET)
+    return sent
+
+
+def _transfer_data_in_kernel(src, dest, length, chunk_size):
+    """Copy data between files without going through user space.
+
+    copy_file_range is tried first, then sendfile. Returns the number of
+    bytes copied, which is 0 when neither can be used for these files.
+    """
+    try:
+        src_fd = src.fileno()
+        dest_fd = dest.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        return 0
+
+    methods = [method for name, method in (('copy_file_range',
+                                            _copy_file_range),
+                                           ('sendfile', _sendfile))
+               if hasattr(os, name)]
+    copied = 0
+    while methods and copied < length:
+        try:
+            count = tpool.execute(methods[0], src_fd, dest_fd,
+                                  min(chunk_size, length - copied))
+        except EnvironmentError as e:
+            if e.errno not in _KERNEL_COPY_FALLBACK_ERRNOS:
+                raise
+            methods.pop(0)
+            continue
+        if not count:
+            break
+        copied += count
+
+        # yield to any other pending operations
+        eventlet.sleep(0)
+    return copied
+
+
+def _is_real_file(f):
+    try:
+        f.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        return False
+    return True
+
+
+class _ChunkReader(object):
+    """Read chunks into a ring of reusable buffers.
+
+    Sources that can not read into a buffer, or readers without buffers,
+    are read the usual way.
+    """
+
+    def __init__(self, src, chunk_size, buffers):
+        self.src = src
+        self.readinto = getattr(src, 'readinto', None) if buffers else None
+        self.buffers = [bytearray(chunk_size) for _i in range(buffers)]
+        self.next_buffer = 0
+
+    def read(self, size):
+        if self.readinto:
+            view = memoryview(self.buffers[self.next_buffer])[:size]
+            try:
+                count = tpool.execute(self.readinto, view)
+            except NotImplementedError:
+                self.readinto = None
+            else:
+                self.next_buffer = (self.next_buffer + 1) % len(self.buffers)
+                return view[:count or 0]
+        return tpool.execute(self.src.read, size)
+
+
+def _read_ahead(reader, length, chunk_size, depth):
+    """Read chunks in a separate green thread.
+
+    Returns a queue holding up to depth chunks ahead of the consumer, and the
+    green thread filling it. The queue ends with None, or with the exception
+    that interrupted the reads.
+    """
+    queue = eventlet.queue.LightQueue(depth)
+
+    def _reader():
+        remaining_length = length
+        try:
+            while remaining_length > 0:
+                data = reader.read(min(chunk_size, remaining_length))
+                if not len(data):
+                    break
+                queue.put(data)
+                remaining_length -= len(data)
+        except Exception as e:
+            queue.put(e)
+            return
+        queue.put(None)
+
+    return queue, eventlet.spawn(_reader)
+
+
+def _transfer_data(src, dest, length, chunk_size, sparse=False,
+                   read_ahead=0):
+    """Transfer data between files (Python IO objects).
+
+    Unless sparse is set, the data is first copied by the kernel when both
+    are real files. Otherwise chunks are read, into reusable buffers if the
+    destination is a real file. When read_ahead is set, up to that many
+    chunks are read while the previous ones are being written. When sparse
+    is set, chunks of zeroes are skipped instead of written if the
+    destination is seekable, so it must already read as zeroes.
+    """
 
-    chunks = int(math.ceil(length / chunk_size))
     remaining_length = length
+    sparse = sparse and getattr(dest, 'seekable', lambda: False)()
 
+    if not sparse:
+        copied = _transfer_data_in_kernel(src, dest, length, chunk_size)
+        if copied:
+            LOG.debug("%(copied)s bytes transferred by the kernel.",
+                      {'copied': copied})
+        remaining_length -= copied
+
+    chunks = int(math.ceil(remaining_length / chunk_size))
     LOG.debug("%(chunks)s chunks of %(bytes)s bytes to be transferred.",
               {'chunks': chunks, 'bytes': chunk_size})
 
-    for chunk in range(0, chunks):
-        before = time.time()
-        data = tpool.execute(src.read, min(chunk_size, remaining_length))
+    # One buffer is being written while read_ahead chunks are waiting and
+    # one more is being read. Buffers are only written to real files, other
+    # destinations such as RBD images only accept bytes.
+    buffers = read_ahead + 2 if _is_real_file(dest) else 0
+    reader = _ChunkReader(src, chunk_size, buffers)
+    read_thread = None
+    if read_ahead and chunks:
+        queue, read_thread = _read_ahead(reader, remaining_length,
+                                         chunk_size, read_ahead)
 
-        # If we have reached end of source, discard any extraneous bytes from
-        # destination volume if trim is enabled and stop writing.
-        if data == b'':
-            break
+    try:
+        for chunk in range(0, chunks):
+            before = time.time()
+            if read_thread is not None:
+                data = queue.get()
+                if isinstance(data, Exception):
+                    raise data
+                data = data or b''
+            else:
+                data = reader.read(min(chunk_size, remaining_length))
 
-        tpool.execute(dest.write, data)
-        remaining_length -= len(data)
-        delta = (time.time() - before)
-        rate = (chunk_size / delta) / units.Ki
-        LOG.debug("Transferred chunk %(chunk)s of %(chunks)s (%(rate)dK/s).",
-                  {'chunk': chunk + 1, 'chunks': chunks, 'rate': rate})
+            # If we have reached end of source, discard any extraneous bytes
+            # from destination volume if trim is enabled and stop writing.
+            if not len(data):
+                break
 
-        # yield to any other pending operations
-        eventlet.sleep(0)
+            remaining_length -= len(data)
+            # The last chunk is always written so the destination reaches
+            # its full length.
+            if sparse and remaining_length and is_all_zero(data):
+                tpool.execute(dest.seek, len(data), io.SEEK_CUR)
+            else:
+                tpool.execute(dest.write, data)
+            delta = (time.time() - before)
+            rate = (chunk_size / delta) / units.Ki
+            LOG.debug("Transferred chunk %(chunk)s of %(chunks)s "
+                      "(%(rate)dK/s).",
+                      {'chunk': chunk + 1, 'chunks': chunks, 'rate': rate})
+
+            # yield to any other pending operations
+            eventlet.sleep(0)
+    finally:
+        if read_thread is not None:
+            read_thread.kill()
 
     tpool.execute(dest.flush)
 
 
-def _copy_volume_with_file(src, dest, size_in_m):
+def _copy_volume_with_file(src, dest, size_in_m, sparse=False):
     src_handle = src
     if isinstance(src, six.string_types):
         src_handle = _open_volume_with_path(src, 'rb')
@@ -543,7 +755,8 @@ def _copy_volume_with_file(src, dest, size_in_m):
 
     start_time = timeutils.utcnow()
 
-    _transfer_data(src_handle, dest_handle, size_in_m * units.Mi, units.Mi * 4)
+    _transfer_data(src_handle, dest_handle, size_in_m * units.Mi, units.Mi * 4,
+                   sparse=sparse, read_ahead=CONF.volume_copy_read_ahead)
 
     duration = max(1, timeutils.delta_seconds(start_time, timeutils.utcnow()))
 
@@ -560,7 +773,7 @@ def _copy_volume_with_file(src, dest, size_in_m):
 
 def copy_volume(src, dest, size_in_m, blocksize, sync=False,
                 execute=utils.execute, ionice=None, throttle=None,
-                sparse=False):
+                sparse=False, streams=None):
     """Copy data from the source volume to the destination volume.
 
     The parameters 'src' and 'dest' are both typically of type str, which
@@ -572,6 +785,9 @@ def copy_volume(src, dest, size_in_m, blocksize, sync=False,
     of type RawIOBase or any derivative that supports file operations such as
     read and write.  In this case, the handles are treated as file handles
     instead of file paths and, at present moment, throttling is unavailable.
+
+    Paths are copied by 'streams' dd processes in parallel, defaulting to the
+    volume_copy_streams option. Each of them copies its own extent.
     """
 
     if (isinstance(src, six.string_types) and
@@ -582,9 +798,10 @@ def copy_volume(src, dest, size_in_m, blocksize, sync=False,
             _copy_volume_with_path(throttle_cmd['prefix'], src, dest,
                                    size_in_m, blocksize, sync=sync,
                                    execute=execute, ionice=ionice,
-                                   sparse=sparse)
+                                   sparse=sparse,
+                                   streams=streams or CONF.volume_copy_streams)
     else:
-        _copy_volume_with_file(src, dest, size_in_m)
+        _copy_volume_with_file(src, dest, size_in_m, sparse=sparse)
 
 
 def clear_volume(volume_size, volume_path, volume_clear=None,